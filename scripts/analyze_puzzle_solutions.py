@@ -1,88 +1,82 @@
+import argparse
+import base64
 import json
 import os
 
-def load_data():
-    """load flights and puzzle description from json files."""
+import numpy as np
+
+from flight_shards import has_flight_shards, load_flight_shards, load_flights
+from phase_profiler import add_profile_arguments, profiler_from_args
+from puzzle_constraints import FlightTable, compile_puzzle
+
+# answer key: valid (user 1 flight, user 2 flight) pairs are stored as
+# flight_1_id * PAIR_STRIDE + flight_2_id, and each user gets a bitmap of the flight ids
+# that take part in at least one valid pair (bit i of the ids is bit i % 8 of byte i // 8)
+ANSWER_KEY_FILENAME = "answer_key.json"
+PAIR_STRIDE = 1 << 20
+
+# per-flight labels: a role code per flight plus, for each user, the index of the first flight
+# rule of the puzzle spec the flight fails (-1 when it passes them all), stored as arrays
+# indexed by flight id - first_id
+FLIGHT_LABELS_FILENAME = "flight_labels.json"
+ROLES = ["solution", "orphan", "wrong_airline", "wrong_date", "over_budget", "near_budget", "near_miss", "irrelevant"]
+# roles of flights failing only the rule reading this user profile key
+MISS_ROLES = {"preferred_airlines": "wrong_airline", "available_dates": "wrong_date", "max_budget": "over_budget"}
+# a price at most this far over the budget is a near_budget miss (the planted ones are 5-25 over)
+NEAR_BUDGET_MARGIN = 25
+
+def load_data(assets_dir="assets"):
+    """load flights and puzzle description from json files.
+    for date-sharded scenarios only the shards a solution could come from are read: dates
+    both users are available on, with at least one flight within the larger budget."""
     try:
-        with open("assets/flights.json", "r") as f:
-            flights = json.load(f)
-        with open("assets/puzzle_description.json", "r") as f:
+        with open(os.path.join(assets_dir, "puzzle_description.json"), "r") as f:
             puzzle = json.load(f)
+        if has_flight_shards(assets_dir):
+            user_1 = puzzle["friends"]["user_1"]
+            user_2 = puzzle["friends"]["user_2"]
+            dates = set(user_1["available_dates"]) & set(user_2["available_dates"])
+            max_price = max(user_1["max_budget"], user_2["max_budget"])
+            flights, manifest = load_flight_shards(assets_dir, dates, max_price)
+            print(f"📅 read {len(flights)} of {manifest['count']} flights from the shards for {', '.join(sorted(dates))}")
+        else:
+            with open(os.path.join(assets_dir, "flights.json"), "r") as f:
+                flights = json.load(f)
         return flights, puzzle
     except FileNotFoundError as e:
         print(f"❌ error: {e}")
         print("make sure to run the generator script first to create the data files.")
         return None, None
 
+def solution_record(flight_1, flight_2):
+    return {
+        "destination": flight_1["destination"],
+        "date": flight_1["date"],
+        "user_1_flight": {
+            "id": flight_1["id"],
+            "price": flight_1["price"],
+            "airline": flight_1["airline"]["code"],
+            "duration": flight_1["duration"]
+        },
+        "user_2_flight": {
+            "id": flight_2["id"],
+            "price": flight_2["price"],
+            "airline": flight_2["airline"]["code"],
+            "duration": flight_2["duration"]
+        }
+    }
+
 def find_solutions(flights, puzzle):
-    """find all valid solutions that satisfy the puzzle constraints."""
-    user_1 = puzzle["friends"]["user_1"]
-    user_2 = puzzle["friends"]["user_2"]
-    
-    solutions = []
-    
-    # get all possible destination airports
-    destinations = set(flight["destination"] for flight in flights)
-    
-    for destination in destinations:
-        # get flights to this destination for each user
-        user_1_flights = [f for f in flights if 
-                         f["origin"] == user_1["origin_airport"] and 
-                         f["destination"] == destination]
-        
-        user_2_flights = [f for f in flights if 
-                         f["origin"] == user_2["origin_airport"] and 
-                         f["destination"] == destination]
-        
-        # check each combination for valid solutions
-        for flight_1 in user_1_flights:
-            for flight_2 in user_2_flights:
-                # ensure both users cannot book the same flight id
-                if flight_1["id"] == flight_2["id"]:
-                    continue
-                    
-                if is_valid_solution(flight_1, flight_2, user_1, user_2):
-                    solutions.append({
-                        "destination": destination,
-                        "date": flight_1["date"],
-                        "user_1_flight": {
-                            "id": flight_1["id"],
-                            "price": flight_1["price"],
-                            "airline": flight_1["airline"]["code"],
-                            "duration": flight_1["duration"]
-                        },
-                        "user_2_flight": {
-                            "id": flight_2["id"],
-                            "price": flight_2["price"],
-                            "airline": flight_2["airline"]["code"],
-                            "duration": flight_2["duration"]
-                        }
-                    })
-    
-    return solutions
+    """find all valid solutions that satisfy the puzzle constraints.
+    the puzzle's rule spec is compiled into per-user eligibility masks and a join on the
+    pair keys (see puzzle_constraints), so no flight pair is checked one by one."""
+    table = FlightTable(flights)
+    left, right = compile_puzzle(puzzle).join(table)
+    solutions = [solution_record(flights[i], flights[j]) for i, j in zip(left.tolist(), right.tolist())]
 
-def is_valid_solution(flight_1, flight_2, user_1, user_2):
-    """check if two flights form a valid solution."""
-    # must arrive on the same date
-    if flight_1["date"] != flight_2["date"]:
-        return False
-    
-    # date must be available for both users
-    if (flight_1["date"] not in user_1["available_dates"] or 
-        flight_1["date"] not in user_2["available_dates"]):
-        return False
-    
-    # flights must be within budget
-    if (flight_1["price"] > user_1["max_budget"] or 
-        flight_2["price"] > user_2["max_budget"]):
-        return False
-    
-    # users must use their preferred airlines
-    if (flight_1["airline"]["code"] not in user_1["preferred_airlines"] or
-        flight_2["airline"]["code"] not in user_2["preferred_airlines"]):
-        return False
-    
-    return True
+    # same order as a destination by destination scan of the flights
+    solutions.sort(key=lambda sol: (sol["destination"], sol["user_1_flight"]["id"], sol["user_2_flight"]["id"]))
+    return solutions
 
 def analyze_solutions(solutions):
     """analyze and categorize the solutions."""
@@ -173,10 +167,208 @@ def print_analysis(analysis, solutions):
         print(f"   user 2: flight #{sol['user_2_flight']['id']} - ${sol['user_2_flight']['price']} ({sol['user_2_flight']['airline']}) - {sol['user_2_flight']['duration']}h")
         print()
 
+def keep_two_cheapest(cheapest, entry):
+    """add a (price, position) entry to a list holding the two cheapest entries seen."""
+    cheapest.append(entry)
+    cheapest.sort()
+    del cheapest[2:]
+
+def cheapest_pair(cheapest_1, cheapest_2, ids=None):
+    """cheapest (combined price, position 1, position 2) from the kept entries of both users.
+    with ids, pairs of the same flight are skipped; two entries per side always leave a valid one."""
+    best = None
+    for price_1, position_1 in cheapest_1:
+        for price_2, position_2 in cheapest_2:
+            if ids is not None and ids[position_1] == ids[position_2]:
+                continue
+            if best is None or price_1 + price_2 < best[0]:
+                best = (price_1 + price_2, position_1, position_2)
+    return best
+
+def frontier_points(points):
+    """the (max duration, combined price, ...) points no other point beats on both, by duration."""
+    frontier = []
+    for point in sorted(points):
+        if not frontier or point[1] < frontier[-1][1]:
+            frontier.append(point)
+    return frontier
+
+def pareto_frontier(flights, puzzle):
+    """non-dominated solutions per destination, trading the combined price against the longer
+    of the two flights. each (destination, date) bucket is swept in duration order while
+    keeping both users' two cheapest flights so far; the cheapest pair with both durations
+    up to d only changes at frontier points, so pairs are never enumerated. rules the sweep
+    cannot express (arrival windows, ne rules other than on id) fall back to the joined
+    pairs, which only holds the pairs inside the windows."""
+    rules = compile_puzzle(puzzle)
+    table = FlightTable(flights)
+    durations = table.column("duration")[0].tolist()
+    prices = table.column("price")[0].tolist()
+    points = {}
+    if rules.windows or set(rules.distinct_fields) - {"id"}:
+        left, right = rules.join(table)
+        for i, j in zip(left.tolist(), right.tolist()):
+            points.setdefault(flights[i]["destination"], []).append(
+                (max(durations[i], durations[j]), prices[i] + prices[j], i, j))
+    else:
+        ids = table.column("id")[0].tolist() if "id" in rules.distinct_fields else None
+        keys = rules.join_keys(table)
+        buckets = {}
+        for side, user in enumerate(["user_1", "user_2"]):
+            for position in np.flatnonzero(rules.flight_mask(table, user)).tolist():
+                buckets.setdefault(int(keys[position]), ([], []))[side].append(position)
+        for side_1, side_2 in buckets.values():
+            if not side_1 or not side_2:
+                continue
+            events = sorted([(durations[i], 0, i) for i in side_1] + [(durations[j], 1, j) for j in side_2])
+            cheapest = ([], [])
+            best_price = float("inf")
+            for k, (duration, side, position) in enumerate(events):
+                keep_two_cheapest(cheapest[side], (prices[position], position))
+                if k + 1 < len(events) and events[k + 1][0] == duration:
+                    continue  # take in every flight of this duration first
+                pair = cheapest_pair(cheapest[0], cheapest[1], ids)
+                if pair is not None and pair[0] < best_price:
+                    best_price = pair[0]
+                    points.setdefault(flights[pair[1]]["destination"], []).append((duration,) + pair)
+
+    frontiers = {}
+    for destination in sorted(points):
+        frontiers[destination] = []
+        for duration, price, i, j in frontier_points(points[destination]):
+            point = solution_record(flights[i], flights[j])
+            point["combined_price"] = round(price, 2)
+            point["max_duration"] = duration
+            frontiers[destination].append(point)
+    return frontiers
+
+def print_frontier(frontiers):
+    """print the price / duration trade-off of every destination."""
+    print("⚖️  PRICE VS DURATION FRONTIER:")
+    print("-" * 30)
+    for destination, points in frontiers.items():
+        options = ", ".join(f"${p['combined_price']} / {p['max_duration']}h ({p['date']})" for p in points)
+        print(f"{destination}: {options}")
+    print()
+
+def participation_bitmap(flight_ids):
+    """little-endian bitmap with the bits of the given flight ids set."""
+    flight_ids = list(flight_ids)
+    bitmap = bytearray(max(flight_ids) // 8 + 1 if flight_ids else 0)
+    for flight_id in flight_ids:
+        bitmap[flight_id // 8] |= 1 << (flight_id % 8)
+    return bytes(bitmap)
+
+def build_answer_key(solutions):
+    """compact, pre-graded form of the solutions: sorted pair keys plus per-user bitmaps."""
+    pairs = set()
+    for sol in solutions:
+        flight_1, flight_2 = sol["user_1_flight"]["id"], sol["user_2_flight"]["id"]
+        if flight_1 >= PAIR_STRIDE or flight_2 >= PAIR_STRIDE:
+            raise ValueError(f"flight ids must be below {PAIR_STRIDE} to fit the pair keys")
+        pairs.add(flight_1 * PAIR_STRIDE + flight_2)
+    answer_key = {"pair_stride": PAIR_STRIDE, "pairs": sorted(pairs)}
+    for user in ["user_1", "user_2"]:
+        flight_ids = {sol[f"{user}_flight"]["id"] for sol in solutions}
+        answer_key[user] = {
+            "count": len(flight_ids),
+            "bitmap": base64.b64encode(participation_bitmap(flight_ids)).decode("ascii"),
+        }
+    return answer_key
+
+def decode_answer_key(answer_key):
+    """turn a loaded answer key into a pair set and raw bitmaps for constant time lookups."""
+    return {
+        "pair_stride": answer_key["pair_stride"],
+        "pairs": set(answer_key["pairs"]),
+        "user_1": base64.b64decode(answer_key["user_1"]["bitmap"]),
+        "user_2": base64.b64decode(answer_key["user_2"]["bitmap"]),
+    }
+
+def grade_pair(decoded_key, flight_1_id, flight_2_id):
+    """whether user 1 on flight_1_id and user 2 on flight_2_id is a valid solution."""
+    return flight_1_id * decoded_key["pair_stride"] + flight_2_id in decoded_key["pairs"]
+
+def can_participate(decoded_key, user, flight_id):
+    """whether a flight is part of any valid solution for user ("user_1" or "user_2")."""
+    bitmap = decoded_key[user]
+    return flight_id // 8 < len(bitmap) and bool(bitmap[flight_id // 8] >> (flight_id % 8) & 1)
+
+def label_flights(flights, puzzle, solutions):
+    """role of every flight and the first rule it fails for each user, from the rule masks in
+    one vectorized pass. roles, highest priority first:
+    solution       takes part in a valid pair
+    orphan         passes one user's rules but pairs with nothing
+    wrong_airline, wrong_date, over_budget, near_budget
+                   leaves from a user's airport and fails only that one rule for them
+    near_miss      fails only one of the spec's extra rules
+    irrelevant     everything else
+    returns the flight_labels.json document."""
+    rules = compile_puzzle(puzzle)
+    table = FlightTable(flights)
+    ids = table.column("id")[0].astype(np.int64)
+    prices = table.column("price")[0]
+    role = np.full(len(table), ROLES.index("irrelevant"))
+    first_failed = {}
+    eligible = []
+
+    # lower priority roles are assigned first so higher ones overwrite them
+    for user in ["user_2", "user_1"]:
+        failed = ~rules.rule_masks(table, user)
+        first_failed[user] = np.where(failed.any(axis=0), failed.argmax(axis=0), -1)
+        single = failed.sum(axis=0) == 1
+        for index, rule in enumerate(rules.flight_rules):
+            if rule.get("user") == "origin_airport":
+                continue
+            miss = single & (first_failed[user] == index)
+            name = MISS_ROLES.get(rule.get("user"), "near_miss")
+            if name == "over_budget":
+                near = prices - rules.rule_value(rule, user) <= NEAR_BUDGET_MARGIN
+                role[miss & near] = ROLES.index("near_budget")
+                miss &= ~near
+            role[miss] = ROLES.index(name)
+        eligible.append(first_failed[user] == -1)
+    role[eligible[0] | eligible[1]] = ROLES.index("orphan")
+    participants = [sol[f"{user}_flight"]["id"] for sol in solutions for user in ["user_1", "user_2"]]
+    role[np.isin(ids, participants)] = ROLES.index("solution")
+
+    first_id = int(ids.min(initial=0))
+    size = int(ids.max(initial=-1)) - first_id + 1
+    labels = {
+        "roles": ROLES,
+        "rules": [f"{rule['field']} {rule['op']} {rule.get('user', rule.get('value'))}" for rule in rules.flight_rules],
+        "first_id": first_id,
+    }
+    # ids missing from the flights keep -1
+    for name, values in [("role", role), ("user_1_failed_rule", first_failed["user_1"]),
+                         ("user_2_failed_rule", first_failed["user_2"])]:
+        column = np.full(size, -1, dtype=np.int64)
+        column[ids - first_id] = values
+        labels[name] = column.tolist()
+    return labels
+
+def flight_label(labels, flight_id):
+    """(role, user 1 failed rule, user 2 failed rule) of a flight from a loaded labels document;
+    the failed rules are None when the flight passes every rule."""
+    index = flight_id - labels["first_id"]
+    if not 0 <= index < len(labels["role"]) or labels["role"][index] < 0:
+        raise KeyError(flight_id)
+    failed = [labels[f"{user}_failed_rule"][index] for user in ["user_1", "user_2"]]
+    return (labels["roles"][labels["role"][index]],
+            *[labels["rules"][rule] if rule >= 0 else None for rule in failed])
+
 def main():
     """main function to run the analysis."""
+    parser = argparse.ArgumentParser(description="find every valid solution of a travel puzzle")
+    parser.add_argument("--assets-dir", default="assets",
+                        help="directory holding flights.json and puzzle_description.json")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(os.path.basename(__file__), args)
+
     print("🚀 loading puzzle data...")
-    flights, puzzle = load_data()
+    with profiler.phase("load"):
+        flights, puzzle = load_data(args.assets_dir)
     
     if flights is None or puzzle is None:
         return
@@ -184,27 +376,55 @@ def main():
     print(f"📊 loaded {len(flights)} flights")
     print("🔍 searching for valid solutions...")
     
-    solutions = find_solutions(flights, puzzle)
-    analysis = analyze_solutions(solutions)
+    with profiler.phase("find_solutions"):
+        solutions = find_solutions(flights, puzzle)
+    with profiler.phase("analyze_solutions"):
+        analysis = analyze_solutions(solutions)
     
     print_analysis(analysis, solutions)
+    with profiler.phase("pareto_frontier"):
+        frontiers = pareto_frontier(flights, puzzle)
+    print_frontier(frontiers)
     
     # save results to file
     results = {
         "analysis_summary": analysis,
         "all_solutions": solutions,
+        "pareto_frontier": frontiers,
         "puzzle_info": {
             "user_1_budget": puzzle["friends"]["user_1"]["max_budget"],
             "user_2_budget": puzzle["friends"]["user_2"]["max_budget"],
-            "overlap_dates": puzzle["constraints"]["overlap_dates"]
+            "overlap_dates": puzzle["constraints"]["overlap_dates"],
+            "max_arrival_gap_hours": puzzle["constraints"].get("max_arrival_gap_hours")
         }
     }
     
-    os.makedirs("assets", exist_ok=True)
-    with open("assets/solution_analysis.json", "w") as f:
-        json.dump(results, f, indent=2)
+    output_path = os.path.join(args.assets_dir, "solution_analysis.json")
+    os.makedirs(args.assets_dir, exist_ok=True)
+    with profiler.phase("json_write"):
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
     
-    print(f"💾 analysis saved to assets/solution_analysis.json")
+    print(f"💾 analysis saved to {output_path}")
+    
+    answer_key_path = os.path.join(args.assets_dir, ANSWER_KEY_FILENAME)
+    with profiler.phase("answer_key"):
+        with open(answer_key_path, "w") as f:
+            json.dump(build_answer_key(solutions), f, separators=(",", ":"))
+    print(f"🔑 answer key saved to {answer_key_path}")
+
+    # labels cover every flight, not only the shards loaded for solving
+    with profiler.phase("label_flights"):
+        all_flights = load_flights(args.assets_dir) if has_flight_shards(args.assets_dir) else flights
+        labels = label_flights(all_flights, puzzle, solutions)
+    counts = np.bincount([code for code in labels["role"] if code >= 0], minlength=len(ROLES))
+    print("🏷️  flight roles: " + ", ".join(f"{name} {count}" for name, count in zip(ROLES, counts) if count))
+    labels_path = os.path.join(args.assets_dir, FLIGHT_LABELS_FILENAME)
+    with open(labels_path, "w") as f:
+        json.dump(labels, f, separators=(",", ":"))
+    print(f"💾 flight labels saved to {labels_path}")
+    profiler.count(flights=len(flights), labelled_flights=len(all_flights), solutions=len(solutions))
+    profiler.write()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
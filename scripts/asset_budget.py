@@ -0,0 +1,165 @@
+import argparse
+import fnmatch
+import gzip
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from package_assets import ASSETS_DIR, BROTLI_QUALITY, GZIP_LEVEL, brotli, minify
+
+# size and parse-time budgets of the json assets the browser loads. every json file under
+# ASSETS_DIR is measured raw, minified and compressed the way package_assets.py ships it,
+# together with its json decode time, and checked against the per-asset budgets in
+# asset_budgets.json (glob patterns, first match wins). with --previous the report is also
+# compared with an earlier one, so an output that grew is flagged even within its budget.
+#
+# run from the repository root:  python scripts/asset_budget.py [--output report.json]
+
+BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "asset_budgets.json")
+REPORT_VERSION = 1
+# decodes per asset; the fastest counts
+DECODE_REPEAT = 5
+# growth of the compressed size against --previous that is flagged
+GROWTH_TOLERANCE = 0.05
+# smaller growth is not flagged, whatever its share (small files grow by large fractions)
+MIN_GROWTH_BYTES = 1024
+LIMITS = ["raw_bytes", "minified_bytes", "gzip_bytes", "brotli_bytes", "decode_ms"]
+
+
+def find_json_assets(assets_dir: str = ASSETS_DIR) -> List[str]:
+    """paths (relative to assets_dir, with forward slashes) of every json file below it, sorted."""
+    names = []
+    for root, _, files in os.walk(assets_dir):
+        for filename in files:
+            if filename.endswith(".json"):
+                names.append(os.path.relpath(os.path.join(root, filename), assets_dir).replace(os.sep, "/"))
+    return sorted(names)
+
+
+def measure_asset(path: str, repeat: int = DECODE_REPEAT) -> Dict:
+    """raw, minified, gzip (and brotli) sizes and the best json decode time of one file."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    minified = minify(path)
+    entry = {
+        "raw_bytes": len(raw),
+        "minified_bytes": len(minified),
+        "gzip_bytes": len(gzip.compress(minified, compresslevel=GZIP_LEVEL, mtime=0)),
+    }
+    if brotli is not None:
+        entry["brotli_bytes"] = len(brotli.compress(minified, quality=BROTLI_QUALITY))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.loads(raw)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    entry["decode_ms"] = round(best * 1000, 3)
+    return entry
+
+
+def load_budgets(path: str = BUDGETS_PATH) -> List[Dict]:
+    with open(path, "r") as f:
+        return json.load(f)["budgets"]
+
+
+def budget_for(name: str, budgets: List[Dict]) -> Optional[Dict]:
+    """the first budget whose pattern matches the asset name."""
+    for budget in budgets:
+        if fnmatch.fnmatch(name, budget["pattern"]):
+            return budget
+    return None
+
+
+def over_budget(entry: Dict, budget: Optional[Dict]) -> List[str]:
+    """a message for every limit of the budget the asset exceeds."""
+    if budget is None:
+        return []
+    return [f"{limit} {entry[limit]:,} > {budget[limit]:,}" for limit in LIMITS
+            if limit in budget and limit in entry and entry[limit] > budget[limit]]
+
+
+def grown(entry: Dict, previous: Optional[Dict], tolerance: float) -> List[str]:
+    """a message when the compressed size grew by more than tolerance (and MIN_GROWTH_BYTES)
+    since the previous report."""
+    if previous is None:
+        return []
+    limit = "brotli_bytes" if "brotli_bytes" in entry and "brotli_bytes" in previous else "gzip_bytes"
+    if entry[limit] > previous[limit] * (1 + tolerance) and entry[limit] - previous[limit] >= MIN_GROWTH_BYTES:
+        return [f"{limit} grew {entry[limit] / previous[limit] - 1:+.1%} ({previous[limit]:,} -> {entry[limit]:,})"]
+    return []
+
+
+def budget_report(assets_dir: str, budgets: List[Dict], previous: Optional[Dict] = None,
+                  tolerance: float = GROWTH_TOLERANCE, repeat: int = DECODE_REPEAT) -> Dict:
+    """measurements, budgets and problems of every json asset."""
+    assets = {}
+    for name in find_json_assets(assets_dir):
+        entry = measure_asset(os.path.join(assets_dir, name), repeat)
+        budget = budget_for(name, budgets)
+        entry["budget"] = budget["pattern"] if budget else None
+        entry["problems"] = over_budget(entry, budget) + grown(entry, (previous or {}).get(name), tolerance)
+        assets[name] = entry
+    totals = {limit: sum(entry[limit] for entry in assets.values() if limit in entry)
+              for limit in LIMITS if any(limit in entry for entry in assets.values())}
+    totals["decode_ms"] = round(totals.get("decode_ms", 0), 3)
+    return {
+        "version": REPORT_VERSION,
+        "assets_dir": assets_dir,
+        "encodings": ["gzip"] + (["br"] if brotli is not None else []),
+        "totals": totals,
+        "assets": assets,
+    }
+
+
+def main():
+    """measure the json assets and check them against their budgets."""
+    parser = argparse.ArgumentParser(description="report json asset sizes and decode times against budgets")
+    parser.add_argument("--assets-dir", default=ASSETS_DIR)
+    parser.add_argument("--budgets", default=BUDGETS_PATH, help="json file with the per-asset budgets")
+    parser.add_argument("--previous", default=None, help="earlier report to flag grown assets against")
+    parser.add_argument("--growth-tolerance", type=float, default=GROWTH_TOLERANCE,
+                        help="compressed size growth against --previous that is flagged, as a fraction")
+    parser.add_argument("--repeat", type=int, default=DECODE_REPEAT, help="decodes per asset, the fastest counts")
+    parser.add_argument("--output", default=None, help="write the report as json")
+    args = parser.parse_args()
+    if not os.path.isdir(args.assets_dir):
+        parser.error(f"assets directory {args.assets_dir} does not exist (run from the repository root)")
+    if not find_json_assets(args.assets_dir):
+        parser.error(f"no json assets under {args.assets_dir}")
+
+    previous = None
+    if args.previous:
+        with open(args.previous, "r") as f:
+            previous = json.load(f)["assets"]
+    report = budget_report(args.assets_dir, load_budgets(args.budgets), previous, args.growth_tolerance, args.repeat)
+
+    compressed = "brotli_bytes" if "br" in report["encodings"] else "gzip_bytes"
+    print(f"📦 {len(report['assets'])} json assets under {args.assets_dir}")
+    print(f"  {'asset':<48} {'raw':>10} {'minified':>10} {compressed.split('_')[0]:>9} {'decode':>9}")
+    for name, entry in report["assets"].items():
+        flag = "❌" if entry["problems"] else "  "
+        print(f"{flag}{name:<48} {entry['raw_bytes']:>10,} {entry['minified_bytes']:>10,} "
+              f"{entry[compressed]:>9,} {entry['decode_ms']:>7.2f}ms")
+    totals = report["totals"]
+    print(f"  {'total':<48} {totals.get('raw_bytes', 0):>10,} {totals.get('minified_bytes', 0):>10,} "
+          f"{totals.get(compressed, 0):>9,} {totals.get('decode_ms', 0):>7.2f}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 report saved to {args.output}")
+
+    problems = [(name, problem) for name, entry in report["assets"].items() for problem in entry["problems"]]
+    if problems:
+        print(f"❌ {len(problems)} budget problems:")
+        for name, problem in problems:
+            print(f"   {name}: {problem}")
+        sys.exit(1)
+    print("✅ every asset is within its budget")
+
+
+if __name__ == "__main__":
+    main()
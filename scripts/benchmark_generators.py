@@ -0,0 +1,262 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import flight_scenario
+from reroll_telemetry import summarize
+
+# scaling benchmark of the flight generators: generate_flights runs in-process over a matrix
+# of scenario sizes (total flights, number of airports, number of point of interest origins)
+# with fixed seeds. every case records throughput, peak traced memory and the reroll rate.
+# absolute throughput depends on the machine, so it is also divided by the speed of a fixed
+# pure python calibration workload timed in the same process; that relative throughput is
+# what the stored baseline holds and what is compared, and a drop beyond the tolerance fails
+# the run (exit status 1).
+#
+#   python benchmark_generators.py                    # compare with the baseline
+#   python benchmark_generators.py --update-baseline  # record a new baseline on this machine
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generator_benchmark_baseline.json")
+BASELINE_VERSION = 2
+GENERATORS = ["generate_airport", "generate_airport2"]
+SEEDS = [0]
+# untraced runs per case and seed; the fastest counts, which keeps scheduler noise out
+REPEAT = 3
+# the matrix varies one axis at a time around the default scenario (None: the generator's own value)
+DEFAULT_CASE = {"total_flights": 5000, "airports": None, "poi_origins": 1}
+AXES = {
+    "total_flights": [2500, 5000, 10000],
+    "airports": [40, None, 90],
+    "poi_origins": [1, 2, 4],
+}
+QUICK_AXES = {"total_flights": [2500, 5000], "airports": [None], "poi_origins": [1]}
+# allowed throughput drop against the baseline, as a fraction
+TOLERANCE = 0.25
+# items of the calibration workload (random draws, formatting, dicts and a sort, like the generators)
+CALIBRATION_ITEMS = 50000
+# synthetic airports (beyond the generator's own list) are copies of existing ones moved by this many degrees
+SYNTHETIC_OFFSET_DEGREES = 1.5
+
+
+def calibration_rate(repeat: int = REPEAT) -> float:
+    """items per second of the fixed calibration workload, best of `repeat` runs."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rng = random.Random(0)
+        items = []
+        for i in range(CALIBRATION_ITEMS):
+            price = round(rng.uniform(50, 1500), 2)
+            items.append({"id": i, "code": f"{rng.choice('ABCDEFGH')}{rng.randrange(100):02d}", "price": price,
+                          "date": f"2025-06-{1 + rng.randrange(28):02d}"})
+        items.sort(key=lambda item: (item["date"], item["price"], item["id"]))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return CALIBRATION_ITEMS / best
+
+
+def benchmark_cases(generators: List[str], axes: Dict = AXES) -> List[Dict]:
+    """the cases of the matrix: the default scenario plus every axis value, per generator."""
+    cases = []
+    for generator in generators:
+        for axis, values in axes.items():
+            for value in values:
+                case = dict(DEFAULT_CASE, generator=generator, **{axis: value})
+                if case not in cases:
+                    cases.append(case)
+    return cases
+
+
+def case_name(case: Dict) -> str:
+    airports = case["airports"] if case["airports"] is not None else "all"
+    return f"{case['generator']}/flights={case['total_flights']}/airports={airports}/poi={case['poi_origins']}"
+
+
+def puzzle_airports(generator) -> List[str]:
+    """airports the puzzle itself needs: the friends' origins, the interest routes and the solutions."""
+    config = generator.PUZZLE_CONFIG
+    needed = [config["friend_a"]["origin"], config["friend_b"]["origin"]]
+    for origin, destinations in generator.POINTS_OF_INTEREST.items():
+        needed += [origin] + list(destinations)
+    needed += [solution["airport"] for solution in config["solution_destinations"]]
+    return list(dict.fromkeys(needed))
+
+
+def configure(generator_name: str, airports: Optional[int], poi_origins: int):
+    """a freshly loaded generator module resized to `airports` airports (dropping or adding
+    synthetic ones, never those of the puzzle) and `poi_origins` interest origins, the extra
+    origins flying to the same destinations as the first one."""
+    generator = importlib.reload(importlib.import_module(generator_name))
+    needed = set(puzzle_airports(generator))
+    if airports is not None:
+        if airports < len(needed):
+            raise ValueError(f"{generator_name} needs at least {len(needed)} airports")
+        if airports <= len(generator.airports):
+            spare = airports - len(needed)
+            kept = set(needed)
+            for airport in generator.airports:
+                if airport["IATA"] not in kept and spare > 0:
+                    kept.add(airport["IATA"])
+                    spare -= 1
+            generator.airports[:] = [airport for airport in generator.airports if airport["IATA"] in kept]
+        else:
+            originals = list(generator.airports)
+            for i in range(airports - len(originals)):
+                base = originals[i % len(originals)]
+                shift = SYNTHETIC_OFFSET_DEGREES * (1 + i // len(originals))
+                generator.airports.append({
+                    "IATA": f"Z{i:02d}",
+                    "Airport Name": f"Synthetic {base['Airport Name']}",
+                    "City": f"Synthetic {base['City']}",
+                    "Latitude": max(-89.0, min(89.0, base["Latitude"] + shift)),
+                    "Longitude": (base["Longitude"] + shift + 180) % 360 - 180,
+                })
+    destinations = next(iter(generator.POINTS_OF_INTEREST.values()))
+    candidates = [airport["IATA"] for airport in generator.airports
+                  if airport["IATA"] not in needed]
+    if poi_origins - len(generator.POINTS_OF_INTEREST) > len(candidates):
+        raise ValueError(f"not enough airports for {poi_origins} interest origins")
+    for origin in candidates[:max(0, poi_origins - len(generator.POINTS_OF_INTEREST))]:
+        generator.POINTS_OF_INTEREST[origin] = list(destinations)
+    return generator
+
+
+def run_case(case: Dict, seeds: List[int], calibration: float, repeat: int = REPEAT) -> Dict:
+    """throughput (best of `repeat` untraced runs per seed, also relative to the calibration
+    rate), peak memory (one traced run per seed) and reroll rate of one case, summed over the
+    seeds."""
+    generator = configure(case["generator"], case["airports"], case["poi_origins"])
+    seconds = 0.0
+    flights = 0
+    peak = 0
+    attempts = 0
+    wasted = 0
+    fallbacks = 0
+    for seed in seeds:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            blocks, generated, telemetry = flight_scenario.generate_flights(generator, seed, case["total_flights"])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        seconds += best
+        flights += len(generated)
+        for counters in summarize(blocks, telemetry, seed)["phases"].values():
+            attempts += counters["attempts"]
+            wasted += counters["wasted_attempts"]
+            fallbacks += counters["fallbacks"]
+
+        tracemalloc.start()
+        flight_scenario.generate_flights(generator, seed, case["total_flights"])
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "flights": flights,
+        "airports": len(generator.airports),
+        "interest_routes": sum(len(d) for d in generator.POINTS_OF_INTEREST.values()),
+        "seconds": round(seconds, 4),
+        "flights_per_second": round(flights / seconds, 1),
+        "relative_throughput": round(flights / seconds / calibration, 4),
+        "peak_memory_bytes": peak,
+        "reroll_rate": round(wasted / attempts, 5) if attempts else 0.0,
+        "fallbacks": fallbacks,
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """relative throughput regressions against the baseline, one message per failing case."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]["relative_throughput"]
+        if result["relative_throughput"] < expected * (1 - tolerance):
+            regressions.append(f"{name}: relative throughput {result['relative_throughput']:.3f}, "
+                               f"baseline {expected:.3f} (-{1 - result['relative_throughput'] / expected:.0%})")
+    return regressions
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def main():
+    """run the generator benchmark and compare it with (or store it as) the baseline."""
+    parser = argparse.ArgumentParser(description="benchmark the flight generators over growing scenario sizes")
+    parser.add_argument("--generators", nargs="+", default=GENERATORS, choices=GENERATORS)
+    parser.add_argument("--seeds", type=int, nargs="+", default=SEEDS)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="untraced runs per seed, the fastest one counts")
+    parser.add_argument("--quick", action="store_true", help="only the smaller default-shaped cases")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed throughput drop against the baseline, as a fraction")
+    parser.add_argument("--output", default=None, help="also write this run's results as json")
+    args = parser.parse_args()
+
+    cases = benchmark_cases(args.generators, QUICK_AXES if args.quick else AXES)
+    baseline = load_baseline(args.baseline)
+    if baseline is not None and baseline.get("version") != BASELINE_VERSION:
+        print(f"⚠️  baseline has version {baseline.get('version')}, not {BASELINE_VERSION}; not comparing")
+        baseline = None
+    if baseline is not None and baseline.get("seeds") != args.seeds:
+        print(f"⚠️  baseline was recorded with seeds {baseline.get('seeds')}, not {args.seeds}; not comparing")
+        baseline = None
+    expected = baseline["cases"] if baseline else {}
+
+    calibration = calibration_rate(args.repeat)
+    print(f"🏁 {len(cases)} cases, seeds {args.seeds}, calibration {calibration:,.0f} items/s")
+    results = {}
+    for case in cases:
+        name = case_name(case)
+        result = run_case(case, args.seeds, calibration, args.repeat)
+        results[name] = result
+        change = ""
+        if name in expected:
+            change = f" ({result['relative_throughput'] / expected[name]['relative_throughput'] - 1:+.0%} vs baseline)"
+        print(f"  {name:<58} {result['flights_per_second']:>9.0f} flights/s{change}  "
+              f"peak {result['peak_memory_bytes'] / 2 ** 20:>6.1f} MiB  rerolls {result['reroll_rate']:.2%}")
+
+    report = {
+        "version": BASELINE_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seeds": args.seeds,
+        "repeat": args.repeat,
+        "calibration_items_per_second": round(calibration, 1),
+        "cases": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 results saved to {args.output}")
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 baseline saved to {args.baseline}")
+        return
+    if baseline is None:
+        print(f"⚠️  no baseline to compare with, record one with --update-baseline")
+        return
+
+    regressions = compare(results, expected, args.tolerance)
+    if regressions:
+        print(f"❌ {len(regressions)} throughput regressions beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+    print(f"✅ no throughput regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
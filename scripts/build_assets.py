@@ -0,0 +1,330 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+# single entry point for every generated asset. each target records a key hashed from its
+# inputs (script sources, arguments, seed and input files) together with the hashes of the
+# outputs it wrote; a target is skipped while its key is unchanged and its outputs are
+# still the files it wrote. independent stale targets run in parallel.
+#
+# run from the repository root:  python scripts/build_assets.py [targets...]
+
+SCRIPTS_DIR = "scripts"
+MANIFEST_PATH = os.path.join(SCRIPTS_DIR, ".build_manifest.json")
+# bump to invalidate every target, e.g. when the key format changes
+BUILD_VERSION = 1
+DEFAULT_SEED = 0
+
+MIGRATION_DIR = "src/assets/domesticmigration"
+USMAP_PATH = os.path.join(MIGRATION_DIR, "usmap.json")
+MIGRATION_ERAS = ["1960s", "1990s", "2020s"]
+PUZZLE_FILES = ["airports.json", "airlines.json", "flights.json", "puzzle_description.json", "generation_telemetry.json"]
+
+
+def _puzzle_outputs(assets_dir: str) -> List[str]:
+    return [os.path.join(assets_dir, name) for name in PUZZLE_FILES]
+
+
+# script: what to run; sources: local python files whose contents go into the key;
+# inputs: data files (or directories, meaning every file below them) read by the script;
+# after: targets whose outputs are read; outputs: files (or directories, meaning every file
+# below them) the script writes.
+# situation and situation2 were made by earlier versions of the airport scripts and
+# have no generator in the tree any more, so they are not rebuilt.
+TARGETS = {
+    "situation3": {
+        "script": "generate_airport.py",
+        "sources": ["generate_airport.py", "flight_scenario.py", "counter_rng.py", "flight_shards.py",
+                    "puzzle_constraints.py", "reroll_telemetry.py", "phase_profiler.py"],
+        "args": ["--output-dir", "src/assets/situation3"],
+        "seeded": True,
+        "inputs": [],
+        "after": [],
+        "outputs": _puzzle_outputs("src/assets/situation3"),
+    },
+    "situation3-analysis": {
+        "script": "analyze_puzzle_solutions.py",
+        "sources": ["analyze_puzzle_solutions.py", "flight_shards.py", "puzzle_constraints.py",
+                    "phase_profiler.py"],
+        "args": ["--assets-dir", "src/assets/situation3"],
+        "seeded": False,
+        "inputs": ["src/assets/situation3/flights.json", "src/assets/situation3/puzzle_description.json"],
+        "after": ["situation3"],
+        "outputs": ["src/assets/situation3/solution_analysis.json", "src/assets/situation3/answer_key.json",
+                    "src/assets/situation3/flight_labels.json"],
+    },
+    "situation3-index": {
+        "script": "index_flights.py",
+        "sources": ["index_flights.py", "flight_shards.py"],
+        "args": ["--assets-dir", "src/assets/situation3"],
+        "seeded": False,
+        "inputs": ["src/assets/situation3/flights.json"],
+        "after": ["situation3"],
+        "outputs": ["src/assets/situation3/route_summary.json", "src/assets/situation3/facet_index.json"],
+    },
+    "situation4": {
+        "script": "generate_airport2.py",
+        "sources": ["generate_airport2.py", "flight_scenario.py", "counter_rng.py", "flight_shards.py",
+                    "puzzle_constraints.py", "reroll_telemetry.py", "phase_profiler.py"],
+        "args": ["--output-dir", "src/assets/situation4"],
+        "seeded": True,
+        "inputs": [],
+        "after": [],
+        "outputs": _puzzle_outputs("src/assets/situation4"),
+    },
+    "situation4-analysis": {
+        "script": "analyze_puzzle_solutions.py",
+        "sources": ["analyze_puzzle_solutions.py", "flight_shards.py", "puzzle_constraints.py",
+                    "phase_profiler.py"],
+        "args": ["--assets-dir", "src/assets/situation4"],
+        "seeded": False,
+        "inputs": ["src/assets/situation4/flights.json", "src/assets/situation4/puzzle_description.json"],
+        "after": ["situation4"],
+        "outputs": ["src/assets/situation4/solution_analysis.json", "src/assets/situation4/answer_key.json",
+                    "src/assets/situation4/flight_labels.json"],
+    },
+    "situation4-index": {
+        "script": "index_flights.py",
+        "sources": ["index_flights.py", "flight_shards.py"],
+        "args": ["--assets-dir", "src/assets/situation4"],
+        "seeded": False,
+        "inputs": ["src/assets/situation4/flights.json"],
+        "after": ["situation4"],
+        "outputs": ["src/assets/situation4/route_summary.json", "src/assets/situation4/facet_index.json"],
+    },
+    "migration": {
+        "script": "generate_migration_data.py",
+        "sources": ["generate_migration_data.py", "counter_rng.py", "us_geometry.py"],
+        "args": ["--lod"],
+        "seeded": True,
+        "inputs": [USMAP_PATH],
+        "after": [],
+        "outputs": [os.path.join(MIGRATION_DIR, f"{stem}_{era}.json")
+                    for era in MIGRATION_ERAS for stem in ["migration", "migration_rate"]]
+                   + [os.path.join(MIGRATION_DIR, "migration_params.json")]
+                   + [os.path.join(MIGRATION_DIR, "lod", f"{stem}_{era}")
+                      for era in MIGRATION_ERAS for stem in ["migration", "migration_rate"]],
+    },
+    "migration-bundles": {
+        "script": "bundle_migration_flows.py",
+        "sources": ["bundle_migration_flows.py", "us_geometry.py"],
+        "args": [],
+        "seeded": False,
+        "inputs": [USMAP_PATH] + [os.path.join(MIGRATION_DIR, f"{stem}_{era}.json")
+                                  for era in MIGRATION_ERAS for stem in ["migration", "migration_rate"]],
+        "after": ["migration"],
+        "outputs": [os.path.join(MIGRATION_DIR, "bundled_flows.json")],
+    },
+    "packed-assets": {
+        "script": "package_assets.py",
+        "sources": ["package_assets.py"],
+        "args": [],
+        "seeded": False,
+        "inputs": [os.path.join("src/assets", d) for d in
+                   ["situation", "situation2", "situation3", "situation4", "traveldata", "domesticmigration"]],
+        "after": ["situation3-analysis", "situation3-index", "situation4-analysis", "situation4-index",
+                  "migration-bundles"],
+        "outputs": ["public/packed/manifest.json"],
+    },
+}
+
+
+class FileHashes:
+    """sha256 of files, cached in the manifest by (size, mtime) so unchanged files are not re-read."""
+
+    def __init__(self, cache: Dict[str, Dict]):
+        self.cache = cache
+
+    def get(self, path: str) -> Optional[str]:
+        """hash of the file at path, or None when it does not exist."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.cache.pop(path, None)
+            return None
+        entry = self.cache.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        self.cache[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        return self.cache[path]["sha256"]
+
+
+def load_manifest() -> Dict:
+    """the manifest of the previous build, or an empty one."""
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == BUILD_VERSION:
+            return manifest
+    return {"version": BUILD_VERSION, "files": {}, "targets": {}}
+
+
+def save_manifest(manifest: Dict):
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def target_command(name: str, seed: int) -> List[str]:
+    """command line of a target (run from the repository root)."""
+    target = TARGETS[name]
+    command = [sys.executable, os.path.join(SCRIPTS_DIR, target["script"])] + target["args"]
+    if target["seeded"]:
+        command += ["--seed", str(seed)]
+    return command
+
+
+def expand_inputs(paths: List[str]) -> List[str]:
+    """input (or output) paths with directories replaced by the files below them."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, filenames in os.walk(path):
+                files.extend(os.path.join(root, filename) for filename in filenames)
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def target_key(name: str, seed: int, hashes: FileHashes) -> str:
+    """content hash of everything that determines a target's outputs."""
+    target = TARGETS[name]
+    description = {
+        "version": BUILD_VERSION,
+        "args": target["args"],
+        "seed": seed if target["seeded"] else None,
+        "sources": {s: hashes.get(os.path.join(SCRIPTS_DIR, s)) for s in target["sources"]},
+        "inputs": {path: hashes.get(path) for path in expand_inputs(target["inputs"])},
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def is_fresh(name: str, key: str, manifest: Dict, hashes: FileHashes) -> bool:
+    """whether the recorded build of a target matches its key and its outputs are untouched."""
+    record = manifest["targets"].get(name)
+    if not record or record["key"] != key:
+        return False
+    return all(hashes.get(path) == digest for path, digest in record["outputs"].items())
+
+
+def resolve(names: List[str]) -> List[str]:
+    """the requested targets plus everything they depend on, in dependency order."""
+    order = []
+
+    def visit(name: str):
+        if name in order:
+            return
+        for dependency in TARGETS[name]["after"]:
+            visit(dependency)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+def run_target(name: str, seed: int) -> subprocess.CompletedProcess:
+    return subprocess.run(target_command(name, seed), capture_output=True, text=True)
+
+
+def build(names: List[str], seed: int, jobs: int, force: bool = False, dry_run: bool = False) -> Dict[str, str]:
+    """bring the given targets up to date; returns the state of every target
+    (fresh, built, stale for dry runs, failed or blocked when a dependency failed)."""
+    manifest = load_manifest()
+    hashes = FileHashes(manifest["files"])
+    pending = resolve(names)
+    states: Dict[str, str] = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            # keys are only computed once the dependencies are done, since they hash their outputs
+            progress = True
+            while progress:
+                progress = False
+                for name in list(pending):
+                    dependencies = [states.get(d) for d in TARGETS[name]["after"]]
+                    if any(state in ("failed", "blocked") for state in dependencies):
+                        states[name] = "blocked"
+                    elif any(state == "stale" for state in dependencies):
+                        states[name] = "stale"
+                    elif all(state in ("fresh", "built") for state in dependencies):
+                        key = target_key(name, seed, hashes)
+                        if not force and is_fresh(name, key, manifest, hashes):
+                            states[name] = "fresh"
+                        elif dry_run:
+                            states[name] = "stale"
+                        else:
+                            print(f"building {name}...")
+                            running[pool.submit(run_target, name, seed)] = (name, key, time.perf_counter())
+                            states[name] = "running"
+                    else:
+                        continue
+                    pending.remove(name)
+                    progress = True
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, key, started = running.pop(future)
+                result = future.result()
+                outputs = {path: hashes.get(path) for path in expand_inputs(TARGETS[name]["outputs"])}
+                missing = [path for path, digest in outputs.items() if digest is None]
+                if result.returncode != 0 or missing:
+                    states[name] = "failed"
+                    print(f"{name} failed (exit code {result.returncode}"
+                          + (f", missing {', '.join(missing)})" if missing else ")"))
+                    print(result.stdout + result.stderr)
+                    continue
+                states[name] = "built"
+                manifest["targets"][name] = {
+                    "key": key,
+                    "command": target_command(name, seed)[1:],
+                    "outputs": outputs,
+                    "seconds": round(time.perf_counter() - started, 2),
+                }
+                print(f"built {name} in {manifest['targets'][name]['seconds']}s")
+                # saved after every target so an interrupted build keeps its progress
+                save_manifest(manifest)
+
+    if not dry_run:
+        save_manifest(manifest)
+    return states
+
+
+def main():
+    """rebuild the generated assets whose inputs changed since the last build."""
+    parser = argparse.ArgumentParser(description="incrementally rebuild the generated assets")
+    parser.add_argument("targets", nargs="*", choices=[[]] + list(TARGETS),
+                        help="targets to build (default: all), dependencies are included")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed passed to the seeded generators")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="number of targets built at the same time")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the inputs did not change")
+    parser.add_argument("--dry-run", action="store_true", help="only report which targets are stale")
+    args = parser.parse_args()
+
+    if not os.path.isdir(SCRIPTS_DIR) or not os.path.isdir("src/assets"):
+        parser.error("run this from the repository root")
+
+    started = time.perf_counter()
+    states = build(args.targets or list(TARGETS), args.seed, args.jobs, args.force, args.dry_run)
+    for name, state in states.items():
+        print(f"  {name}: {state}")
+    print(f"done in {time.perf_counter() - started:.2f}s")
+    if any(state in ("failed", "blocked") for state in states.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
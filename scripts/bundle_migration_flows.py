@@ -0,0 +1,246 @@
+import json
+import math
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from us_geometry import (
+    EXCLUDED_STATES,
+    MAP_LEFT_OFFSET,
+    TOTAL_HEIGHT,
+    load_topology,
+    projected_state_centroids,
+)
+
+MIGRATION_DIR = "src/assets/domesticmigration"
+OUTPUT_PATH = os.path.join(MIGRATION_DIR, "bundled_flows.json")
+
+ERAS = ["1960s", "1990s", "2020s"]
+VIEW_FILES = {
+    "absolute": "migration_{era}.json",
+    "rate": "migration_rate_{era}.json",
+}
+
+# number of flows DoMi draws per era and view type
+TOP_FLOWS = 100
+
+# edge bundling parameters, kept in sync with the EDGE_BUNDLING_* constants in DoMi.tsx
+COMPATIBILITY_THRESHOLD = 0.1
+STIFFNESS = 0.4
+STEP_SIZE = 0.05
+CYCLES = 6
+ITERATIONS = 80
+ITERATIONS_RATE = 0.6666667
+SUBDIVISION_SEED = 1
+SUBDIVISION_RATE = 2
+
+EPS = 1e-6
+
+# polylines are stored as integer deltas of 1 / POINT_PRECISION pixels
+POINT_PRECISION = 10
+
+# fnv-1a parameters of source_hash, mirrored by hashMigrationSources in DoMi.tsx
+FNV_OFFSET = 0x811C9DC5
+FNV_PRIME = 0x01000193
+
+
+def compute_compatibility(sources: np.ndarray, targets: np.ndarray, threshold: float) -> np.ndarray:
+    """boolean (edges x edges) matrix of compatible edge pairs, using the four fdeb measures."""
+    vectors = targets - sources
+    lengths = np.linalg.norm(vectors, axis=1)
+    lengths = np.where(lengths < EPS, EPS, lengths)
+    midpoints = (sources + targets) / 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # angle compatibility
+        angle = np.abs(vectors @ vectors.T) / np.outer(lengths, lengths)
+
+        # scale compatibility
+        lavg = (lengths[:, None] + lengths[None, :]) / 2
+        lmin = np.minimum(lengths[:, None], lengths[None, :])
+        lmax = np.maximum(lengths[:, None], lengths[None, :])
+        scale = 2.0 / (lavg / lmin + lmax / lavg)
+
+        # position compatibility
+        mid_distance = np.linalg.norm(midpoints[:, None, :] - midpoints[None, :, :], axis=2)
+        position = lavg / (lavg + mid_distance)
+
+        # visibility compatibility: project q's end points onto the line through p
+        def visibility(p_src, p_tgt, q_src, q_tgt):
+            direction = p_tgt - p_src
+            length_sq = np.sum(direction ** 2, axis=-1)
+            r0 = np.sum((q_src - p_src) * direction, axis=-1) / length_sq
+            r1 = np.sum((q_tgt - p_src) * direction, axis=-1) / length_sq
+            i0 = p_src + r0[..., None] * direction
+            i1 = p_src + r1[..., None] * direction
+            mid_i = (i0 + i1) / 2
+            mid_p = (p_src + p_tgt) / 2
+            value = 1 - 2 * np.linalg.norm(mid_p - mid_i, axis=-1) / np.linalg.norm(i0 - i1, axis=-1)
+            return np.maximum(0, value)
+
+        p_src, p_tgt = sources[:, None, :], targets[:, None, :]
+        q_src, q_tgt = sources[None, :, :], targets[None, :, :]
+        visibility_score = np.minimum(
+            visibility(p_src, p_tgt, q_src, q_tgt),
+            visibility(q_src, q_tgt, p_src, p_tgt),
+        )
+
+        score = angle * scale * position * visibility_score
+
+    # nan scores (degenerate projections) never count as compatible, same as in the js version
+    compatible = np.nan_to_num(score, nan=-1.0) >= threshold
+    np.fill_diagonal(compatible, False)
+    return compatible
+
+
+def subdivide_edges(points: np.ndarray, segments: int) -> np.ndarray:
+    """resample every polyline into `segments` equal-length pieces (segments + 1 points)."""
+    deltas = np.linalg.norm(np.diff(points, axis=1), axis=2)
+    cumulative = np.concatenate([np.zeros((points.shape[0], 1)), np.cumsum(deltas, axis=1)], axis=1)
+    resampled = np.empty((points.shape[0], segments + 1, 2))
+    for e in range(points.shape[0]):
+        positions = np.linspace(0, cumulative[e, -1], segments + 1)
+        resampled[e, :, 0] = np.interp(positions, cumulative[e], points[e, :, 0])
+        resampled[e, :, 1] = np.interp(positions, cumulative[e], points[e, :, 1])
+    # keep the end points exact
+    resampled[:, 0] = points[:, 0]
+    resampled[:, -1] = points[:, -1]
+    return resampled
+
+
+def force_edge_bundling(sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """bundle straight edges with fdeb, vectorized over all edges and subdivision points.
+
+    mirrors src/utils/d3-ForceEdgeBundling.ts: forces for all points are computed
+    first and then applied together, and the iteration count decays by
+    ITERATIONS_RATE per cycle while the subdivision count grows by SUBDIVISION_RATE.
+    """
+    lengths = np.linalg.norm(targets - sources, axis=1)
+    lengths = np.where(lengths < EPS, EPS, lengths)
+    compatible = compute_compatibility(sources, targets, COMPATIBILITY_THRESHOLD).astype(float)
+
+    step = STEP_SIZE
+    iterations = float(ITERATIONS)
+    subdivisions = SUBDIVISION_SEED
+    points = subdivide_edges(np.stack([sources, targets], axis=1), subdivisions + 1)
+
+    for _ in range(CYCLES):
+        k_p = STIFFNESS / (lengths * (subdivisions + 1))
+        for _ in range(math.ceil(iterations)):
+            inner = points[:, 1:-1]
+
+            # spring force towards the neighbouring subdivision points
+            spring = (points[:, :-2] + points[:, 2:] - 2 * inner) * k_p[:, None, None]
+
+            # electrostatic attraction to the matching point on every compatible edge
+            diff = inner[None, :, :, :] - inner[:, None, :, :]
+            distance = np.linalg.norm(diff, axis=3)
+            active = (np.abs(diff) > EPS).any(axis=3)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                weight = np.where(active, 1.0 / distance, 0.0) * compatible[:, :, None]
+            electrostatic = np.einsum("eop,eopc->epc", weight, diff)
+
+            points[:, 1:-1] = inner + step * (spring + electrostatic)
+
+        step /= 2
+        subdivisions *= SUBDIVISION_RATE
+        iterations *= ITERATIONS_RATE
+        points = subdivide_edges(points, subdivisions + 1)
+
+    return points
+
+
+def load_migrations(era: str, view_type: str) -> List[Dict]:
+    path = os.path.join(MIGRATION_DIR, VIEW_FILES[view_type].format(era=era))
+    with open(path, "r") as f:
+        return json.load(f)["migrations"]
+
+
+def canonical_number(value):
+    # whole floats are written like ints, the way javascript prints them
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def source_hash(migrations_by_view: List[List[Dict]]) -> str:
+    """fnv-1a (32 bit, hex) over origin, destination and value of every migration of the
+    source files, in file order (eras, then absolute before rate). DoMi computes the same hash
+    over the files it loaded and ignores bundles made from other migration data."""
+    text = "".join(f"{m['origin']}\t{m['destination']}\t{json.dumps(canonical_number(m['value']))}\n"
+                   for migrations in migrations_by_view for m in migrations)
+    h = FNV_OFFSET
+    for byte in text.encode("utf-8"):
+        h = ((h ^ byte) * FNV_PRIME) & 0xFFFFFFFF
+    return f"{h:08x}"
+
+
+def top_flows(migrations: List[Dict], centroids: Dict[str, Tuple[float, float]]) -> List[Dict]:
+    """the largest flows of one era/view, dropping states that are not on the map."""
+    migrations = [
+        m for m in migrations
+        if m["origin"] not in EXCLUDED_STATES and m["destination"] not in EXCLUDED_STATES
+    ]
+    migrations.sort(key=lambda m: m["value"], reverse=True)
+    top = migrations[:TOP_FLOWS]
+    # same filtering as DoMi: skip self loops and states without a centroid
+    return [
+        m for m in top
+        if m["origin"] in centroids and m["destination"] in centroids
+        and centroids[m["origin"]] != centroids[m["destination"]]
+    ]
+
+
+def encode_path(path: np.ndarray) -> List[int]:
+    """encode a polyline as flat x/y deltas in tenths of a pixel (first pair is absolute)."""
+    tenths = np.rint(path * POINT_PRECISION).astype(int)
+    deltas = np.concatenate([tenths[:1], np.diff(tenths, axis=0)])
+    return deltas.ravel().tolist()
+
+
+def bundle_flows(flows: List[Dict], centroids: Dict[str, Tuple[float, float]]) -> List[Dict]:
+    """bundle a list of flows and return them with encoded polylines."""
+    if not flows:
+        return []
+    sources = np.array([centroids[m["origin"]] for m in flows])
+    targets = np.array([centroids[m["destination"]] for m in flows])
+    paths = force_edge_bundling(sources, targets)
+    return [
+        {
+            "origin": m["origin"],
+            "destination": m["destination"],
+            "value": m["value"],
+            "points": encode_path(path),
+        }
+        for m, path in zip(flows, paths)
+    ]
+
+
+def main():
+    """bundle the top flows of every era and view type and save them for DoMi."""
+    centroids = projected_state_centroids(load_topology())
+    sources = {(era, view_type): load_migrations(era, view_type) for era in ERAS for view_type in VIEW_FILES}
+    output = {
+        "top_flows": TOP_FLOWS,
+        "point_precision": POINT_PRECISION,
+        "offset": [round(MAP_LEFT_OFFSET, 3), round(-TOTAL_HEIGHT * 0.1, 3)],
+        "source_hash": source_hash(list(sources.values())),
+        "flows": {},
+    }
+
+    for era in ERAS:
+        output["flows"][era] = {}
+        for view_type in VIEW_FILES:
+            print(f"bundling {era} {view_type} flows...")
+            flows = top_flows(sources[(era, view_type)], centroids)
+            output["flows"][era][view_type] = bundle_flows(flows, centroids)
+            print(f"bundled {len(flows)} flows for {era} {view_type}")
+
+    # compact output: the file is loaded by the browser as-is
+    with open(OUTPUT_PATH, "w") as f:
+        json.dump(output, f, separators=(",", ":"))
+
+    print(f"bundled paths saved to {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
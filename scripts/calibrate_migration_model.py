@@ -0,0 +1,294 @@
+import argparse
+import json
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import generate_migration_data as model
+
+# expected value of the random neighbor boost, uniform(1.8, 2.5); the economic factor
+# uniform(0.7, 1.3) has expected value 1
+EXPECTED_NEIGHBOR_FACTOR = (1.8 + 2.5) / 2
+
+# search bounds for each kind of parameter
+EXPONENT_BOUNDS = (0.3, 1.2)
+LOG10_SCALE_BOUNDS = (3.0, 6.5)
+MULTIPLIER_BOUNDS = (0.5, 3.0)
+PENALTY_BOUNDS = (0.3, 1.2)
+
+# cross-entropy search settings
+POPULATION_SIZE = 2000
+ELITE_FRACTION = 0.05
+MAX_ITERATIONS = 60
+SMOOTHING = 0.7
+TOLERANCE = 1e-4
+
+# weight of the l2 pull towards the generator's current parameters (squared distance in units
+# of each parameter's search range, summed), so parameters the targets barely constrain stay
+# near their prior instead of drifting to a bound
+PRIOR_WEIGHT = 0.2
+
+# target table format (json list), one entry per target:
+#   {"era": "2020s", "origin": "CALIFORNIA", "destination": "TEXAS", "value": 102000}
+#   {"era": "2020s", "state": "TEXAS", "direction": "inflow", "value": 580000}
+# "direction" is "inflow" or "outflow" (totals over all other states), "weight" is optional.
+
+
+def era_states(era: str) -> List[str]:
+    """the states the model has for an era (the same list model_components uses)."""
+    return [s for s in model.STATE_POPULATIONS_2020S if s in model.ALL_STATE_POPULATIONS[era]]
+
+
+def load_targets(path: str) -> List[Dict]:
+    """load and sanity check the target table."""
+    with open(path, "r") as f:
+        targets = json.load(f)
+    if not isinstance(targets, list) or not targets:
+        raise ValueError(f"{path} has no targets, expected a non-empty json list")
+    for target in targets:
+        if target["era"] not in model.ERAS:
+            raise ValueError(f"unknown era in target: {target}")
+        states = era_states(target["era"])
+        for key in ("origin", "destination", "state"):
+            if key in target and target[key] not in states:
+                raise ValueError(f"unknown {key} state {target[key]!r} for the {target['era']} in target: {target}")
+        if "origin" in target and target["origin"] == target.get("destination"):
+            raise ValueError(f"flow targets need two different states: {target}")
+        if "state" in target and target.get("direction") not in ("inflow", "outflow"):
+            raise ValueError(f"total targets need a direction of inflow or outflow: {target}")
+        if target["value"] <= 0:
+            raise ValueError(f"target values must be positive: {target}")
+        if target.get("weight", 1.0) <= 0:
+            raise ValueError(f"target weights must be positive: {target}")
+    return targets
+
+
+def constrained_states(targets: List[Dict]) -> Tuple[set, set]:
+    """(era, state) pairs whose destination multiplier and whose origin penalty a target
+    depends on directly: flow targets fix both ends, inflow totals the destination and
+    outflow totals the origin."""
+    destinations = set()
+    origins = set()
+    for target in targets:
+        if "origin" in target:
+            origins.add((target["era"], target["origin"]))
+            destinations.add((target["era"], target["destination"]))
+        elif target["direction"] == "inflow":
+            destinations.add((target["era"], target["state"]))
+        else:
+            origins.add((target["era"], target["state"]))
+    return destinations, origins
+
+
+def build_parameter_layout(eras: List[str], targets: List[Dict]) -> Tuple[List[Tuple[str, str, str]], np.ndarray, np.ndarray, np.ndarray]:
+    """describe the parameter vector: (kind, era, state) per entry plus start values and bounds.
+    the population term is shared by all eras; multipliers and penalties are per era and
+    only cover the states the generator already has entries for and that a target depends
+    on directly, the others keep their current values."""
+    destinations, origins = constrained_states(targets)
+    layout = [
+        ("population_exponent_origin", "", ""),
+        ("population_exponent_destination", "", ""),
+        ("log10_population_scale", "", ""),
+    ]
+    start = [model.POPULATION_EXPONENT_ORIGIN, model.POPULATION_EXPONENT_DESTINATION,
+             np.log10(model.POPULATION_SCALE)]
+    bounds = [EXPONENT_BOUNDS, EXPONENT_BOUNDS, LOG10_SCALE_BOUNDS]
+    for era in eras:
+        for state, value in model.ALL_DESTINATION_MULTIPLIERS[era].items():
+            if (era, state) not in destinations:
+                continue
+            layout.append(("destination_multiplier", era, state))
+            start.append(value)
+            bounds.append(MULTIPLIER_BOUNDS)
+        for state, value in model.ORIGIN_PENALTIES.get(era, {}).items():
+            if (era, state) not in origins:
+                continue
+            layout.append(("origin_penalty", era, state))
+            start.append(value)
+            bounds.append(PENALTY_BOUNDS)
+    bounds = np.array(bounds, dtype=float)
+    return layout, np.array(start, dtype=float), bounds[:, 0], bounds[:, 1]
+
+
+class EraProblem:
+    """fixed inputs and targets of one era, scored in batches of parameter vectors."""
+
+    def __init__(self, era: str, targets: List[Dict], layout: List[Tuple[str, str, str]],
+                 distance_model: str):
+        states, populations, distance, neighbors = model.model_components(era, distance_model)
+        index = {s: i for i, s in enumerate(states)}
+        self.n = len(states)
+        self.log_population = np.log(populations)
+
+        # everything that does not depend on the parameters, in log space
+        fixed = distance * np.where(neighbors, EXPECTED_NEIGHBOR_FACTOR, 1.0)
+        np.fill_diagonal(fixed, 1.0)
+        self.log_fixed = np.log(fixed)
+        self.off_diagonal = ~np.eye(self.n, dtype=bool)
+
+        # where each parameter of this era lands in the destination / origin vectors
+        self.destination_params = [(p, index[state]) for p, (kind, e, state) in enumerate(layout)
+                                   if kind == "destination_multiplier" and e == era and state in index]
+        self.origin_params = [(p, index[state]) for p, (kind, e, state) in enumerate(layout)
+                              if kind == "origin_penalty" and e == era and state in index]
+
+        flows = [t for t in targets if "origin" in t]
+        totals = [t for t in targets if "state" in t]
+        self.flow_origin = np.array([index[t["origin"]] for t in flows], dtype=int)
+        self.flow_destination = np.array([index[t["destination"]] for t in flows], dtype=int)
+        self.flow_log_target = np.log([t["value"] for t in flows])
+        self.flow_weight = np.array([t.get("weight", 1.0) for t in flows])
+        self.total_state = np.array([index[t["state"]] for t in totals], dtype=int)
+        self.total_inflow = np.array([t["direction"] == "inflow" for t in totals], dtype=bool)
+        self.total_log_target = np.log([t["value"] for t in totals])
+        self.total_weight = np.array([t.get("weight", 1.0) for t in totals])
+
+    def expected_log_flows(self, theta: np.ndarray) -> np.ndarray:
+        """(candidates x origin x destination) log expected flows for a batch of parameter vectors."""
+        k = theta.shape[0]
+        log_destination = np.zeros((k, self.n))
+        log_origin = np.zeros((k, self.n))
+        for p, i in self.destination_params:
+            log_destination[:, i] = np.log(theta[:, p])
+        for p, i in self.origin_params:
+            log_origin[:, i] = np.log(theta[:, p])
+
+        log_origin += theta[:, 0:1] * self.log_population[None, :]
+        log_destination += theta[:, 1:2] * self.log_population[None, :]
+        log_origin -= theta[:, 2:3] * np.log(10)
+        return log_origin[:, :, None] + log_destination[:, None, :] + self.log_fixed[None, :, :]
+
+    def squared_errors(self, theta: np.ndarray) -> Tuple[np.ndarray, float]:
+        """weighted sum of squared log errors per candidate, and the total weight."""
+        log_flows = self.expected_log_flows(theta)
+        loss = np.zeros(theta.shape[0])
+        if len(self.flow_log_target):
+            predicted = log_flows[:, self.flow_origin, self.flow_destination]
+            loss += ((predicted - self.flow_log_target) ** 2 * self.flow_weight).sum(axis=1)
+        if len(self.total_log_target):
+            flows = np.exp(log_flows) * self.off_diagonal
+            inflow = flows.sum(axis=1)[:, self.total_state]
+            outflow = flows.sum(axis=2)[:, self.total_state]
+            predicted = np.log(np.where(self.total_inflow, inflow, outflow))
+            loss += ((predicted - self.total_log_target) ** 2 * self.total_weight).sum(axis=1)
+        return loss, float(self.flow_weight.sum() + self.total_weight.sum())
+
+
+def score(problems: List[EraProblem], theta: np.ndarray) -> np.ndarray:
+    """weighted mean squared log error of every candidate parameter vector."""
+    loss = np.zeros(theta.shape[0])
+    weight = 0.0
+    for problem in problems:
+        era_loss, era_weight = problem.squared_errors(theta)
+        loss += era_loss
+        weight += era_weight
+    return loss / weight
+
+
+def prior_penalty(theta: np.ndarray, start: np.ndarray, lower: np.ndarray, upper: np.ndarray,
+                  prior_weight: float) -> np.ndarray:
+    """l2 distance of every candidate from the start values, scaled by the search ranges."""
+    return prior_weight * (((theta - start) / (upper - lower)) ** 2).sum(axis=1)
+
+
+def objective(problems: List[EraProblem], theta: np.ndarray, start: np.ndarray, lower: np.ndarray,
+              upper: np.ndarray, prior_weight: float) -> np.ndarray:
+    return score(problems, theta) + prior_penalty(theta, start, lower, upper, prior_weight)
+
+
+def calibrate(problems: List[EraProblem], start: np.ndarray, lower: np.ndarray, upper: np.ndarray,
+              seed: int = 0, prior_weight: float = PRIOR_WEIGHT) -> Tuple[np.ndarray, float, int, float]:
+    """cross-entropy search over the bounded parameter box, scoring whole populations at once.
+    the objective is the mean squared log error plus the l2 pull towards start.
+    returns (best_parameters, best_objective, evaluations, seconds)."""
+    rng = np.random.default_rng(seed)
+    mean = start.copy()
+    std = (upper - lower) / 4
+    best = start.copy()
+    best_loss = float(objective(problems, start[None, :], start, lower, upper, prior_weight)[0])
+    elite_count = max(2, int(POPULATION_SIZE * ELITE_FRACTION))
+    evaluations = 1
+
+    started = time.perf_counter()
+    for iteration in range(MAX_ITERATIONS):
+        candidates = np.clip(rng.normal(mean, std, (POPULATION_SIZE, len(mean))), lower, upper)
+        candidates[0] = best  # keep the incumbent
+        losses = objective(problems, candidates, start, lower, upper, prior_weight)
+        evaluations += len(candidates)
+
+        order = np.argsort(losses)
+        elites = candidates[order[:elite_count]]
+        if losses[order[0]] < best_loss:
+            best_loss = float(losses[order[0]])
+            best = candidates[order[0]].copy()
+
+        mean = SMOOTHING * elites.mean(axis=0) + (1 - SMOOTHING) * mean
+        std = SMOOTHING * elites.std(axis=0) + (1 - SMOOTHING) * std
+        print(f"  iteration {iteration + 1}: best objective {best_loss:.5f}")
+        if np.all(std < TOLERANCE * (upper - lower)):
+            break
+    return best, best_loss, evaluations, time.perf_counter() - started
+
+
+def to_calibration(layout: List[Tuple[str, str, str]], theta: np.ndarray) -> Dict:
+    """turn a parameter vector into the file format read by generate_migration_data.apply_calibration."""
+    calibration = {
+        "population_exponent_origin": round(float(theta[0]), 4),
+        "population_exponent_destination": round(float(theta[1]), 4),
+        "population_scale": round(float(10 ** theta[2]), 1),
+        "destination_multipliers": {},
+        "origin_penalties": {},
+    }
+    for (kind, era, state), value in zip(layout, theta):
+        if kind == "destination_multiplier":
+            calibration["destination_multipliers"].setdefault(era, {})[state] = round(float(value), 3)
+        elif kind == "origin_penalty":
+            calibration["origin_penalties"].setdefault(era, {})[state] = round(float(value), 3)
+    return calibration
+
+
+def main():
+    """fit the migration model parameters to a table of target flows or totals."""
+    parser = argparse.ArgumentParser(description="calibrate the synthetic migration model")
+    parser.add_argument("targets", help="json table of target flows or totals")
+    parser.add_argument("--output", default="scripts/migration_calibration.json",
+                        help="where to write the fitted parameters")
+    parser.add_argument("--distance-model", choices=model.DISTANCE_MODELS, default="regions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prior-weight", type=float, default=PRIOR_WEIGHT,
+                        help="weight of the l2 pull towards the current parameters (0 disables it)")
+    args = parser.parse_args()
+
+    targets = load_targets(args.targets)
+    eras = [era for era in model.ERAS if any(t["era"] == era for t in targets)]
+    layout, start, lower, upper = build_parameter_layout(eras, targets)
+    problems = [EraProblem(era, [t for t in targets if t["era"] == era], layout, args.distance_model)
+                for era in eras]
+
+    print(f"fitting {len(layout)} parameters to {len(targets)} targets across {', '.join(eras)}...")
+    initial_loss = float(score(problems, start[None, :])[0])
+    best, _, evaluations, seconds = calibrate(problems, np.clip(start, lower, upper), lower, upper,
+                                              args.seed, args.prior_weight)
+    best_loss = float(score(problems, best[None, :])[0])
+    penalty = float(prior_penalty(best[None, :], np.clip(start, lower, upper), lower, upper, args.prior_weight)[0])
+    print(f"scored {evaluations:,} parameter sets in {seconds:.2f}s ({evaluations / seconds:,.0f} per second)")
+    print(f"mean squared log error: {initial_loss:.5f} -> {best_loss:.5f} (prior penalty {penalty:.5f})")
+
+    print("\nfitted parameters:")
+    for (kind, era, state), old, new in zip(layout, start, best):
+        label = " ".join(part for part in (kind, era, state) if part)
+        print(f"  {label}: {old:.3f} -> {new:.3f}")
+
+    calibration = to_calibration(layout, best)
+    calibration["loss"] = round(best_loss, 6)
+    calibration["targets"] = len(targets)
+    with open(args.output, "w") as f:
+        json.dump(calibration, f, indent=2)
+    print(f"\ncalibration saved to {args.output}")
+    print(f"apply it with: python scripts/generate_migration_data.py --calibration {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+import importlib
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from counter_rng import CounterRandom
+from flight_shards import date_range
+from phase_profiler import PhaseProfiler
+from puzzle_constraints import CompiledSpec, build_spec
+from reroll_telemetry import record_slot, route_telemetry
+
+# scenario-independent machinery of the flight puzzle generators: route blocks, the
+# rejection-sampled interest and filler flights, schedules, difficulty knobs and parallel
+# generation. every function takes the scenario, a generator module that defines the
+# per-scenario config and pricing:
+#   airports, airlines, PUZZLE_CONFIG, DIFFICULTY, POINTS_OF_INTEREST, PUZZLE_AIRLINES,
+#   INTEREST_DATES, FILLER_DATES (first date and default length of each date window),
+#   DATE_WINDOW_DAYS, PUZZLE_RULES, calculate_flight_price, get_airline_for_route and
+#   generate_solution_flights.
+
+# departures are scheduled between 06:00 and 23:00 (utc) in 5 minute steps
+FIRST_DEPARTURE_MINUTE = 6 * 60
+LAST_DEPARTURE_MINUTE = 23 * 60
+
+# solution-block flights to the same destination on the same date land within this many
+# minutes of each other, so the solutions also satisfy a --arrival-window-hours constraint
+SOLUTION_ARRIVAL_SPREAD_MINUTES = 60
+# their common arrival is placed up to this long after the earliest possible one
+SOLUTION_ARRIVAL_RANGE_MINUTES = 8 * 60
+
+# draws per slot before a route falls back to an expensive flight on another airline
+INTEREST_MAX_ATTEMPTS = 50
+FILLER_MAX_ATTEMPTS = 30
+# candidate slots of every filler route
+FILLER_SLOTS_PER_ROUTE = 5
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """calculate the great-circle distance between two points on earth using the haversine formula."""
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+    c = 2 * math.asin(math.sqrt(a))
+    r = 6371  # earth's radius in kilometers
+    return c * r
+
+
+def calculate_flight_time(distance_km, rng):
+    """calculate realistic flight time based on distance."""
+    base_speed = 800 if distance_km > 2000 else 600
+    base_time = distance_km / base_speed
+    deviation = rng.uniform(-0.15, 0.15)
+    flight_time = base_time * (1 + deviation)
+    return max(1.0, round(flight_time, 1))
+
+
+def puzzle_users(scenario) -> Dict:
+    """the two friends of PUZZLE_CONFIG in the puzzle_description.json user format."""
+    return {
+        user: {
+            "name": friend["name"],
+            "description": friend["description"],
+            "origin_airport": friend["origin"],
+            "available_dates": friend["available_dates"],
+            "preferred_airlines": friend["preferred_airlines"],
+            "max_budget": friend["max_budget"]
+        }
+        for user, friend in [("user_1", scenario.PUZZLE_CONFIG["friend_a"]),
+                             ("user_2", scenario.PUZZLE_CONFIG["friend_b"])]
+    }
+
+
+def puzzle_rules(scenario) -> CompiledSpec:
+    """the puzzle rules used by the reroll checks. flights are scheduled after they are
+    accepted, so an arrival window is not part of these checks, which keeps them conservative."""
+    return CompiledSpec(build_spec(scenario.PUZZLE_CONFIG["rules"]), puzzle_users(scenario))
+
+
+def would_create_unintended_solution(scenario, origin, destination, date, price, airline_code,
+                                     existing_flights) -> bool:
+    """check if this flight would create a solution in a non-solution city."""
+    rules = scenario.PUZZLE_RULES
+    # if this destination is a solution city, it's allowed
+    if destination in {sol["airport"] for sol in scenario.PUZZLE_CONFIG["solution_destinations"]}:
+        return False
+
+    candidate = {"origin": origin, "destination": destination, "date": date, "price": price,
+                 "airline": {"code": airline_code}}
+
+    # check if this could be a valid flight for one user that pairs with an existing flight of the other
+    for user, other in [("user_1", "user_2"), ("user_2", "user_1")]:
+        if not rules.flight_ok(candidate, user):
+            continue
+        for flight in existing_flights:
+            if rules.flight_ok(flight, other) and rules.failed_pair_rule(candidate, flight, skip_missing=True) is None:
+                return True
+
+    # also check if this flight would make it possible for future flights to create solutions
+    # by being too perfect (a flight both users could take)
+    return rules.flight_ok(candidate, "user_1") and rules.flight_ok(candidate, "user_2")
+
+
+def route_distance(scenario, origin: str, destination: str) -> float:
+    airport_dict = {a["IATA"]: a for a in scenario.airports}
+    origin_airport = airport_dict[origin]
+    dest_airport = airport_dict[destination]
+    return calculate_distance(origin_airport["Latitude"], origin_airport["Longitude"],
+                              dest_airport["Latitude"], dest_airport["Longitude"])
+
+
+def window_dates(scenario, window: Tuple[datetime, int]) -> List[str]:
+    """the dates of a (first date, default days) window, DATE_WINDOW_DAYS long if that is set."""
+    start, days = window
+    return date_range(start, scenario.DATE_WINDOW_DAYS or days)
+
+
+def generate_route_block(scenario, seed, kind, origin, destination, slots, start_flight_id, telemetry=None,
+                         avoid_dates=()) -> List[Dict]:
+    """generate the flights of one interest or filler route, rerolling every slot until it
+    passes the checks and falling back to an expensive flight on an airline outside
+    PUZZLE_AIRLINES after the kind's max attempts.
+
+    slot i draws from the stream keyed by (seed, kind, route, i), so a route can be generated
+    on its own and in any order. the unintended solution check only needs earlier flights
+    from the friends' origin to the same destination, which (both friends flying from the
+    same airport) are the earlier slots of this route. rerolls are counted in telemetry."""
+    flights = []
+    telemetry = route_telemetry() if telemetry is None else telemetry
+    flight_id = start_flight_id
+    if kind == "interest":
+        all_dates = window_dates(scenario, scenario.INTEREST_DATES)
+        max_attempts = INTEREST_MAX_ATTEMPTS
+    else:
+        all_dates = window_dates(scenario, scenario.FILLER_DATES)
+        max_attempts = FILLER_MAX_ATTEMPTS
+    distance = route_distance(scenario, origin, destination)
+
+    for slot in slots:
+        rng = CounterRandom(seed, kind, origin, destination, slot)
+        flight_time = calculate_flight_time(distance, rng)
+
+        # generate flight with rerolling to avoid unintended solutions
+        for attempt in range(max_attempts):
+            price = scenario.calculate_flight_price(distance, flight_time, rng)
+            date = rng.choice(all_dates)
+            airline = scenario.get_airline_for_route(origin, destination, rng)
+
+            # avoid duplicating any solution flights
+            if date in avoid_dates:
+                telemetry["rejections"]["solution_date"] += 1
+                continue
+
+            if would_create_unintended_solution(scenario, origin, destination, date, price, airline["code"], flights):
+                telemetry["rejections"]["unintended_solution"] += 1
+                continue
+
+            # if we get here, the flight is acceptable
+            record_slot(telemetry, attempt + 1)
+            break
+        else:
+            # if we can't find a good flight after max attempts, use fallback values
+            record_slot(telemetry, max_attempts, fallback=True)
+            price = scenario.calculate_flight_price(distance, flight_time, rng) * 2  # make it expensive
+            date = rng.choice(all_dates)
+            airline = rng.choice([a for a in scenario.airlines if a["code"] not in scenario.PUZZLE_AIRLINES])
+
+        flights.append({
+            "id": flight_id,
+            "origin": origin,
+            "destination": destination,
+            "price": price,
+            "duration": flight_time,
+            "date": date,
+            "distance_km": round(distance, 1),
+            "airline": airline
+        })
+        flight_id += 1
+
+    return flights
+
+
+def generate_interest_block(scenario, seed, origin, destination, slots, start_flight_id, telemetry=None):
+    """generate the flights of one point of interest route; no flight lands on a solution
+    date of the route, so the planted solutions are not duplicated."""
+    config = scenario.PUZZLE_CONFIG
+    solution_dates = {solution["date"] for solution in config["solution_destinations"]
+                      if destination == solution["airport"]
+                      and origin in (config["friend_a"]["origin"], config["friend_b"]["origin"])}
+    return generate_route_block(scenario, seed, "interest", origin, destination, slots, start_flight_id, telemetry,
+                                solution_dates)
+
+
+def generate_filler_block(scenario, seed, origin, destination, slots, start_flight_id, telemetry=None):
+    """generate the filler flights of one route."""
+    return generate_route_block(scenario, seed, "filler", origin, destination, slots, start_flight_id, telemetry)
+
+
+def interest_route_blocks(scenario, seed) -> List[Tuple[str, str, int]]:
+    """(origin, destination, number of flights) of every interest route, in flight id order.
+    the number is drawn from the route's own stream within DIFFICULTY's range."""
+    blocks = []
+    low, high = scenario.DIFFICULTY["interest_flights_per_route"]
+    for origin, destinations in scenario.POINTS_OF_INTEREST.items():
+        for destination in destinations:
+            num_flights = high if low == high else CounterRandom(seed, "interest-count", origin, destination).randint(low, high)
+            blocks.append((origin, destination, num_flights))
+    return blocks
+
+
+def filler_route_blocks(scenario, seed, start_flight_id, target_total=5000) -> List[Tuple[str, str, List[int]]]:
+    """(origin, destination, slots) of the filler routes, in flight id order.
+
+    every route that is not covered by the puzzle has FILLER_SLOTS_PER_ROUTE slots. each slot
+    gets a priority from its own stream and the highest priorities are kept, so the routes
+    are chosen without generating any flights."""
+    config = scenario.PUZZLE_CONFIG
+    iata_codes = [a["IATA"] for a in scenario.airports]
+
+    # interest and solution routes are already covered
+    covered_routes = {(origin, destination) for origin, destinations in scenario.POINTS_OF_INTEREST.items()
+                      for destination in destinations}
+    for solution in config["solution_destinations"]:
+        covered_routes.add((config["friend_a"]["origin"], solution["airport"]))
+        covered_routes.add((config["friend_b"]["origin"], solution["airport"]))
+
+    candidates = []
+    for origin in iata_codes:
+        for destination in iata_codes:
+            if origin == destination or (origin, destination) in covered_routes:
+                continue
+            for slot in range(FILLER_SLOTS_PER_ROUTE):
+                priority = CounterRandom(seed, "filler-slot", origin, destination, slot).random()
+                candidates.append((priority, origin, destination, slot))
+
+    num_flights = target_total - start_flight_id + 1
+    if num_flights > len(candidates):
+        raise ValueError(f"only {len(candidates)} filler flights fit on the uncovered routes, lower the total")
+
+    slots_by_route = {}
+    for _, origin, destination, slot in sorted(candidates, reverse=True)[:max(0, num_flights)]:
+        slots_by_route.setdefault((origin, destination), []).append(slot)
+    return [(origin, destination, sorted(slots_by_route[(origin, destination)]))
+            for origin in iata_codes for destination in iata_codes
+            if (origin, destination) in slots_by_route]
+
+
+def flight_blocks(scenario, seed, target_total=5000) -> List[Dict]:
+    """every block of flights in id order, as dicts with kind, origin, destination, slots and
+    start_id. only slot counts are drawn here, so any block can then be generated on its own."""
+    solution_count = len(scenario.generate_solution_flights(seed))
+    blocks = [{"kind": "solution", "origin": None, "destination": None,
+               "slots": list(range(solution_count)), "start_id": 1}]
+    next_id = 1 + solution_count
+    for origin, destination, num_flights in interest_route_blocks(scenario, seed):
+        blocks.append({"kind": "interest", "origin": origin, "destination": destination,
+                       "slots": list(range(num_flights)), "start_id": next_id})
+        next_id += num_flights
+    for origin, destination, slots in filler_route_blocks(scenario, seed, next_id, target_total):
+        blocks.append({"kind": "filler", "origin": origin, "destination": destination,
+                       "slots": slots, "start_id": next_id})
+        next_id += len(slots)
+    return blocks
+
+
+def add_schedule(seed, flights, aligned=False) -> List[Dict]:
+    """give every flight a departure time on its date and the matching arrival (date plus
+    duration), as utc "YYYY-MM-DDTHH:MM" strings. times come from a stream keyed by the
+    flight id, so they do not change any other field. with aligned (the solution block)
+    flights sharing a destination and date are scheduled backwards from a common arrival."""
+    anchors = {}
+    if aligned:
+        for flight in flights:
+            key = (flight["destination"], flight["date"])
+            anchors[key] = max(anchors.get(key, 0), round(flight["duration"] * 60))
+        for key, longest in anchors.items():
+            # minutes after midnight; even the longest flight of the group leaves after FIRST_DEPARTURE_MINUTE
+            rng = CounterRandom(seed, "schedule", *key)
+            anchors[key] = FIRST_DEPARTURE_MINUTE + longest + rng.randint(0, SOLUTION_ARRIVAL_RANGE_MINUTES // 5) * 5
+    for flight in flights:
+        rng = CounterRandom(seed, "schedule", flight["id"])
+        midnight = datetime.strptime(flight["date"], "%Y-%m-%d")
+        duration = timedelta(minutes=round(flight["duration"] * 60))
+        if aligned:
+            minute = anchors[(flight["destination"], flight["date"])]
+            arrival = midnight + timedelta(minutes=minute + rng.randint(0, SOLUTION_ARRIVAL_SPREAD_MINUTES // 5) * 5)
+            departure = arrival - duration
+        else:
+            minute = rng.randint(FIRST_DEPARTURE_MINUTE // 5, LAST_DEPARTURE_MINUTE // 5) * 5
+            departure = midnight + timedelta(minutes=minute)
+            arrival = departure + duration
+        flight["departure"] = departure.strftime("%Y-%m-%dT%H:%M")
+        flight["arrival"] = arrival.strftime("%Y-%m-%dT%H:%M")
+    return flights
+
+
+def generate_block(scenario, seed, block, telemetry=None) -> List[Dict]:
+    """generate the (scheduled) flights of one block from flight_blocks."""
+    if block["kind"] == "solution":
+        flights = scenario.generate_solution_flights(seed)
+    elif block["kind"] == "interest":
+        flights = generate_interest_block(scenario, seed, block["origin"], block["destination"], block["slots"],
+                                          block["start_id"], telemetry)
+    else:
+        flights = generate_filler_block(scenario, seed, block["origin"], block["destination"], block["slots"],
+                                        block["start_id"], telemetry)
+    return add_schedule(seed, flights, aligned=block["kind"] == "solution")
+
+
+def generate_flight(scenario, seed, flight_id, target_total=5000) -> Dict:
+    """generate a single flight by id, only generating the block it belongs to."""
+    for block in flight_blocks(scenario, seed, target_total):
+        if block["start_id"] <= flight_id < block["start_id"] + len(block["slots"]):
+            return generate_block(scenario, seed, block)[flight_id - block["start_id"]]
+    raise ValueError(f"no flight with id {flight_id}")
+
+
+def set_date_window(scenario, days: Optional[int]):
+    """set the scenario's DATE_WINDOW_DAYS."""
+    scenario.DATE_WINDOW_DAYS = days
+
+
+def difficulty_knobs(scenario) -> Dict:
+    """the current budgets and DIFFICULTY values, in the form apply_difficulty takes."""
+    config = scenario.PUZZLE_CONFIG
+    return dict(scenario.DIFFICULTY, user_1_budget=config["friend_a"]["max_budget"],
+                user_2_budget=config["friend_b"]["max_budget"])
+
+
+def apply_difficulty(scenario, knobs: Dict):
+    """set the user budgets (in PUZZLE_CONFIG, their descriptions and PUZZLE_RULES) and the
+    DIFFICULTY values from a knobs dict, e.g. the one tune_difficulty.py writes."""
+    config = scenario.PUZZLE_CONFIG
+    for key, friend in [("user_1_budget", "friend_a"), ("user_2_budget", "friend_b")]:
+        if key in knobs:
+            config[friend]["max_budget"] = knobs[key]
+            config[friend]["description"] = re.sub(r"\$\d+", f"${knobs[key]}", config[friend]["description"])
+    scenario.DIFFICULTY.update({key: value for key, value in knobs.items() if key in scenario.DIFFICULTY})
+    scenario.PUZZLE_RULES = puzzle_rules(scenario)
+
+
+def scenario_name(scenario) -> str:
+    """importable name of a generator module, also when it runs as __main__."""
+    return os.path.splitext(os.path.basename(scenario.__file__))[0]
+
+
+def init_worker(name: str, days: Optional[int], knobs: Dict):
+    """give a worker process the parent's date window and difficulty."""
+    scenario = importlib.import_module(name)
+    set_date_window(scenario, days)
+    apply_difficulty(scenario, knobs)
+
+
+def generate_block_telemetry(scenario, seed, block) -> Tuple[List[Dict], Dict]:
+    """generate_block, also returning the block's reroll telemetry."""
+    telemetry = route_telemetry()
+    return generate_block(scenario, seed, block, telemetry), telemetry
+
+
+def worker_block_telemetry(name: str, seed, block) -> Tuple[List[Dict], Dict]:
+    """generate_block_telemetry in a worker process, where the scenario is passed by name."""
+    return generate_block_telemetry(importlib.import_module(name), seed, block)
+
+
+def generate_flights(scenario, seed, target_total=5000, jobs=1, profiler=None) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    """generate every block, in parallel worker processes when jobs > 1.
+    returns the blocks, all flights in id order and the reroll telemetry of every block.
+    the blocks of each kind are one profiler phase; blocks come in kind order, so this
+    keeps the id order."""
+    profiler = profiler or PhaseProfiler("generate_flights")
+    with profiler.phase("blocks"):
+        blocks = flight_blocks(scenario, seed, target_total)
+    pool = None
+    if jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                   initargs=(scenario_name(scenario), scenario.DATE_WINDOW_DAYS,
+                                             difficulty_knobs(scenario)))
+    results = []
+    try:
+        for kind in ["solution", "interest", "filler"]:
+            kind_blocks = [block for block in blocks if block["kind"] == kind]
+            with profiler.phase(kind):
+                if pool:
+                    results.extend(pool.map(worker_block_telemetry, [scenario_name(scenario)] * len(kind_blocks),
+                                            [seed] * len(kind_blocks), kind_blocks, chunksize=16))
+                else:
+                    results.extend(generate_block_telemetry(scenario, seed, block) for block in kind_blocks)
+    finally:
+        if pool:
+            pool.shutdown()
+    return blocks, [flight for block_flights, _ in results for flight in block_flights], [t for _, t in results]
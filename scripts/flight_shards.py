@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# date-partitioned flight tables: instead of one flights.json, a scenario can store one
+# file per departure date under flights/ plus a manifest with the count and price range of
+# every shard, so readers only load the dates (and price ranges) they actually need.
+
+SHARD_DIRNAME = "flights"
+MANIFEST_FILENAME = "manifest.json"
+FLIGHTS_FILENAME = "flights.json"
+
+
+def date_range(start: datetime, days: int) -> List[str]:
+    """`days` consecutive dates starting at start, formatted like the flight dates."""
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+
+
+def has_flight_shards(assets_dir: str) -> bool:
+    return os.path.exists(os.path.join(assets_dir, SHARD_DIRNAME, MANIFEST_FILENAME))
+
+
+def remove_flight_shards(assets_dir: str):
+    """delete the shard directory, used when a scenario is written as a single flights.json again."""
+    shutil.rmtree(os.path.join(assets_dir, SHARD_DIRNAME), ignore_errors=True)
+
+
+def write_flight_shards(flights: List[Dict], assets_dir: str) -> Dict:
+    """write one json file per date plus the shard manifest; returns the manifest.
+    a single flights.json left over from an unsharded run is removed."""
+    remove_flight_shards(assets_dir)
+    shard_dir = os.path.join(assets_dir, SHARD_DIRNAME)
+    os.makedirs(shard_dir)
+
+    by_date = {}
+    for flight in flights:
+        by_date.setdefault(flight["date"], []).append(flight)
+
+    shards = []
+    for date in sorted(by_date):
+        shard = by_date[date]
+        filename = f"{date}.json"
+        with open(os.path.join(shard_dir, filename), "w") as f:
+            json.dump(shard, f, indent=2)
+        prices = [flight["price"] for flight in shard]
+        shards.append({
+            "date": date,
+            "file": f"{SHARD_DIRNAME}/{filename}",
+            "count": len(shard),
+            "min_price": min(prices),
+            "max_price": max(prices),
+        })
+
+    manifest = {
+        "shard_key": "date",
+        "count": len(flights),
+        "min_date": shards[0]["date"] if shards else None,
+        "max_date": shards[-1]["date"] if shards else None,
+        "shards": shards,
+    }
+    with open(os.path.join(shard_dir, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    flights_path = os.path.join(assets_dir, FLIGHTS_FILENAME)
+    if os.path.exists(flights_path):
+        os.remove(flights_path)
+    return manifest
+
+
+def load_flight_shards(assets_dir: str, dates: Optional[Iterable[str]] = None,
+                       max_price: Optional[float] = None) -> Tuple[List[Dict], Dict]:
+    """load the flights of the shards that overlap `dates` and have a flight at or below
+    `max_price` (None means no restriction). returns the flights sorted by id and the manifest."""
+    with open(os.path.join(assets_dir, SHARD_DIRNAME, MANIFEST_FILENAME), "r") as f:
+        manifest = json.load(f)
+    dates = set(dates) if dates is not None else None
+
+    flights = []
+    for shard in manifest["shards"]:
+        if dates is not None and shard["date"] not in dates:
+            continue
+        if max_price is not None and shard["min_price"] > max_price:
+            continue
+        with open(os.path.join(assets_dir, shard["file"]), "r") as f:
+            flights.extend(json.load(f))
+    flights.sort(key=lambda flight: flight["id"])
+    return flights, manifest
+
+
+def load_flights(assets_dir: str) -> List[Dict]:
+    """every flight of a scenario, whether it is stored as flights.json or as date shards."""
+    if has_flight_shards(assets_dir):
+        return load_flight_shards(assets_dir)[0]
+    with open(os.path.join(assets_dir, FLIGHTS_FILENAME), "r") as f:
+        return json.load(f)
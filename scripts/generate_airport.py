@@ -1,8 +1,21 @@
+import argparse
 import json
 import random
 import os
-import math
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime
+
+from counter_rng import CounterRandom
+from flight_scenario import (SOLUTION_ARRIVAL_SPREAD_MINUTES, apply_difficulty, calculate_distance,
+                             calculate_flight_time, generate_flights, puzzle_rules, puzzle_users, set_date_window)
+from flight_shards import remove_flight_shards, write_flight_shards
+from phase_profiler import add_profile_arguments, profiler_from_args
+from puzzle_constraints import build_spec
+from reroll_telemetry import phase_line, summarize, write_telemetry
+
+# this module is the scenario the flight_scenario functions take: the config and pricing
+# below, the block, schedule and difficulty machinery is shared with the other generators
+SCENARIO = sys.modules[__name__]
 
 # Step 1: Define airports with lat/lon
 airports = [
@@ -115,6 +128,9 @@ PUZZLE_CONFIG = {
     "destination_region": "europe",
     "common_airline": "AC",  # air canada
     "overlap_dates": ["2025-06-10", "2025-06-11", "2025-06-12"],  # when both are available
+    # extra per-flight rules in the puzzle_constraints spec format, e.g.
+    # {"field": "duration", "op": "le", "value": 12}; the base rules come from the friends above
+    "rules": [],
     "solution_destinations": [
         {"airport": "BUD", "date": "2025-06-11"},  # budapest on june 11
         {"airport": "ARN", "date": "2025-06-10"},  # stockholm on june 10
@@ -122,6 +138,15 @@ PUZZLE_CONFIG = {
     ]
 }
 
+# difficulty knobs; tune_difficulty.py searches them (and the budgets above) for a target
+# puzzle shape and its result is applied with --difficulty
+DIFFICULTY = {
+    # smallest and largest number of flights on each interest route
+    "interest_flights_per_route": [25, 25],
+    # scales the cheap decoys planted next to every solution (1 keeps them 20-70% cheaper)
+    "decoy_price_factor": 1.0,
+}
+
 # european airports for the puzzle
 EUROPEAN_AIRPORTS = ["LHR", "CDG", "AMS", "FRA", "MAD", "ZRH", "LIS", "VIE", "PRG", "WAW", "BUD", "SVO", "FCO", "ARN"]
 
@@ -130,25 +155,16 @@ POINTS_OF_INTEREST = {
     "YYZ": EUROPEAN_AIRPORTS,  # toronto to all european cities
 }
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """calculate the great-circle distance between two points on earth using the haversine formula."""
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    r = 6371  # earth's radius in kilometers
-    return c * r
+# length of the flight date windows in days; None keeps each window's default length
+DATE_WINDOW_DAYS = None
+# first date and default length of the interest and filler route date windows (june 1-14)
+INTEREST_DATES = (datetime(2025, 6, 1), 14)
+FILLER_DATES = (datetime(2025, 6, 1), 14)
 
-def calculate_flight_time(distance_km):
-    """calculate realistic flight time based on distance."""
-    base_speed = 800 if distance_km > 2000 else 600
-    base_time = distance_km / base_speed
-    deviation = random.uniform(-0.15, 0.15)
-    flight_time = base_time * (1 + deviation)
-    return max(1.0, round(flight_time, 1))
+# airlines the puzzle routes prefer; fallback flights after too many rerolls avoid them
+PUZZLE_AIRLINES = ["AA", "AC", "LH"]
 
-def calculate_flight_price(distance_km, flight_time, is_solution=False):
+def calculate_flight_price(distance_km, flight_time, rng, is_solution=False):
     """calculate flight price, with special handling for solution flights."""
     # base price calculation with diminishing returns for longer distances
     base_price_per_km = 0.15 * (1 - min(0.5, distance_km / 10000))
@@ -158,7 +174,7 @@ def calculate_flight_price(distance_km, flight_time, is_solution=False):
     time_multiplier = 1 + (flight_time / 12)  # reduced impact of flight time
     
     # market variation (random factor)
-    variation = random.uniform(-0.15, 0.20)  # slightly asymmetric to favor price increases
+    variation = rng.uniform(-0.15, 0.20)  # slightly asymmetric to favor price increases
     
     # calculate initial price
     final_price = base_price * time_multiplier * (1 + variation)
@@ -175,85 +191,29 @@ def calculate_flight_price(distance_km, flight_time, is_solution=False):
     if is_solution:
         # ensure friend a's flight is under $640 and friend b's is under $770
         if final_price > 620:  # leave some buffer for user 1's tight budget
-            final_price = random.uniform(500, 620)
+            final_price = rng.uniform(500, 620)
         elif final_price < 400:  # ensure it's not suspiciously cheap
-            final_price = random.uniform(450, 550)
+            final_price = rng.uniform(450, 550)
     
     # cap at 2000 but make it rare
     return round(max(min_price, min(2000, final_price)), 2)
 
-def get_airline_for_route(origin, destination, force_airline=None):
+def get_airline_for_route(origin, destination, rng, force_airline=None):
     """get airline for a route, with option to force specific airline."""
     if force_airline:
         return next(a for a in airlines if a["code"] == force_airline)
     
     # for puzzle routes, prefer the relevant airlines
     if origin == "YYZ" and destination in EUROPEAN_AIRPORTS:
-        return random.choice([a for a in airlines if a["code"] in ["AA", "AC", "LH"]])
+        return rng.choice([a for a in airlines if a["code"] in PUZZLE_AIRLINES])
     
     # fallback to random airline
-    return random.choice(airlines)
+    return rng.choice(airlines)
 
-def would_create_unintended_solution(origin, destination, date, price, airline_code, existing_flights):
-    """check if this flight would create a solution in a non-solution city."""
-    # get solution cities from config
-    solution_cities = {sol["airport"] for sol in PUZZLE_CONFIG["solution_destinations"]}
-    
-    # if this destination is a solution city, it's allowed
-    if destination in solution_cities:
-        return False
-    
-    # check if this flight could pair with another to create a valid solution
-    config = PUZZLE_CONFIG
-    
-    # only check flights from toronto (YYZ) to prevent non-solution city solutions
-    if origin != "YYZ":
-        return False
-    
-    # check if this could be a valid flight for user 1 AND check existing flights for user 2
-    if (date in config["friend_a"]["available_dates"] and
-        price <= config["friend_a"]["max_budget"] and
-        airline_code in config["friend_a"]["preferred_airlines"]):
-        
-        # look for any existing user 2 flights to same destination on same date that would work
-        for flight in existing_flights:
-            if (flight["origin"] == config["friend_b"]["origin"] and
-                flight["destination"] == destination and
-                flight["date"] == date and
-                flight["price"] <= config["friend_b"]["max_budget"] and
-                flight["airline"]["code"] in config["friend_b"]["preferred_airlines"] and
-                date in config["friend_b"]["available_dates"]):
-                return True
-    
-    # check if this could be a valid flight for user 2 AND check existing flights for user 1
-    if (date in config["friend_b"]["available_dates"] and
-        price <= config["friend_b"]["max_budget"] and
-        airline_code in config["friend_b"]["preferred_airlines"]):
-        
-        # look for any existing user 1 flights to same destination on same date that would work
-        for flight in existing_flights:
-            if (flight["origin"] == config["friend_a"]["origin"] and
-                flight["destination"] == destination and
-                flight["date"] == date and
-                flight["price"] <= config["friend_a"]["max_budget"] and
-                flight["airline"]["code"] in config["friend_a"]["preferred_airlines"] and
-                date in config["friend_a"]["available_dates"]):
-                return True
-    
-    # also check if this flight would make it possible for future flights to create solutions
-    # by being too perfect (same price, date, airline for both users)
-    overlap_dates = set(config["friend_a"]["available_dates"]) & set(config["friend_b"]["available_dates"])
-    common_airlines = set(config["friend_a"]["preferred_airlines"]) & set(config["friend_b"]["preferred_airlines"])
-    
-    if (date in overlap_dates and
-        airline_code in common_airlines and
-        price <= config["friend_a"]["max_budget"] and
-        price <= config["friend_b"]["max_budget"]):
-        return True
-    
-    return False
+# the puzzle rules used by the reroll checks (see flight_scenario.puzzle_rules)
+PUZZLE_RULES = puzzle_rules(SCENARIO)
 
-def generate_solution_flights():
+def generate_solution_flights(seed):
     """generate multiple solution flights that satisfy the puzzle constraints."""
     flights = []
     flight_id = 1
@@ -265,14 +225,15 @@ def generate_solution_flights():
     for solution in config["solution_destinations"]:
         destination = solution["airport"]
         date = solution["date"]
+        rng = CounterRandom(seed, "solution", destination)
         
         # solution flight for friend a (toronto to destination on air canada)
         origin_a = airport_dict[config["friend_a"]["origin"]]
         dest = airport_dict[destination]
         distance_a = calculate_distance(origin_a["Latitude"], origin_a["Longitude"], 
                                        dest["Latitude"], dest["Longitude"])
-        flight_time_a = calculate_flight_time(distance_a)
-        price_a = calculate_flight_price(distance_a, flight_time_a, is_solution=True)
+        flight_time_a = calculate_flight_time(distance_a, rng)
+        price_a = calculate_flight_price(distance_a, flight_time_a, rng, is_solution=True)
         
         flights.append({
             "id": flight_id,
@@ -290,8 +251,8 @@ def generate_solution_flights():
         origin_b = airport_dict[config["friend_b"]["origin"]]
         distance_b = calculate_distance(origin_b["Latitude"], origin_b["Longitude"], 
                                        dest["Latitude"], dest["Longitude"])
-        flight_time_b = calculate_flight_time(distance_b)
-        price_b = calculate_flight_price(distance_b, flight_time_b, is_solution=True)
+        flight_time_b = calculate_flight_time(distance_b, rng)
+        price_b = calculate_flight_price(distance_b, flight_time_b, rng, is_solution=True)
         
         flights.append({
             "id": flight_id,
@@ -309,7 +270,7 @@ def generate_solution_flights():
         # these will mislead users who sort by price but cannot create valid solutions
         
         # decoy 1: cheap flight for user 1 with wrong airline (no matching user 2 flight)
-        decoy_price_1 = price_a * random.uniform(0.6, 0.8)  # 20-40% cheaper
+        decoy_price_1 = price_a * rng.uniform(0.6, 0.8) * DIFFICULTY["decoy_price_factor"]  # 20-40% cheaper
         flights.append({
             "id": flight_id,
             "origin": config["friend_a"]["origin"],
@@ -324,7 +285,7 @@ def generate_solution_flights():
         
         # decoy 2: cheap flight for user 2 on wrong date (no user 1 available)
         wrong_date = "2025-06-07"  # not in either user's available dates
-        decoy_price_2 = price_b * random.uniform(0.5, 0.7)  # 30-50% cheaper
+        decoy_price_2 = price_b * rng.uniform(0.5, 0.7) * DIFFICULTY["decoy_price_factor"]  # 30-50% cheaper
         flights.append({
             "id": flight_id,
             "origin": config["friend_b"]["origin"],
@@ -339,7 +300,7 @@ def generate_solution_flights():
         
         # decoy 3: orphaned cheap flight for user 1 only (no user 2 available this date)
         orphan_date = "2025-06-08"  # only user 1 is available
-        orphan_price = price_a * random.uniform(0.4, 0.6)  # very cheap
+        orphan_price = price_a * rng.uniform(0.4, 0.6) * DIFFICULTY["decoy_price_factor"]  # very cheap
         flights.append({
             "id": flight_id,
             "origin": config["friend_a"]["origin"],
@@ -354,7 +315,7 @@ def generate_solution_flights():
         
         # decoy 4: orphaned cheap flight for user 2 only (no user 1 available this date)
         orphan_date_2 = "2025-06-14"  # only user 2 is available
-        orphan_price_2 = price_b * random.uniform(0.3, 0.55)  # extremely cheap
+        orphan_price_2 = price_b * rng.uniform(0.3, 0.55) * DIFFICULTY["decoy_price_factor"]  # extremely cheap
         flights.append({
             "id": flight_id,
             "origin": config["friend_b"]["origin"],
@@ -368,7 +329,7 @@ def generate_solution_flights():
         flight_id += 1
         
         # decoy 5: cheap but over user 1's budget (appears valid but unaffordable)
-        over_budget_price = config["friend_a"]["max_budget"] + random.uniform(50, 150)
+        over_budget_price = config["friend_a"]["max_budget"] + rng.uniform(50, 150)
         flights.append({
             "id": flight_id,
             "origin": config["friend_a"]["origin"],
@@ -382,7 +343,7 @@ def generate_solution_flights():
         flight_id += 1
         
         # decoy 6: tantalizing near-budget flight (just slightly over user 1's limit)
-        near_budget_price = config["friend_a"]["max_budget"] + random.uniform(5, 25)
+        near_budget_price = config["friend_a"]["max_budget"] + rng.uniform(5, 25)
         flights.append({
             "id": flight_id,
             "origin": config["friend_a"]["origin"],
@@ -395,239 +356,123 @@ def generate_solution_flights():
         })
         flight_id += 1
     
-    return flights, flight_id
-
-def generate_interest_flights(start_flight_id):
-    """generate flights for points of interest (origin cities to european destinations), capped at 25 per destination."""
-    flights = []
-    flight_id = start_flight_id
-    airport_dict = {a["IATA"]: a for a in airports}
-    
-    # generate dates from june 1 to june 14
-    all_dates = []
-    for i in range(14):  # june 1 to june 14
-        date = datetime(2025, 6, 1) + timedelta(days=i)
-        all_dates.append(date.strftime("%Y-%m-%d"))
-    
-    # generate flights for each interest route, capped at 25 per destination
-    for origin in POINTS_OF_INTEREST:
-        for destination in POINTS_OF_INTEREST[origin]:
-            # cap at 25 flights per destination to make search harder
-            num_flights = 25
-            
-            # track which dates we've used for solution routes to avoid duplicates
-            solution_dates_used = set()
-            
-            # check if this route matches any solution routes
-            for solution in PUZZLE_CONFIG["solution_destinations"]:
-                if ((origin == PUZZLE_CONFIG["friend_a"]["origin"] and 
-                     destination == solution["airport"]) or 
-                    (origin == PUZZLE_CONFIG["friend_b"]["origin"] and 
-                     destination == solution["airport"])):
-                    solution_dates_used.add(solution["date"])
-            
-            for _ in range(num_flights):
-                origin_airport = airport_dict[origin]
-                dest_airport = airport_dict[destination]
-                distance = calculate_distance(origin_airport["Latitude"], origin_airport["Longitude"],
-                                            dest_airport["Latitude"], dest_airport["Longitude"])
-                flight_time = calculate_flight_time(distance)
-                
-                # generate flight with rerolling to avoid unintended solutions
-                max_attempts = 50
-                for attempt in range(max_attempts):
-                    price = calculate_flight_price(distance, flight_time)
-                    date = random.choice(all_dates)
-                    airline = get_airline_for_route(origin, destination)
-                    
-                    # avoid duplicating any solution flights
-                    if date in solution_dates_used:
-                        continue
-                    
-                    # check if this would create an unintended solution
-                    if would_create_unintended_solution(origin, destination, date, price, airline["code"], flights):
-                        continue
-                    
-                    # if we get here, the flight is acceptable
-                    break
-                else:
-                    # if we can't find a good flight after max attempts, use fallback values
-                    price = calculate_flight_price(distance, flight_time) * 2  # make it expensive
-                    date = random.choice(all_dates)
-                    airline = random.choice([a for a in airlines if a["code"] not in ["AA", "AC", "LH"]])
-                
-                flights.append({
-                    "id": flight_id,
-                    "origin": origin,
-                    "destination": destination,
-                    "price": price,
-                    "duration": flight_time,
-                    "date": date,
-                    "distance_km": round(distance, 1),
-                    "airline": airline
-                })
-                flight_id += 1
-    
-    return flights, flight_id
-
-def generate_filler_flights(start_flight_id, target_total=5000):
-    """generate filler flights for other routes with limited quantities."""
-    flights = []
-    flight_id = start_flight_id
-    airport_dict = {a["IATA"]: a for a in airports}
-    iata_codes = [a["IATA"] for a in airports]
-    
-    # generate dates from june 1 to june 14
-    all_dates = []
-    for i in range(14):  # june 1 to june 14
-        date = datetime(2025, 6, 1) + timedelta(days=i)
-        all_dates.append(date.strftime("%Y-%m-%d"))
-    
-    # track routes we've already covered
-    covered_routes = set()
-    for origin in POINTS_OF_INTEREST:
-        for destination in POINTS_OF_INTEREST[origin]:
-            covered_routes.add((origin, destination))
-    
-    # add solution routes
-    for solution in PUZZLE_CONFIG["solution_destinations"]:
-        covered_routes.add((PUZZLE_CONFIG["friend_a"]["origin"], solution["airport"]))
-        covered_routes.add((PUZZLE_CONFIG["friend_b"]["origin"], solution["airport"]))
-    
-    while len(flights) < (target_total - start_flight_id + 1):
-        origin, destination = random.sample(iata_codes, 2)
-        route = (origin, destination)
-        
-        # skip if already covered or if we've generated enough for this route
-        existing_count = sum(1 for f in flights if f["origin"] == origin and f["destination"] == destination)
-        if route in covered_routes or existing_count >= 5:
-            continue
-        
-        origin_airport = airport_dict[origin]
-        dest_airport = airport_dict[destination]
-        distance = calculate_distance(origin_airport["Latitude"], origin_airport["Longitude"],
-                                    dest_airport["Latitude"], dest_airport["Longitude"])
-        flight_time = calculate_flight_time(distance)
-        
-        # generate flight with rerolling to avoid unintended solutions
-        max_attempts = 30
-        for attempt in range(max_attempts):
-            price = calculate_flight_price(distance, flight_time)
-            date = random.choice(all_dates)
-            airline = get_airline_for_route(origin, destination)
-            
-            # check if this would create an unintended solution
-            if would_create_unintended_solution(origin, destination, date, price, airline["code"], flights):
-                continue
-            
-            # if we get here, the flight is acceptable
-            break
-        else:
-            # if we can't find a good flight after max attempts, use fallback values
-            price = calculate_flight_price(distance, flight_time) * 2  # make it expensive
-            date = random.choice(all_dates)
-            airline = random.choice([a for a in airlines if a["code"] not in ["AA", "AC", "LH"]])
-        
-        flights.append({
-            "id": flight_id,
-            "origin": origin,
-            "destination": destination,
-            "price": price,
-            "duration": flight_time,
-            "date": date,
-            "distance_km": round(distance, 1),
-            "airline": airline
-        })
-        flight_id += 1
-    
     return flights
 
-# generate all flights
-print("🔍 generating puzzle flights...")
-solution_flights, next_id = generate_solution_flights()
-print(f"✅ generated {len(solution_flights)} solution flights")
+def main():
+    """generate the flights for this scenario and save them as json assets."""
+    parser = argparse.ArgumentParser(description="generate the travel puzzle assets")
+    parser.add_argument("--output-dir", default="assets", help="directory the json files are written to")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="scenario seed, so the same seed always produces the same flights (random if omitted)")
+    parser.add_argument("--days", type=int, default=None,
+                        help="length of the flight date windows in days, e.g. 90 for a scenario covering months")
+    parser.add_argument("--total-flights", type=int, default=5000, help="total number of flights to generate")
+    parser.add_argument("--shard-by-date", action="store_true",
+                        help="write one flights/<date>.json per date plus a manifest instead of flights.json")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes generating route blocks in parallel")
+    parser.add_argument("--arrival-window-hours", type=float, default=None,
+                        help="also require both users to land within this many hours of each other")
+    parser.add_argument("--difficulty", default=None,
+                        help="json file from tune_difficulty.py whose knobs are applied before generating")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.arrival_window_hours is not None and args.arrival_window_hours * 60 < SOLUTION_ARRIVAL_SPREAD_MINUTES:
+        parser.error(f"--arrival-window-hours must be at least {SOLUTION_ARRIVAL_SPREAD_MINUTES / 60:g}")
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    profiler = profiler_from_args(os.path.basename(__file__), args)
+    set_date_window(SCENARIO, args.days)
+    if args.difficulty:
+        with open(args.difficulty, "r") as f:
+            apply_difficulty(SCENARIO, json.load(f)["knobs"])
 
-interest_flights, next_id = generate_interest_flights(next_id)
-print(f"✅ generated {len(interest_flights)} interest flights")
+    # generate all flights
+    print(f"🔍 generating puzzle flights (seed {seed})...")
+    blocks, all_flights, telemetry = generate_flights(SCENARIO, seed, args.total_flights, args.jobs, profiler)
+    for kind in ["solution", "interest", "filler"]:
+        count = sum(len(block["slots"]) for block in blocks if block["kind"] == kind)
+        print(f"✅ generated {count} {kind} flights")
+    reroll_summary = summarize(blocks, telemetry, seed)
+    for kind, counters in reroll_summary["phases"].items():
+        print(phase_line(kind, counters))
 
-filler_flights = generate_filler_flights(next_id, 5000)
-print(f"✅ generated {len(filler_flights)} filler flights")
+    print(f"📊 total flights generated: {len(all_flights)}")
+    profiler.count(seed=seed, flights=len(all_flights), blocks=len(blocks), jobs=args.jobs)
 
-all_flights = solution_flights + interest_flights + filler_flights
-print(f"📊 total flights generated: {len(all_flights)}")
-
-# create puzzle description
-puzzle_description = {
-    "title": "Travel Rendezvous Challenge",
-    "description": "Two users want to meet for a vacation. Help them find flights that work for both!",
-    "friends": {
-        "user_1": {
-            "name": "User 1",
-            "description": "lives in toronto, available june 8-12, prefers american airlines or air canada, budget max $640",
-            "origin_airport": "YYZ",
-            "available_dates": ["2025-06-08", "2025-06-09", "2025-06-10", "2025-06-11", "2025-06-12"],
-            "preferred_airlines": ["AA", "AC"],
-            "max_budget": 640
+    # create puzzle description
+    puzzle_description = {
+        "title": "Travel Rendezvous Challenge",
+        "description": "Two users want to meet for a vacation. Help them find flights that work for both!",
+        "friends": puzzle_users(SCENARIO),
+        "constraints": {
+            "must_arrive_same_day": True,
+            "both_must_afford": True,
+            "both_must_be_available": True,
+            "overlap_dates": ["2025-06-10", "2025-06-11", "2025-06-12"],
+            "spec": build_spec(PUZZLE_CONFIG["rules"], args.arrival_window_hours)
         },
-        "user_2": {
-            "name": "User 2", 
-            "description": "lives in toronto, available june 10-14, prefers air canada or lufthansa, budget max $770",
-            "origin_airport": "YYZ",
-            "available_dates": ["2025-06-10", "2025-06-11", "2025-06-12", "2025-06-13", "2025-06-14"],
-            "preferred_airlines": ["AC", "LH"],
-            "max_budget": 770
-        }
-    },
-    "constraints": {
-        "must_arrive_same_day": True,
-        "both_must_afford": True,
-        "both_must_be_available": True,
-        "overlap_dates": ["2025-06-10", "2025-06-11", "2025-06-12"]
-    },
-    "evaluation_criteria": {
-        "valid_solution": {
-            "same_destination": "flights must go to the same destination airport",
-            "same_date": "flights must be on the same date", 
-            "within_budgets": "user_1's flight <= $640, user_2's flight <= $770",
-            "date_availability": "date must be in both users' available dates",
-            "airline_preferences": "each user must use one of their preferred airlines"
+        "evaluation_criteria": {
+            "valid_solution": {
+                "same_destination": "flights must go to the same destination airport",
+                "same_date": "flights must be on the same date", 
+                "within_budgets": f"user_1's flight <= ${PUZZLE_CONFIG['friend_a']['max_budget']}, "
+                                  f"user_2's flight <= ${PUZZLE_CONFIG['friend_b']['max_budget']}",
+                "date_availability": "date must be in both users' available dates",
+                "airline_preferences": "each user must use one of their preferred airlines"
+            }
+        },
+        "hints": {
+            "overlap_dates": "look for dates when both users are available (june 10-12)",
+            "budget_consideration": "both users need to stay within their budgets",
+            "airline_preferences": "each user must use one of their preferred airlines",
+            "multiple_solutions": "there may be several valid combinations - any that meet all criteria work!"
         }
-    },
-    "hints": {
-        "overlap_dates": "look for dates when both users are available (june 10-12)",
-        "budget_consideration": "both users need to stay within their budgets",
-        "airline_preferences": "each user must use one of their preferred airlines",
-        "multiple_solutions": "there may be several valid combinations - any that meet all criteria work!"
     }
-}
+    if args.arrival_window_hours is not None:
+        window = f"{args.arrival_window_hours:g}"
+        puzzle_description["constraints"]["max_arrival_gap_hours"] = args.arrival_window_hours
+        puzzle_description["evaluation_criteria"]["valid_solution"]["arrival_window"] = \
+            f"both flights must land within {window} hours of each other"
+        puzzle_description["hints"]["arrival_window"] = f"compare arrival times: the users must land within {window} hours"
 
-# save to json files
-os.makedirs("assets", exist_ok=True)
+    # save to json files
+    os.makedirs(args.output_dir, exist_ok=True)
 
-try:
-    with open("assets/airports.json", "w") as f:
-        json.dump(airports, f, indent=2)
+    try:
+        with profiler.phase("json_write"):
+            with open(os.path.join(args.output_dir, "airports.json"), "w") as f:
+                json.dump(airports, f, indent=2)
 
-    with open("assets/airlines.json", "w") as f:
-        json.dump(airlines, f, indent=2)
+            with open(os.path.join(args.output_dir, "airlines.json"), "w") as f:
+                json.dump(airlines, f, indent=2)
 
-    with open("assets/flights.json", "w") as f:
-        json.dump(all_flights, f, indent=2)
-    
-    with open("assets/puzzle_description.json", "w") as f:
-        json.dump(puzzle_description, f, indent=2)
+            if args.shard_by_date:
+                manifest = write_flight_shards(all_flights, args.output_dir)
+                print(f"📅 flights split into {len(manifest['shards'])} date shards")
+            else:
+                with open(os.path.join(args.output_dir, "flights.json"), "w") as f:
+                    json.dump(all_flights, f, indent=2)
+                remove_flight_shards(args.output_dir)
 
-    print("✅ all files created successfully!")
-    print("\n🎯 PUZZLE SCENARIO:")
-    print("=" * 50)
-    print(f"🏠 User 1 {puzzle_description['friends']['user_1']['description']}")
-    print(f"🏠 User 2 {puzzle_description['friends']['user_2']['description']}")
-    print(f"🎯 Goal: Meet for a vacation")
-    print(f"✈️  Must arrive same day, each using preferred airlines")
-    print(f"💡 Hint: User 1 prefers {puzzle_description['friends']['user_1']['preferred_airlines']}, User 2 prefers {puzzle_description['friends']['user_2']['preferred_airlines']}")
-    print(f"🎲 Multiple solutions exist - any valid combination works!")
-    print("=" * 50)
-    
-except Exception as e:
-    print(f"❌ error writing files: {e}")
-    print(f"current working directory: {os.getcwd()}")
+            with open(os.path.join(args.output_dir, "puzzle_description.json"), "w") as f:
+                json.dump(puzzle_description, f, indent=2)
+
+            write_telemetry(reroll_summary, args.output_dir)
+
+        print("✅ all files created successfully!")
+        print("\n🎯 PUZZLE SCENARIO:")
+        print("=" * 50)
+        print(f"🏠 User 1 {puzzle_description['friends']['user_1']['description']}")
+        print(f"🏠 User 2 {puzzle_description['friends']['user_2']['description']}")
+        print(f"🎯 Goal: Meet for a vacation")
+        print(f"✈️  Must arrive same day, each using preferred airlines")
+        print(f"💡 Hint: User 1 prefers {puzzle_description['friends']['user_1']['preferred_airlines']}, User 2 prefers {puzzle_description['friends']['user_2']['preferred_airlines']}")
+        print(f"🎲 Multiple solutions exist - any valid combination works!")
+        print("=" * 50)
+    
+    except Exception as e:
+        print(f"❌ error writing files: {e}")
+        print(f"current working directory: {os.getcwd()}")
+    profiler.write()
+
+if __name__ == "__main__":
+    main()
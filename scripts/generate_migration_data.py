@@ -1,6 +1,65 @@
+import argparse
+import functools
+import hashlib
+import inspect
 import json
-import random
-from typing import Dict, List, Tuple
+import os
+import shutil
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from counter_rng import stream_key, uniform, uniform_array
+from us_geometry import (
+    USMAP_PATH,
+    adjacent_states,
+    geographic_centroids,
+    great_circle_distances,
+    load_topology,
+    state_polygons,
+)
+
+OUTPUT_DIR = "src/assets/domesticmigration"
+
+# per-era parameter signatures used to splice partial recomputations into existing outputs
+PARAMS_FILENAME = "migration_params.json"
+
+# level-of-detail tiers: flows sorted by value are split into chunks so that the first k
+# chunks always form the top LOD_TIERS[k - 1] flows (the last chunk holds the rest).
+# per-origin files use ORIGIN_LOD_TIERS the same way over that origin's own flows.
+LOD_DIR = os.path.join(OUTPUT_DIR, "lod")
+LOD_TIERS = [50, 200, 1000]
+ORIGIN_LOD_TIERS = [5, 20]
+
+# counters of the random draws made for one realization of a state pair
+NEIGHBOR_DRAW = 0
+ECONOMIC_DRAW = 1
+DRAWS_PER_REALIZATION = 2
+
+ERAS = ["1960s", "1990s", "2020s"]
+
+# ensure minimum value but scale with era (more migration in recent decades)
+MIN_MIGRATION_VALUES = {"1960s": 50, "1990s": 75, "2020s": 100}
+
+# population term: origin_pop ** POPULATION_EXPONENT_ORIGIN * dest_pop ** POPULATION_EXPONENT_DESTINATION
+# / POPULATION_SCALE (can be overridden with a calibration file, see calibrate_migration_model.py)
+POPULATION_EXPONENT_ORIGIN = 0.8
+POPULATION_EXPONENT_DESTINATION = 0.6
+POPULATION_SCALE = 50000
+
+# ensemble mode: number of histogram bins per flow used for streaming percentiles,
+# and how many realizations are drawn per batch
+ENSEMBLE_BINS = 512
+ENSEMBLE_BATCH_SIZE = 64
+ENSEMBLE_PERCENTILES = [5, 50, 95]
+
+# "regions" uses the census regions and era rules in calculate_distance_multiplier and the
+# NEIGHBORING_STATES table; "gravity" derives centroids and adjacency from the usmap
+# geometry and applies a continuous (distance / reference) ** -exponent decay instead
+DISTANCE_MODELS = ["regions", "gravity"]
+DISTANCE_DECAY_REFERENCE_KM = 1000
+DISTANCE_DECAY_EXPONENT = 0.5
+DISTANCE_DECAY_MIN_KM = 100  # keeps the decay finite for very close centroids
 
 # state populations (more accurate historical data)
 # updated based on historical census data
@@ -292,10 +351,43 @@ def calculate_distance_multiplier(origin: str, destination: str, era: str) -> fl
     
     return 1.0
 
-def generate_migration_value(origin: str, destination: str, era: str) -> int:
-    """generate a synthetic migration value based on various factors for a specific era."""
+def pair_stream_key(era: str, origin: str, destination: str, seed: int = 0) -> int:
+    """stable random stream key for one (era, origin, destination) pair."""
+    return stream_key("migration", seed, era, origin, destination)
+
+@functools.lru_cache(maxsize=None)
+def load_state_geography(path: str = USMAP_PATH) -> Tuple[Dict[str, int], np.ndarray, Dict[str, List[str]]]:
+    """derive the gravity model inputs from the map geometry, once per process.
+    returns (index, decay, adjacency): the row/column index of each state, the
+    (origin x destination) distance decay matrix and the adjacent states of each state."""
+    polygons = state_polygons(load_topology(path))
+    states = [s for s in STATE_POPULATIONS_2020S if s in polygons]
+    centroids = geographic_centroids({s: polygons[s] for s in states})
+    distances = great_circle_distances(np.array([centroids[s] for s in states]))
+    decay = (np.maximum(distances, DISTANCE_DECAY_MIN_KM) / DISTANCE_DECAY_REFERENCE_KM) ** -DISTANCE_DECAY_EXPONENT
+    adjacency = adjacent_states({s: polygons[s] for s in states})
+    return {s: i for i, s in enumerate(states)}, decay, adjacency
+
+def get_neighbors(state: str, distance_model: str = "regions") -> List[str]:
+    """neighboring states, from the hand-maintained table or from the map geometry."""
+    if distance_model == "gravity":
+        return load_state_geography()[2].get(state, [])
+    return NEIGHBORING_STATES[state]
+
+def calculate_gravity_distance_multiplier(origin: str, destination: str) -> float:
+    """continuous distance decay between two state centroids."""
+    index, decay, _ = load_state_geography()
+    return float(decay[index[origin], index[destination]])
+
+def generate_migration_value(origin: str, destination: str, era: str, seed: int = 0,
+                             distance_model: str = "regions") -> int:
+    """generate a synthetic migration value based on various factors for a specific era.
+    random factors come from the pair's own counter-based stream, so the value does not
+    depend on which other pairs were generated before it."""
     if origin == destination:
         return 0
+
+    key = pair_stream_key(era, origin, destination, seed)
     
     current_state_populations = ALL_STATE_POPULATIONS[era]
     current_destination_multipliers = ALL_DESTINATION_MULTIPLIERS[era]
@@ -306,11 +398,8 @@ def generate_migration_value(origin: str, destination: str, era: str) -> int:
     
     # more realistic base calculation - migration flows scale with both populations
     # but with diminishing returns for very large populations
-    base_value = int((origin_pop ** 0.8 * dest_pop ** 0.6) / 50000)
-    
-    # apply neighboring state multiplier (people move to nearby states more often)
-    if destination in NEIGHBORING_STATES[origin]:
-        base_value *= random.uniform(1.8, 2.5)  # stronger neighbor effect
+    base_value = int((origin_pop ** POPULATION_EXPONENT_ORIGIN * dest_pop ** POPULATION_EXPONENT_DESTINATION)
+                     / POPULATION_SCALE)
     
     # apply destination state multiplier if applicable
     if destination in current_destination_multipliers:
@@ -321,35 +410,45 @@ def generate_migration_value(origin: str, destination: str, era: str) -> int:
         base_value *= ORIGIN_PENALTIES[era][origin]
     
     # apply distance/regional patterns
-    distance_mult = calculate_distance_multiplier(origin, destination, era)
+    if distance_model == "gravity":
+        distance_mult = calculate_gravity_distance_multiplier(origin, destination)
+    else:
+        distance_mult = calculate_distance_multiplier(origin, destination, era)
     base_value *= distance_mult
     
+    # apply neighboring state multiplier (people move to nearby states more often)
+    # (applied after the deterministic factors, in the same order as build_model_matrices)
+    if destination in get_neighbors(origin, distance_model):
+        base_value *= uniform(key, NEIGHBOR_DRAW, 1.8, 2.5)  # stronger neighbor effect
+    
     # add economic factors variation
-    base_value *= random.uniform(0.7, 1.3)
+    base_value *= uniform(key, ECONOMIC_DRAW, 0.7, 1.3)
     
     # ensure minimum value but scale with era (more migration in recent decades)
-    min_values = {"1960s": 50, "1990s": 75, "2020s": 100}
-    min_value = min_values.get(era, 100)
+    min_value = MIN_MIGRATION_VALUES.get(era, 100)
     
     return max(min_value, int(base_value))
 
-def generate_migration_data(era: str) -> Tuple[List[Dict], List[Dict]]:
+def generate_migration_data(era: str, seed: int = 0, rows: Optional[Set[str]] = None,
+                            columns: Optional[Set[str]] = None,
+                            distance_model: str = "regions") -> Tuple[List[Dict], List[Dict]]:
     """generate complete migration data for all state pairs for a specific era.
-    returns tuple of (absolute_migrations, rate_migrations)."""
+    if rows or columns are given, only pairs with an origin in rows or a destination in
+    columns are generated. returns tuple of (absolute_migrations, rate_migrations)."""
     absolute_migrations = []
     rate_migrations = []
     states = list(STATE_POPULATIONS_2020S.keys())
-    
-    # set random seed for reproducible results within each era
-    random.seed(hash(era) % 1000000)
+    partial = rows is not None or columns is not None
     
     current_state_populations = ALL_STATE_POPULATIONS[era]
     
     for origin in states:
         for destination in states:
+            if partial and origin not in (rows or ()) and destination not in (columns or ()):
+                continue
             if origin != destination:
                 if origin in current_state_populations and destination in current_state_populations:
-                    absolute_value = generate_migration_value(origin, destination, era)
+                    absolute_value = generate_migration_value(origin, destination, era, seed, distance_model)
                     
                     # calculate migration rate per 100,000 inhabitants of origin state
                     origin_population = current_state_populations[origin]
@@ -369,44 +468,407 @@ def generate_migration_data(era: str) -> Tuple[List[Dict], List[Dict]]:
     
     return absolute_migrations, rate_migrations
 
+def model_components(era: str, distance_model: str = "regions") -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """inputs of the model that do not depend on tunable parameters.
+    returns (states, populations, distance, neighbors) where distance is the
+    (origin x destination) distance multiplier matrix and neighbors marks adjacent pairs."""
+    current_state_populations = ALL_STATE_POPULATIONS[era]
+    states = [s for s in STATE_POPULATIONS_2020S if s in current_state_populations]
+    populations = np.array([current_state_populations[s] for s in states], dtype=float)
+    if distance_model == "gravity":
+        index, decay, adjacency = load_state_geography()
+        positions = [index[s] for s in states]
+        distance = decay[np.ix_(positions, positions)]
+        neighbors = np.array([[d in adjacency.get(o, []) for d in states] for o in states], dtype=bool)
+    else:
+        distance = np.array([[calculate_distance_multiplier(o, d, era) for d in states] for o in states])
+        neighbors = np.array([[d in NEIGHBORING_STATES[o] for d in states] for o in states])
+    return states, populations, distance, neighbors
+
+def build_model_matrices(era: str, distance_model: str = "regions") -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """deterministic part of generate_migration_value as (origin x destination) matrices.
+    returns (states, base, neighbors): base holds the population term with destination
+    multipliers, origin penalties and distance multipliers applied, neighbors marks the
+    pairs that get the random neighbor boost. the diagonal of base is zero."""
+    states, populations, distance, neighbors = model_components(era, distance_model)
+    current_destination_multipliers = ALL_DESTINATION_MULTIPLIERS[era]
+    current_origin_penalties = ORIGIN_PENALTIES.get(era, {})
+
+    base = np.floor(np.outer(populations ** POPULATION_EXPONENT_ORIGIN,
+                             populations ** POPULATION_EXPONENT_DESTINATION) / POPULATION_SCALE)
+    base *= np.array([current_destination_multipliers.get(s, 1.0) for s in states])[None, :]
+    base *= np.array([current_origin_penalties.get(s, 1.0) for s in states])[:, None]
+    base *= distance
+    np.fill_diagonal(base, 0)
+    return states, base, neighbors
+
+def apply_calibration(path: str):
+    """override the population term, destination multipliers and origin penalties with
+    values fitted by calibrate_migration_model.py."""
+    global POPULATION_EXPONENT_ORIGIN, POPULATION_EXPONENT_DESTINATION, POPULATION_SCALE
+    with open(path, "r") as f:
+        calibration = json.load(f)
+    POPULATION_EXPONENT_ORIGIN = calibration.get("population_exponent_origin", POPULATION_EXPONENT_ORIGIN)
+    POPULATION_EXPONENT_DESTINATION = calibration.get("population_exponent_destination",
+                                                      POPULATION_EXPONENT_DESTINATION)
+    POPULATION_SCALE = calibration.get("population_scale", POPULATION_SCALE)
+    for era, multipliers in calibration.get("destination_multipliers", {}).items():
+        ALL_DESTINATION_MULTIPLIERS[era].update(multipliers)
+    for era, penalties in calibration.get("origin_penalties", {}).items():
+        ORIGIN_PENALTIES.setdefault(era, {}).update(penalties)
+
+def _histogram_percentiles(counts: np.ndarray, lower: np.ndarray, upper: np.ndarray,
+                           total: int, percentiles: List[float]) -> List[np.ndarray]:
+    """read percentiles back out of per-flow fixed-bin histograms, interpolating inside a bin."""
+    bins = counts.shape[1]
+    cumulative = np.cumsum(counts, axis=1)
+    results = []
+    for q in percentiles:
+        rank = max(1.0, q / 100 * total)
+        bin_index = np.minimum((cumulative < rank).sum(axis=1), bins - 1)
+        flow_index = np.arange(counts.shape[0])
+        before = np.where(bin_index > 0, cumulative[flow_index, bin_index - 1], 0)
+        in_bin = np.maximum(counts[flow_index, bin_index], 1)
+        fraction = (bin_index + np.clip((rank - before) / in_bin, 0, 1)) / bins
+        results.append(lower + (upper - lower) * fraction)
+    return results
+
+def generate_migration_ensemble(era: str, realizations: int, percentiles: List[float], seed: int = 0,
+                                distance_model: str = "regions") -> Tuple[List[Dict], List[Dict]]:
+    """draw many realizations of an era's migration data as batched (realization x origin x
+    destination) arrays and reduce them to per-flow mean, std and percentiles.
+
+    memory stays fixed regardless of the number of realizations: each flow keeps running
+    sums plus a histogram over its analytic [min, max] range, and percentiles are read
+    from the histograms at the end. returns tuple of (absolute_summaries, rate_summaries)."""
+    states, base, neighbors = build_model_matrices(era, distance_model)
+    n = len(states)
+    min_value = MIN_MIGRATION_VALUES.get(era, 100)
+    populations = np.array([ALL_STATE_POPULATIONS[era][s] for s in states], dtype=float)
+    keys = np.array([[pair_stream_key(era, o, d, seed) for d in states] for o in states], dtype=np.uint64)
+
+    # every realization of a flow lies within these bounds
+    lower = (base * np.where(neighbors, 1.8, 1.0) * 0.7).ravel()
+    upper = (base * np.where(neighbors, 2.5, 1.0) * 1.3).ravel()
+    width = np.maximum(upper - lower, 1e-9)
+    flow_offsets = np.arange(n * n) * ENSEMBLE_BINS
+
+    counts = np.zeros(n * n * ENSEMBLE_BINS, dtype=np.int64)
+    sums = {key: np.zeros((n, n)) for key in ["value", "value_sq", "rate", "rate_sq"]}
+
+    drawn = 0
+    while drawn < realizations:
+        size = min(ENSEMBLE_BATCH_SIZE, realizations - drawn)
+        # realization r uses draws r * DRAWS_PER_REALIZATION + k of every pair's stream, so
+        # realization 0 is exactly the single dataset written by generate_migration_data
+        counters = ((drawn + np.arange(size)) * DRAWS_PER_REALIZATION)[:, None, None]
+        neighbor_factor = np.where(neighbors, uniform_array(keys, counters + NEIGHBOR_DRAW, 1.8, 2.5), 1.0)
+        economic_factor = uniform_array(keys, counters + ECONOMIC_DRAW, 0.7, 1.3)
+        raw = base * neighbor_factor * economic_factor
+
+        # histogram the raw values; the floor and minimum are monotone so they are applied
+        # to the percentiles afterwards
+        bin_index = np.clip(((raw.reshape(size, -1) - lower) / width * ENSEMBLE_BINS).astype(np.int64),
+                            0, ENSEMBLE_BINS - 1)
+        counts += np.bincount((bin_index + flow_offsets).ravel(), minlength=counts.size)
+
+        values = np.maximum(min_value, np.floor(raw))
+        rates = np.floor(values / populations[:, None] * 100000)
+        sums["value"] += values.sum(axis=0)
+        sums["value_sq"] += (values ** 2).sum(axis=0)
+        sums["rate"] += rates.sum(axis=0)
+        sums["rate_sq"] += (rates ** 2).sum(axis=0)
+        drawn += size
+
+    raw_percentiles = _histogram_percentiles(counts.reshape(n * n, ENSEMBLE_BINS), lower, upper,
+                                             realizations, percentiles)
+    value_percentiles = [np.maximum(min_value, np.floor(p)).reshape(n, n) for p in raw_percentiles]
+    rate_percentiles = [np.floor(p / populations[:, None] * 100000) for p in value_percentiles]
+
+    def summarize(prefix: str, pct_values: List[np.ndarray]) -> List[Dict]:
+        mean = sums[prefix] / realizations
+        std = np.sqrt(np.maximum(0, sums[f"{prefix}_sq"] / realizations - mean ** 2))
+        records = []
+        for i, origin in enumerate(states):
+            for j, destination in enumerate(states):
+                if i == j:
+                    continue
+                record = {
+                    "origin": origin,
+                    "destination": destination,
+                    "mean": round(float(mean[i, j]), 1),
+                    "std": round(float(std[i, j]), 1),
+                }
+                for q, values in zip(percentiles, pct_values):
+                    record[f"p{q:g}"] = int(values[i, j])
+                records.append(record)
+        return records
+
+    return summarize("value", value_percentiles), summarize("rate", rate_percentiles)
+
+def save_ensembles(realizations: int, percentiles: List[float], seed: int, distance_model: str = "regions"):
+    """generate and save ensemble summaries for every era."""
+    for era in ERAS:
+        print(f"drawing {realizations} realizations of migration data for {era}...")
+        absolute_summaries, rate_summaries = generate_migration_ensemble(era, realizations, percentiles, seed,
+                                                                        distance_model)
+        absolute_summaries.sort(key=lambda x: x["mean"], reverse=True)
+        rate_summaries.sort(key=lambda x: x["mean"], reverse=True)
+
+        for name, summaries in [("migration_ensemble", absolute_summaries),
+                                ("migration_rate_ensemble", rate_summaries)]:
+            filename = os.path.join(OUTPUT_DIR, f"{name}_{era}.json")
+            with open(filename, "w") as f:
+                json.dump({
+                    "realizations": realizations,
+                    "percentiles": percentiles,
+                    "migrations": summaries,
+                }, f, indent=2)
+            print(f"ensemble data saved to {filename}")
+
+        low, high = f"p{min(percentiles):g}", f"p{max(percentiles):g}"
+        print(f"\ntop 10 mean migration flows for {era} ({low}-{high} band):")
+        for i, migration in enumerate(absolute_summaries[:10]):
+            print(f"  {i+1}. {migration['origin']} → {migration['destination']}: "
+                  f"{migration['mean']:,.0f} ({migration[low]:,}-{migration[high]:,})")
+        print("-" * 50)
+
+def model_fingerprint(distance_model: str = "regions") -> str:
+    """hash of the model code (and map geometry for the gravity model), so that editing a
+    formula forces a full regeneration."""
+    functions = [get_region, calculate_distance_multiplier, generate_migration_value]
+    source = "".join(inspect.getsource(f) for f in functions)
+    if distance_model == "gravity":
+        source += inspect.getsource(load_state_geography)
+        source += repr((DISTANCE_DECAY_REFERENCE_KM, DISTANCE_DECAY_EXPONENT, DISTANCE_DECAY_MIN_KM))
+        with open(USMAP_PATH, "rb") as f:
+            source += hashlib.sha256(f.read()).hexdigest()
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+def era_params(era: str, seed: int, distance_model: str = "regions") -> Dict:
+    """everything a generated era depends on. per state, "row" holds the inputs of the pairs
+    it is the origin of and "column" the inputs of the pairs it is the destination of."""
+    current_state_populations = ALL_STATE_POPULATIONS[era]
+    states = {}
+    for state, population in current_state_populations.items():
+        region = get_region(state)
+        states[state] = {
+            "row": [population, ORIGIN_PENALTIES.get(era, {}).get(state),
+                    sorted(get_neighbors(state, distance_model)), region],
+            "column": [population, ALL_DESTINATION_MULTIPLIERS[era].get(state), region],
+        }
+    # round trip through json so the result compares equal to what load_params returns
+    return json.loads(json.dumps({
+        "model": model_fingerprint(distance_model),
+        "distance_model": distance_model,
+        "seed": seed,
+        "min_value": MIN_MIGRATION_VALUES.get(era, 100),
+        "population_term": [POPULATION_EXPONENT_ORIGIN, POPULATION_EXPONENT_DESTINATION, POPULATION_SCALE],
+        "states": states,
+    }))
+
+def load_params() -> Dict:
+    """load the parameters the existing output files were generated with."""
+    try:
+        with open(os.path.join(OUTPUT_DIR, PARAMS_FILENAME), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def sort_migrations(migrations: List[Dict]):
+    """sort by value in descending order, ties in state order, so full and partial runs match."""
+    order = {state: i for i, state in enumerate(STATE_POPULATIONS_2020S)}
+    migrations.sort(key=lambda x: (-x["value"], order[x["origin"]], order[x["destination"]]))
+
+def changed_rows_and_columns(current: Dict, previous: Dict) -> Tuple[Set[str], Set[str], Set[str]]:
+    """compare per-state signatures; returns (rows, columns, removed_states)."""
+    rows, columns = set(), set()
+    for state, signature in current["states"].items():
+        old = previous["states"].get(state)
+        if old is None or old["row"] != signature["row"]:
+            rows.add(state)
+        if old is None or old["column"] != signature["column"]:
+            columns.add(state)
+    removed = set(previous["states"]) - set(current["states"])
+    return rows, columns, removed
+
+def save_era(era: str, seed: int, previous: Optional[Dict], distance_model: str = "regions") -> Dict:
+    """generate and save one era, recomputing only what changed since the previous run.
+
+    every pair draws from its own random stream, so a pair's value only depends on its
+    origin's row inputs and its destination's column inputs. when those are unchanged
+    the existing records are kept and only the affected rows and columns are spliced in.
+    returns the parameters the saved files correspond to."""
+    current = era_params(era, seed, distance_model)
+    absolute_filename = os.path.join(OUTPUT_DIR, f"migration_{era}.json")
+    rate_filename = os.path.join(OUTPUT_DIR, f"migration_rate_{era}.json")
+
+    existing = None
+    if (previous is not None and
+            all(previous.get(key) == current[key] for key in ["model", "distance_model", "seed", "min_value", "population_term"])):
+        try:
+            with open(absolute_filename, "r") as f:
+                existing_absolute = json.load(f)["migrations"]
+            with open(rate_filename, "r") as f:
+                existing_rate = json.load(f)["migrations"]
+            existing = (existing_absolute, existing_rate)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            existing = None
+
+    if existing is None:
+        print(f"generating migration data for {era}...")
+        absolute_migrations, rate_migrations = generate_migration_data(era, seed,
+                                                                       distance_model=distance_model)
+    else:
+        rows, columns, removed = changed_rows_and_columns(current, previous)
+        if not rows and not columns and not removed:
+            print(f"migration data for {era} is up to date")
+            return current
+
+        print(f"recomputing {len(rows)} rows and {len(columns)} columns of migration data for {era}...")
+        new_absolute, new_rate = generate_migration_data(era, seed, rows, columns, distance_model)
+
+        def splice(old: List[Dict], new: List[Dict]) -> List[Dict]:
+            kept = [m for m in old
+                    if m["origin"] not in rows and m["destination"] not in columns
+                    and m["origin"] not in removed and m["destination"] not in removed]
+            return kept + new
+
+        absolute_migrations = splice(existing[0], new_absolute)
+        rate_migrations = splice(existing[1], new_rate)
+
+    # sort both datasets by value in descending order for easier inspection
+    sort_migrations(absolute_migrations)
+    sort_migrations(rate_migrations)
+
+    # save absolute migration data
+    absolute_data = {"migrations": absolute_migrations}
+    with open(absolute_filename, "w") as f:
+        json.dump(absolute_data, f, indent=2)
+
+    # save migration rate data (per 100,000 inhabitants)
+    rate_data = {"migrations": rate_migrations}
+    with open(rate_filename, "w") as f:
+        json.dump(rate_data, f, indent=2)
+
+    print(f"saved {len(absolute_migrations)} migration records for {era}")
+    print(f"absolute data saved to {absolute_filename}")
+    print(f"rate data saved to {rate_filename}")
+
+    # show top 10 migration flows for this era (absolute numbers)
+    print(f"\ntop 10 absolute migration flows for {era}:")
+    for i, migration in enumerate(absolute_migrations[:10]):
+        print(f"  {i+1}. {migration['origin']} → {migration['destination']}: {migration['value']:,}")
+
+    # show top 10 migration rates for this era
+    print(f"\ntop 10 migration rates for {era} (per 100,000 inhabitants):")
+    for i, migration in enumerate(rate_migrations[:10]):
+        print(f"  {i+1}. {migration['origin']} → {migration['destination']}: {migration['value']:,}")
+    print("-" * 50)
+    return current
+
+def _tier_bounds(tiers: List[int], count: int) -> List[int]:
+    """cumulative tier sizes clipped to count, always ending with count (everything)."""
+    bounds = sorted({min(t, count) for t in tiers if t > 0} | {count})
+    return [b for b in bounds if b > 0] or [0]
+
+def save_lod_tiers(era: str):
+    """write level-of-detail tiers for both view types of an era from the saved files.
+
+    for each view a directory under LOD_DIR holds index.json, tier_<k>.json chunks whose
+    concatenation is the full sorted array (so loading tiers 0..k gives the top-k prefix)
+    and origin/<state>.json with one origin's flows and tiers, so a focused state can load
+    only its own flows. states are referenced by their index in index.json."""
+    for stem in [f"migration_{era}", f"migration_rate_{era}"]:
+        with open(os.path.join(OUTPUT_DIR, f"{stem}.json"), "r") as f:
+            migrations = json.load(f)["migrations"]
+        sort_migrations(migrations)
+
+        states = [s for s in STATE_POPULATIONS_2020S if s in ALL_STATE_POPULATIONS[era]]
+        index = {s: i for i, s in enumerate(states)}
+        directory = os.path.join(LOD_DIR, stem)
+        # the directory only holds this view's tiers, so start from scratch: a tier or an origin
+        # file index.json no longer lists would otherwise stay behind and keep being shipped
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(os.path.join(directory, "origin"))
+
+        bounds = _tier_bounds(LOD_TIERS, len(migrations))
+        tier_files = []
+        start = 0
+        for k, end in enumerate(bounds):
+            filename = f"tier_{k}.json"
+            with open(os.path.join(directory, filename), "w") as f:
+                json.dump({
+                    "tier": k,
+                    "start": start,
+                    "flows": [[index[m["origin"]], index[m["destination"]], m["value"]]
+                              for m in migrations[start:end]],
+                }, f, separators=(",", ":"))
+            tier_files.append(filename)
+            start = end
+
+        origins = {}
+        for origin in states:
+            # filtering keeps the global sort order, so every prefix is that origin's top flows
+            flows = [[index[m["destination"]], m["value"]] for m in migrations if m["origin"] == origin]
+            filename = f"origin/{origin.lower().replace(' ', '_')}.json"
+            with open(os.path.join(directory, filename), "w") as f:
+                json.dump({
+                    "origin": index[origin],
+                    "tiers": _tier_bounds(ORIGIN_LOD_TIERS, len(flows)),
+                    "flows": flows,
+                }, f, separators=(",", ":"))
+            origins[origin] = {
+                "file": filename,
+                "count": len(flows),
+                "max_value": flows[0][1] if flows else 0,
+            }
+
+        with open(os.path.join(directory, "index.json"), "w") as f:
+            json.dump({
+                "era": era,
+                "states": states,
+                "tiers": bounds,
+                "tier_files": tier_files,
+                "origins": origins,
+            }, f, indent=2)
+        print(f"level-of-detail tiers {bounds} saved to {directory}")
+
 def main():
     """generate and save migration data for multiple eras."""
-    eras = ["1960s", "1990s", "2020s"]
-    
-    for era in eras:
-        print(f"generating migration data for {era}...")
-        absolute_migrations, rate_migrations = generate_migration_data(era)
-        
-        # sort both datasets by value in descending order for easier inspection
-        absolute_migrations.sort(key=lambda x: x["value"], reverse=True)
-        rate_migrations.sort(key=lambda x: x["value"], reverse=True)
-        
-        # save absolute migration data
-        absolute_data = {"migrations": absolute_migrations}
-        absolute_filename = f"src/assets/migration_{era}.json"
-        with open(absolute_filename, "w") as f:
-            json.dump(absolute_data, f, indent=2)
-        
-        # save migration rate data (per 100,000 inhabitants)
-        rate_data = {"migrations": rate_migrations}
-        rate_filename = f"src/assets/migration_rate_{era}.json"
-        with open(rate_filename, "w") as f:
-            json.dump(rate_data, f, indent=2)
-        
-        print(f"generated {len(absolute_migrations)} migration records for {era}")
-        print(f"absolute data saved to {absolute_filename}")
-        print(f"rate data saved to {rate_filename}")
-        
-        # show top 10 migration flows for this era (absolute numbers)
-        print(f"\ntop 10 absolute migration flows for {era}:")
-        for i, migration in enumerate(absolute_migrations[:10]):
-            print(f"  {i+1}. {migration['origin']} → {migration['destination']}: {migration['value']:,}")
-        
-        # show top 10 migration rates for this era
-        print(f"\ntop 10 migration rates for {era} (per 100,000 inhabitants):")
-        for i, migration in enumerate(rate_migrations[:10]):
-            print(f"  {i+1}. {migration['origin']} → {migration['destination']}: {migration['value']:,}")
-        print("-" * 50)
+    parser = argparse.ArgumentParser(description="generate synthetic state-to-state migration data")
+    parser.add_argument("--ensemble", type=int, default=0, metavar="N",
+                        help="draw N realizations per era and save per-flow mean, std and percentiles")
+    parser.add_argument("--percentiles", type=float, nargs="+", default=ENSEMBLE_PERCENTILES,
+                        help="percentiles reported in ensemble mode")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the per-pair random streams")
+    parser.add_argument("--distance-model", choices=DISTANCE_MODELS, default="regions",
+                        help="census region rules or a geometry-based gravity model")
+    parser.add_argument("--calibration", metavar="FILE",
+                        help="apply parameters fitted by calibrate_migration_model.py")
+    parser.add_argument("--lod", action="store_true",
+                        help="also write level-of-detail tiers (global and per origin) for every era and view")
+    parser.add_argument("--full", action="store_true",
+                        help="regenerate every era instead of only the rows and columns whose inputs changed")
+    args = parser.parse_args()
+
+    if args.calibration:
+        apply_calibration(args.calibration)
+
+    if args.ensemble > 0:
+        save_ensembles(args.ensemble, args.percentiles, args.seed, args.distance_model)
+        return
+
+    previous_params = {} if args.full else load_params()
+    params = {}
+    for era in ERAS:
+        params[era] = save_era(era, args.seed, previous_params.get(era), args.distance_model)
+        if args.lod:
+            save_lod_tiers(era)
+
+    with open(os.path.join(OUTPUT_DIR, PARAMS_FILENAME), "w") as f:
+        json.dump(params, f, indent=2)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,155 @@
+import argparse
+import bisect
+import json
+import math
+import os
+import statistics
+from typing import Dict, List, Optional
+
+from flight_shards import load_flights
+
+# indexing stage over a scenario's flights: writes summary tables next to flights.json so
+# the travel views can render and filter routes without scanning every flight.
+
+ROUTE_SUMMARY_FILENAME = "route_summary.json"
+FACET_INDEX_FILENAME = "facet_index.json"
+
+# flight fields that get posting lists (sorted flight ids per value)
+FACETS = ["date", "airline", "origin", "destination"]
+PRICE_BIN_WIDTH = 50
+
+
+def summarize(flights: List[Dict]) -> Dict:
+    """count, price range, airlines and shortest duration of a group of flights."""
+    prices = [flight["price"] for flight in flights]
+    return {
+        "count": len(flights),
+        "min_price": min(prices),
+        "median_price": round(statistics.median(prices), 2),
+        "max_price": max(prices),
+        "airlines": sorted({flight["airline"]["code"] for flight in flights}),
+        "min_duration": min(flight["duration"] for flight in flights),
+    }
+
+
+def route_summaries(flights: List[Dict]) -> Dict:
+    """summary rows per (origin, destination) and per (origin, destination, date), sorted by key.
+
+    a route date with a single flight gets no row: its summary would just repeat that flight
+    (the views find it through the date and origin postings of the facet index), and those
+    rows are most of them, which made the table nearly one row per flight."""
+    by_route = {}
+    by_route_date = {}
+    for flight in flights:
+        by_route.setdefault((flight["origin"], flight["destination"]), []).append(flight)
+        by_route_date.setdefault((flight["origin"], flight["destination"], flight["date"]), []).append(flight)
+    return {
+        "routes": [
+            dict({"origin": origin, "destination": destination}, **summarize(group))
+            for (origin, destination), group in sorted(by_route.items())
+        ],
+        "route_dates": [
+            dict({"origin": origin, "destination": destination, "date": date}, **summarize(group))
+            for (origin, destination, date), group in sorted(by_route_date.items())
+            if len(group) > 1
+        ],
+    }
+
+
+def facet_value(flight: Dict, facet: str) -> str:
+    return flight["airline"]["code"] if facet == "airline" else flight[facet]
+
+
+def facet_index(flights: List[Dict]) -> Dict:
+    """inverted index over the flights.
+
+    postings[facet][value] is the sorted list of flight ids with that value, so a compound
+    filter is an intersection of posting lists; counts[facet][value] are the facet counts.
+    price_order lists the ids by price and price_bins splits it into PRICE_BIN_WIDTH wide
+    bins: the flights of bin i are price_order[offsets[i]:offsets[i + 1]]."""
+    postings = {facet: {} for facet in FACETS}
+    for flight in sorted(flights, key=lambda f: f["id"]):
+        for facet in FACETS:
+            postings[facet].setdefault(facet_value(flight, facet), []).append(flight["id"])
+    postings = {facet: dict(sorted(values.items())) for facet, values in postings.items()}
+
+    by_price = sorted(flights, key=lambda f: (f["price"], f["id"]))
+    prices = [flight["price"] for flight in by_price]
+    if prices:
+        low = math.floor(prices[0] / PRICE_BIN_WIDTH) * PRICE_BIN_WIDTH
+        bins = math.floor(prices[-1] / PRICE_BIN_WIDTH) - low // PRICE_BIN_WIDTH + 1
+        edges = [low + i * PRICE_BIN_WIDTH for i in range(bins + 1)]
+    else:
+        edges = [0, PRICE_BIN_WIDTH]
+    offsets = [bisect.bisect_left(prices, edge) for edge in edges[:-1]] + [len(prices)]
+
+    return {
+        "count": len(flights),
+        "postings": postings,
+        "counts": {facet: {value: len(ids) for value, ids in values.items()}
+                   for facet, values in postings.items()},
+        "price_order": [flight["id"] for flight in by_price],
+        "prices": prices,
+        "price_bins": {
+            "edges": edges,
+            "offsets": offsets,
+            "counts": [offsets[i + 1] - offsets[i] for i in range(len(edges) - 1)],
+        },
+    }
+
+
+def intersect(posting_lists: List[List[int]]) -> List[int]:
+    """intersection of sorted id lists, walking the shortest list and bisecting the others."""
+    if not posting_lists:
+        return []
+    posting_lists = sorted(posting_lists, key=len)
+    result = []
+    for flight_id in posting_lists[0]:
+        for ids in posting_lists[1:]:
+            i = bisect.bisect_left(ids, flight_id)
+            if i == len(ids) or ids[i] != flight_id:
+                break
+        else:
+            result.append(flight_id)
+    return result
+
+
+def query(index: Dict, min_price: Optional[float] = None, max_price: Optional[float] = None,
+          **filters: str) -> List[int]:
+    """sorted ids of the flights matching every facet filter (e.g. date="2025-06-10",
+    airline="AC") and the price range, answered from the index alone."""
+    lists = [index["postings"][facet].get(value, []) for facet, value in filters.items()]
+    if min_price is not None or max_price is not None:
+        start = 0 if min_price is None else bisect.bisect_left(index["prices"], min_price)
+        end = len(index["prices"]) if max_price is None else bisect.bisect_right(index["prices"], max_price)
+        lists.append(sorted(index["price_order"][start:end]))
+    if not lists:
+        return sorted(index["price_order"])
+    return intersect(lists)
+
+
+def main():
+    """build the flight indexes of one scenario."""
+    parser = argparse.ArgumentParser(description="write summary indexes next to a scenario's flights")
+    parser.add_argument("--assets-dir", default="assets",
+                        help="directory holding flights.json (or date shards)")
+    args = parser.parse_args()
+
+    flights = load_flights(args.assets_dir)
+    summary = route_summaries(flights)
+    path = os.path.join(args.assets_dir, ROUTE_SUMMARY_FILENAME)
+    with open(path, "w") as f:
+        json.dump(summary, f, separators=(",", ":"))
+    print(f"{len(summary['routes'])} routes and {len(summary['route_dates'])} route dates with several flights "
+          f"from {len(flights)} flights saved to {path}")
+
+    index = facet_index(flights)
+    path = os.path.join(args.assets_dir, FACET_INDEX_FILENAME)
+    with open(path, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    print(f"facet index with {sum(len(values) for values in index['postings'].values())} posting lists "
+          f"and {len(index['price_bins']['counts'])} price bins saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import argparse
+import bisect
+import heapq
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from flight_shards import load_flights
+from phase_profiler import add_profile_arguments, profiler_from_args
+
+# connecting itineraries (up to MAX_STOPS stops) for the travel puzzle. for every start date
+# a time-expanded graph is built over the flights leaving that day or the next: each flight
+# is an edge from its departure event to its arrival event, and an arrival connects to the
+# departures at the same airport between MIN_CONNECTION_MINUTES and MAX_LAYOVER_MINUTES
+# later (found by bisecting the airport's time-sorted departures). a label-setting
+# (dijkstra) search over (flight, legs) labels then finds the cheapest itinerary to every
+# destination and arrival date without enumerating flight combinations.
+
+MIN_CONNECTION_MINUTES = 60
+MAX_LAYOVER_MINUTES = 12 * 60
+MAX_STOPS = 2
+ITINERARIES_FILENAME = "itinerary_solutions.json"
+TIME_FORMAT = "%Y-%m-%dT%H:%M"
+EPOCH = datetime(2000, 1, 1)
+
+
+def to_minutes(timestamp: str) -> int:
+    """minutes since EPOCH of a "YYYY-MM-DDTHH:MM" timestamp."""
+    return int((datetime.strptime(timestamp, TIME_FORMAT) - EPOCH).total_seconds() // 60)
+
+
+def next_date(date: str) -> str:
+    return (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+class TimeExpandedGraph:
+    """departure / arrival events of a set of flights with indexed connection lookups."""
+
+    def __init__(self, flights: List[Dict], min_connection: int = MIN_CONNECTION_MINUTES,
+                 max_layover: int = MAX_LAYOVER_MINUTES):
+        self.min_connection = min_connection
+        self.max_layover = max_layover
+        self.flights = {}
+        self.departure = {}
+        self.arrival = {}
+        departures = {}
+        for flight in flights:
+            if "departure" not in flight or "arrival" not in flight:
+                raise ValueError("flights have no departure/arrival times, regenerate them with the current generators")
+            self.flights[flight["id"]] = flight
+            self.departure[flight["id"]] = to_minutes(flight["departure"])
+            self.arrival[flight["id"]] = to_minutes(flight["arrival"])
+            departures.setdefault(flight["origin"], []).append((self.departure[flight["id"]], flight["id"]))
+        # per airport: departure times and flight ids, both sorted by time
+        self.departures = {}
+        for airport, events in departures.items():
+            events.sort()
+            self.departures[airport] = ([t for t, _ in events], [flight_id for _, flight_id in events])
+
+    def departures_on(self, airport: str, date: str) -> List[int]:
+        """ids of the flights leaving airport on date."""
+        if airport not in self.departures:
+            return []
+        times, ids = self.departures[airport]
+        start = to_minutes(f"{date}T00:00")
+        return ids[bisect.bisect_left(times, start):bisect.bisect_left(times, start + 24 * 60)]
+
+    def connections(self, flight_id: int) -> List[int]:
+        """flights that can be caught after landing with flight_id."""
+        airport = self.flights[flight_id]["destination"]
+        if airport not in self.departures:
+            return []
+        times, ids = self.departures[airport]
+        landed = self.arrival[flight_id]
+        return ids[bisect.bisect_left(times, landed + self.min_connection):
+                   bisect.bisect_right(times, landed + self.max_layover)]
+
+
+def cheapest_itineraries(graph: TimeExpandedGraph, origin: str, date: str, airlines: List[str], budget: float,
+                         max_stops: int = MAX_STOPS, banned: FrozenSet[int] = frozenset()) -> Dict[Tuple[str, str], Dict]:
+    """cheapest itinerary from origin, leaving on date, to every (destination, arrival date).
+    every leg has to be on one of the airlines, the total price within budget and no leg may
+    use a banned flight. labels are (price, flight, legs); a label is dropped when one with
+    no more legs reached the same flight at most as cheaply."""
+    airlines = set(airlines)
+    best = {}
+    parent = {}
+    heap = []
+
+    def push(cost: float, flight_id: int, legs: int, previous: Optional[Tuple[int, int]]):
+        if any(best.get((flight_id, fewer), float("inf")) <= cost for fewer in range(1, legs + 1)):
+            return
+        best[(flight_id, legs)] = cost
+        parent[(flight_id, legs)] = previous
+        heapq.heappush(heap, (cost, legs, flight_id))
+
+    def usable(flight_id: int) -> bool:
+        flight = graph.flights[flight_id]
+        return (flight_id not in banned and flight["airline"]["code"] in airlines
+                and flight["destination"] != origin)
+
+    for flight_id in graph.departures_on(origin, date):
+        if usable(flight_id) and graph.flights[flight_id]["price"] <= budget:
+            push(graph.flights[flight_id]["price"], flight_id, 1, None)
+
+    results = {}
+    while heap:
+        cost, legs, flight_id = heapq.heappop(heap)
+        if best.get((flight_id, legs)) != cost:
+            continue
+        flight = graph.flights[flight_id]
+        key = (flight["destination"], flight["arrival"][:10])
+        if key not in results:
+            # labels come off the heap cheapest first, so the first one settles the key
+            path = []
+            label = (flight_id, legs)
+            while label is not None:
+                path.append(label[0])
+                label = parent[label]
+            path.reverse()
+            results[key] = {
+                "flights": path,
+                "price": round(cost, 2),
+                "stops": len(path) - 1,
+                "departure": graph.flights[path[0]]["departure"],
+                "arrival": flight["arrival"],
+            }
+        if legs > max_stops:
+            continue
+        for next_id in graph.connections(flight_id):
+            next_cost = cost + graph.flights[next_id]["price"]
+            if usable(next_id) and next_cost <= budget:
+                push(next_cost, next_id, legs + 1, (flight_id, legs))
+    return results
+
+
+def find_meetups(flights: List[Dict], puzzle: Dict, max_stops: int = MAX_STOPS,
+                 min_connection: int = MIN_CONNECTION_MINUTES) -> List[Dict]:
+    """cheapest pair of itineraries per (destination, arrival date) where both users land on
+    a date they are both available, each within budget, on preferred airlines and without
+    sharing a flight."""
+    users = [puzzle["friends"]["user_1"], puzzle["friends"]["user_2"]]
+    meeting_dates = set(users[0]["available_dates"]) & set(users[1]["available_dates"])
+
+    by_date = {}
+    for flight in flights:
+        by_date.setdefault(flight["date"], []).append(flight)
+    graphs = {}
+
+    def graph_for(date: str) -> TimeExpandedGraph:
+        # flights leaving on the start date or the next one, for overnight connections
+        if date not in graphs:
+            graphs[date] = TimeExpandedGraph(by_date.get(date, []) + by_date.get(next_date(date), []),
+                                             min_connection)
+        return graphs[date]
+
+    def search(user: Dict, banned: FrozenSet[int] = frozenset()) -> Dict[Tuple[str, str], Dict]:
+        found = {}
+        for date in user["available_dates"]:
+            itineraries = cheapest_itineraries(graph_for(date), user["origin_airport"], date,
+                                               user["preferred_airlines"], user["max_budget"], max_stops, banned)
+            for key, itinerary in itineraries.items():
+                if key[1] in meeting_dates and (key not in found or itinerary["price"] < found[key]["price"]):
+                    found[key] = itinerary
+        return found
+
+    best = [search(user) for user in users]
+    meetups = []
+    for key in sorted(set(best[0]) & set(best[1])):
+        pair = (best[0][key], best[1][key])
+        if set(pair[0]["flights"]) & set(pair[1]["flights"]):
+            # both cheapest itineraries use the same flight: retry each side without the other's flights
+            options = []
+            for i in (0, 1):
+                other = search(users[1 - i], frozenset(pair[i]["flights"])).get(key)
+                if other:
+                    options.append((pair[0], other) if i == 0 else (other, pair[1]))
+            if not options:
+                continue
+            pair = min(options, key=lambda p: p[0]["price"] + p[1]["price"])
+        meetups.append({"destination": key[0], "date": key[1], "user_1": pair[0], "user_2": pair[1]})
+    return meetups
+
+
+def main():
+    """find connecting-flight meetups for a scenario."""
+    parser = argparse.ArgumentParser(description="solve the travel puzzle with connecting flights")
+    parser.add_argument("--assets-dir", default="assets",
+                        help="directory holding the flights (with departure/arrival times) and puzzle_description.json")
+    parser.add_argument("--max-stops", type=int, default=MAX_STOPS)
+    parser.add_argument("--min-connection", type=int, default=MIN_CONNECTION_MINUTES,
+                        help="minimum connection time in minutes")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(os.path.basename(__file__), args)
+
+    with profiler.phase("load"):
+        flights = load_flights(args.assets_dir)
+        with open(os.path.join(args.assets_dir, "puzzle_description.json"), "r") as f:
+            puzzle = json.load(f)
+
+    with profiler.phase("find_meetups"):
+        meetups = find_meetups(flights, puzzle, args.max_stops, args.min_connection)
+    for stops in range(args.max_stops + 1):
+        count = sum(1 for m in meetups if max(m["user_1"]["stops"], m["user_2"]["stops"]) <= stops)
+        print(f"{count} meetups with at most {stops} stops on the longer itinerary")
+    path = os.path.join(args.assets_dir, ITINERARIES_FILENAME)
+    with profiler.phase("json_write"):
+        with open(path, "w") as f:
+            json.dump({"max_stops": args.max_stops, "min_connection_minutes": args.min_connection,
+                       "meetups": meetups}, f, indent=2)
+    print(f"{len(meetups)} meetups saved to {path}")
+    profiler.count(flights=len(flights), meetups=len(meetups))
+    profiler.write()
+
+
+if __name__ == "__main__":
+    main()
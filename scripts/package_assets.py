@@ -0,0 +1,146 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List
+
+try:
+    import brotli
+except ImportError:  # brotli variants are skipped when the package is not installed
+    brotli = None
+
+# post-processing stage for the generated json assets: every file is minified and
+# stored once under a name derived from its content, so tables shared between
+# scenarios (airports.json, airlines.json, ...) become a single cacheable file.
+# gzip (and brotli, if available) variants are written next to each file and a
+# manifest maps the logical asset names to the hashed files.
+
+ASSETS_DIR = "src/assets"
+# directories under ASSETS_DIR whose json files are packaged
+PACKAGED_DIRS = ["situation", "situation2", "situation3", "situation4", "traveldata", "domesticmigration"]
+OUTPUT_DIR = "public/packed"
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# characters of the sha256 kept in file names
+HASH_LENGTH = 16
+# names of the files written for an asset, the only ones prune may delete
+HASHED_FILENAME = re.compile(rf"[^/]+\.[0-9a-f]{{{HASH_LENGTH}}}\.json(\.gz|\.br)?")
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def find_assets(assets_dir: str = ASSETS_DIR, directories: List[str] = PACKAGED_DIRS) -> List[str]:
+    """logical names (paths relative to assets_dir) of every json file to package, sorted."""
+    names = []
+    for directory in directories:
+        for root, _, files in os.walk(os.path.join(assets_dir, directory)):
+            for filename in files:
+                if filename.endswith(".json"):
+                    names.append(os.path.relpath(os.path.join(root, filename), assets_dir).replace(os.sep, "/"))
+    return sorted(names)
+
+
+def minify(path: str) -> bytes:
+    """compact utf-8 encoding of a json file, keeping key order."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def write_if_missing(path: str, data: bytes) -> bool:
+    """write a content-addressed file unless it is already there; returns whether it was written."""
+    if os.path.exists(path):
+        return False
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+
+def package_assets(names: List[str], assets_dir: str = ASSETS_DIR, output_dir: str = OUTPUT_DIR) -> Dict:
+    """minify, deduplicate and precompress the given assets and return the manifest."""
+    os.makedirs(output_dir, exist_ok=True)
+    assets = {}
+    blobs = {}  # sha256 -> entry of the stored file
+    for name in names:
+        source = os.path.join(assets_dir, name)
+        data = minify(source)
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in blobs:
+            # the first logical name decides the readable part of the file name
+            stem = os.path.splitext(os.path.basename(name))[0]
+            filename = f"{stem}.{digest[:HASH_LENGTH]}.json"
+            path = os.path.join(output_dir, filename)
+            entry = {"file": filename, "sha256": digest, "bytes": len(data)}
+            write_if_missing(path, data)
+            # mtime=0 keeps the gzip output byte-identical between runs
+            compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+            write_if_missing(path + ".gz", compressed)
+            entry["gzip_bytes"] = len(compressed)
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+                write_if_missing(path + ".br", compressed)
+                entry["brotli_bytes"] = len(compressed)
+            blobs[digest] = entry
+        assets[name] = dict(blobs[digest], source_bytes=os.path.getsize(source))
+
+    shared = {}
+    for name, entry in assets.items():
+        shared.setdefault(entry["file"], []).append(name)
+    return {
+        "version": MANIFEST_VERSION,
+        "encodings": ["gzip"] + (["br"] if brotli is not None else []),
+        "assets": assets,
+        "shared": {filename: users for filename, users in shared.items() if len(users) > 1},
+    }
+
+
+def prune(manifest: Dict, output_dir: str = OUTPUT_DIR) -> int:
+    """remove hashed files that the manifest no longer refers to; returns how many were removed.
+    only files named like package_assets writes them (<stem>.<hash>.json[.gz|.br]) are
+    candidates, anything else in output_dir (directories included) is left alone."""
+    keep = set()
+    for entry in manifest["assets"].values():
+        keep.update([entry["file"], entry["file"] + ".gz", entry["file"] + ".br"])
+    removed = 0
+    for filename in os.listdir(output_dir):
+        if (HASHED_FILENAME.fullmatch(filename) and filename not in keep
+                and os.path.isfile(os.path.join(output_dir, filename))):
+            os.remove(os.path.join(output_dir, filename))
+            removed += 1
+    return removed
+
+
+def main():
+    """package the json assets and write the manifest."""
+    parser = argparse.ArgumentParser(description="minify, deduplicate and precompress the json assets")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="where the hashed files and manifest go")
+    args = parser.parse_args()
+
+    names = find_assets()
+    manifest = package_assets(names, output_dir=args.output_dir)
+    removed = prune(manifest, args.output_dir)
+    with open(os.path.join(args.output_dir, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    stored = {entry["file"]: entry for entry in manifest["assets"].values()}
+    source_bytes = sum(entry["source_bytes"] for entry in manifest["assets"].values())
+    minified_bytes = sum(entry["bytes"] for entry in stored.values())
+    gzip_bytes = sum(entry["gzip_bytes"] for entry in stored.values())
+    print(f"packaged {len(names)} assets into {len(stored)} files ({len(manifest['shared'])} shared)")
+    print(f"  source:   {source_bytes / 1024:,.0f} KB")
+    print(f"  minified: {minified_bytes / 1024:,.0f} KB")
+    print(f"  gzip:     {gzip_bytes / 1024:,.0f} KB")
+    if brotli is not None:
+        print(f"  brotli:   {sum(entry['brotli_bytes'] for entry in stored.values()) / 1024:,.0f} KB")
+    else:
+        print("  brotli:   skipped (pip install brotli to enable)")
+    if removed:
+        print(f"removed {removed} stale files")
+    print(f"manifest saved to {os.path.join(args.output_dir, MANIFEST_FILENAME)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# opt-in phase profiling for the scripts: wall time and peak traced python memory of every
+# named phase of a run, optionally with cProfile stats, written as a json report so runs of
+# growing scenario sizes can be compared. a disabled profiler costs nothing, so the phases
+# stay marked in the scripts permanently.
+#
+# enable with --profile REPORT.json (or the PUZZLE_PROFILE environment variable holding the
+# report path) and add --cprofile for the hottest functions.
+
+PROFILE_ENV = "PUZZLE_PROFILE"
+REPORT_VERSION = 1
+# functions listed in the report, by cumulative time
+CPROFILE_TOP = 40
+
+
+class PhaseProfiler:
+    """collects the phases of one script run. memory is traced with tracemalloc, which slows
+    python allocations down, so compare timings only between reports that both traced memory.
+    worker processes (--jobs) are not traced, only the parent process."""
+
+    def __init__(self, script: str, report_path: Optional[str] = None, cprofile: bool = False):
+        self.script = script
+        self.report_path = report_path
+        self.enabled = report_path is not None
+        self.phases = []
+        self.counts = {}
+        self.profile = cProfile.Profile() if self.enabled and cprofile else None
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name: str):
+        """time the block as phase `name`; the peak is the highest traced memory during it."""
+        if not self.enabled:
+            yield
+            return
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        if self.profile:
+            self.profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if self.profile:
+                self.profile.disable()
+            after, peak = tracemalloc.get_traced_memory()
+            self.phases.append({
+                "name": name,
+                "seconds": round(seconds, 6),
+                "peak_memory_bytes": peak,
+                "memory_delta_bytes": after - before,
+            })
+
+    def count(self, **counts):
+        """record sizes of the run (flights, solutions, ...) next to the timings."""
+        self.counts.update(counts)
+
+    def cprofile_stats(self) -> List[Dict]:
+        """the CPROFILE_TOP functions with the highest cumulative time."""
+        stats = pstats.Stats(self.profile)
+        rows = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({
+                "function": f"{os.path.basename(filename)}:{line}({function})",
+                "calls": calls,
+                "total_seconds": round(total, 6),
+                "cumulative_seconds": round(cumulative, 6),
+            })
+        rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+        return rows[:CPROFILE_TOP]
+
+    def report(self) -> Dict:
+        report = {
+            "version": REPORT_VERSION,
+            "script": self.script,
+            "argv": sys.argv[1:],
+            "python": platform.python_version(),
+            "started_at": self.started_at,
+            "total_seconds": round(time.perf_counter() - self.started, 6),
+            "peak_memory_bytes": max((phase["peak_memory_bytes"] for phase in self.phases), default=0),
+            "counts": self.counts,
+            "phases": self.phases,
+        }
+        if self.profile:
+            report["cprofile"] = self.cprofile_stats()
+        return report
+
+    def write(self):
+        """write the json report (when enabled) and print a one-line summary per phase."""
+        if not self.enabled:
+            return
+        report = self.report()
+        directory = os.path.dirname(self.report_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        for phase in self.phases:
+            print(f"⏱️  {phase['name']:<18} {phase['seconds']:>9.3f}s  peak {phase['peak_memory_bytes'] / 2 ** 20:>8.1f} MiB")
+        print(f"💾 profile report saved to {self.report_path}")
+
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", default=None, metavar="REPORT",
+                        help=f"write a json report of the time and peak memory of every phase "
+                             f"(default: ${PROFILE_ENV} if set, otherwise no profiling)")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="also record the hottest functions with cProfile (needs --profile)")
+
+
+def profiler_from_args(script: str, args) -> PhaseProfiler:
+    """the profiler asked for by --profile/--cprofile or the PUZZLE_PROFILE variable (disabled otherwise)."""
+    return PhaseProfiler(script, args.profile or os.environ.get(PROFILE_ENV) or None, args.cprofile)
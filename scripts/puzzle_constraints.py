@@ -0,0 +1,286 @@
+import bisect
+import operator
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# declarative puzzle rules. puzzle_description.json carries them as constraints.spec:
+#   "flight": rules each user's own flight has to pass, e.g.
+#       {"field": "price", "op": "le", "user": "max_budget"}   value taken from the user's profile
+#       {"field": "duration", "op": "le", "value": 12}         literal value
+#       {"field": "airline.code", "op": "not_in", "value": ["AA"]}
+#   "pair": rules between the two users' flights:
+#       {"field": "destination", "op": "eq"}                    part of the join key
+#       {"field": "arrival", "op": "within", "value": 180}      minutes apart at most, swept per bucket
+#       {"field": "id", "op": "ne"}                             checked on the joined pairs
+# compile_puzzle turns a spec into numpy masks over a FlightTable for bulk work (finding every
+# solution) and into plain predicates for code that looks at one flight at a time (the
+# generators' reroll checks), so a new rule only has to be added to the spec.
+
+FLIGHT_OPS = {"eq", "ne", "lt", "le", "gt", "ge", "in", "not_in"}
+PAIR_OPS = {"eq", "ne", "within"}
+COMPARE = {"eq": operator.eq, "ne": operator.ne, "lt": operator.lt, "le": operator.le,
+           "gt": operator.gt, "ge": operator.ge}
+OP_WORDS = {"eq": "must be", "ne": "must not be", "lt": "must be below", "le": "must be at most",
+            "gt": "must be above", "ge": "must be at least", "in": "must be one of",
+            "not_in": "must not be one of"}
+
+# "YYYY-MM-DDTHH:MM" timestamp fields are compared as minutes since TIME_EPOCH
+TIME_FIELDS = {"departure", "arrival"}
+TIME_EPOCH = np.datetime64("2000-01-01T00:00", "m")
+
+BASE_FLIGHT_RULES = [
+    {"field": "origin", "op": "eq", "user": "origin_airport"},
+    {"field": "date", "op": "in", "user": "available_dates"},
+    {"field": "price", "op": "le", "user": "max_budget"},
+    {"field": "airline.code", "op": "in", "user": "preferred_airlines"},
+]
+BASE_PAIR_RULES = [
+    {"field": "destination", "op": "eq"},
+    {"field": "date", "op": "eq"},
+    {"field": "id", "op": "ne"},
+]
+
+
+def build_spec(flight_rules: Iterable[Dict] = (), max_arrival_gap_hours: Optional[float] = None) -> Dict:
+    """the base rules plus extra per-flight rules and an optional arrival window."""
+    pair_rules = list(BASE_PAIR_RULES)
+    if max_arrival_gap_hours is not None:
+        pair_rules.append({"field": "arrival", "op": "within", "value": round(max_arrival_gap_hours * 60)})
+    return {"flight": BASE_FLIGHT_RULES + list(flight_rules), "pair": pair_rules}
+
+
+def puzzle_spec(puzzle: Dict) -> Dict:
+    """the spec of a puzzle; puzzles written before specs existed get the one their constraints imply."""
+    constraints = puzzle["constraints"]
+    if "spec" in constraints:
+        return constraints["spec"]
+    return build_spec(max_arrival_gap_hours=constraints.get("max_arrival_gap_hours"))
+
+
+def raw_value(flight: Dict, field: str):
+    """value of a (dotted) field of a flight, raises KeyError if it is missing."""
+    value = flight
+    for part in field.split("."):
+        value = value[part]
+    return value
+
+
+def to_minutes(timestamps):
+    """minutes since TIME_EPOCH of one timestamp or an array of them."""
+    return (np.asarray(timestamps, dtype="datetime64[m]") - TIME_EPOCH).astype(np.int64)
+
+
+def field_value(flight: Dict, field: str):
+    """value of a field as the rules compare it (timestamps as minutes)."""
+    value = raw_value(flight, field)
+    return int(to_minutes(value)) if field in TIME_FIELDS else value
+
+
+class FlightTable:
+    """column view of a flight list. columns are built on first use; text columns are stored
+    as codes into their sorted vocabulary, so codes compare like the strings they stand for."""
+
+    def __init__(self, flights: List[Dict]):
+        self.flights = flights
+        self.columns = {}
+
+    def __len__(self) -> int:
+        return len(self.flights)
+
+    def column(self, field: str) -> Tuple[np.ndarray, Optional[List[str]]]:
+        """(values or codes, vocabulary) of a field; the vocabulary is None for numeric fields."""
+        if field not in self.columns:
+            try:
+                parts = field.split(".")
+                values = [flight[parts[0]] for flight in self.flights]
+                for part in parts[1:]:
+                    values = [value[part] for value in values]
+            except KeyError:
+                hint = ", regenerate them with the current generators" if field in TIME_FIELDS else ""
+                raise ValueError(f"flights have no {field} field{hint}") from None
+            if field in TIME_FIELDS:
+                self.columns[field] = (to_minutes(values).astype(np.float64), None)
+            elif values and isinstance(values[0], str):
+                vocabulary, codes = np.unique(np.array(values), return_inverse=True)
+                self.columns[field] = (codes.astype(np.int64), vocabulary.tolist())
+            else:
+                self.columns[field] = (np.array(values, dtype=np.float64), None)
+        return self.columns[field]
+
+    def codes(self, field: str) -> np.ndarray:
+        """dense integer codes of a field, equal exactly where the values are equal."""
+        values, vocabulary = self.column(field)
+        if vocabulary is not None:
+            return values
+        return np.unique(values, return_inverse=True)[1].astype(np.int64)
+
+
+def text_mask(codes: np.ndarray, vocabulary: List[str], op: str, value) -> np.ndarray:
+    if op in ("in", "not_in"):
+        hit = np.isin(codes, [i for i, word in enumerate(vocabulary) if word in set(value)])
+        return hit if op == "in" else ~hit
+    low = bisect.bisect_left(vocabulary, value)
+    high = bisect.bisect_right(vocabulary, value)
+    if op == "eq":
+        return (codes >= low) & (codes < high)
+    if op == "ne":
+        return (codes < low) | (codes >= high)
+    return {"lt": codes < low, "le": codes < high, "gt": codes >= high, "ge": codes >= low}[op]
+
+
+def compare(op: str, left, right) -> bool:
+    if op == "in":
+        return left in right
+    if op == "not_in":
+        return left not in right
+    return COMPARE[op](left, right)
+
+
+class CompiledSpec:
+    """a spec bound to the puzzle's users, with vectorized and per-flight evaluation."""
+
+    def __init__(self, spec: Dict, users: Dict[str, Dict]):
+        self.users = users
+        self.flight_rules = list(spec["flight"])
+        for rule in self.flight_rules:
+            if rule["op"] not in FLIGHT_OPS:
+                raise ValueError(f"unknown flight rule op: {rule['op']}")
+            if ("user" in rule) == ("value" in rule):
+                raise ValueError(f"flight rule on {rule['field']} needs exactly one of user / value")
+        self.pair_rules = list(spec["pair"])
+        for rule in self.pair_rules:
+            if rule["op"] not in PAIR_OPS:
+                raise ValueError(f"unknown pair rule op: {rule['op']}")
+        self.join_fields = [rule["field"] for rule in self.pair_rules if rule["op"] == "eq"]
+        self.windows = [(rule["field"], rule["value"]) for rule in self.pair_rules if rule["op"] == "within"]
+        self.distinct_fields = [rule["field"] for rule in self.pair_rules if rule["op"] == "ne"]
+
+    def rule_value(self, rule: Dict, user: str):
+        return self.users[user][rule["user"]] if "user" in rule else rule["value"]
+
+    def rule_masks(self, table: FlightTable, user: str) -> np.ndarray:
+        """(rules, flights) boolean array: whether each flight passes each flight rule for user."""
+        masks = np.ones((len(self.flight_rules), len(table)), dtype=bool)
+        for index, rule in enumerate(self.flight_rules):
+            values, vocabulary = table.column(rule["field"])
+            value = self.rule_value(rule, user)
+            if vocabulary is not None:
+                masks[index] = text_mask(values, vocabulary, rule["op"], value)
+            elif rule["op"] in ("in", "not_in"):
+                hit = np.isin(values, list(value))
+                masks[index] = hit if rule["op"] == "in" else ~hit
+            else:
+                masks[index] = COMPARE[rule["op"]](values, value)
+        return masks
+
+    def flight_mask(self, table: FlightTable, user: str) -> np.ndarray:
+        """boolean mask of the flights passing every flight rule for user."""
+        return self.rule_masks(table, user).all(axis=0)
+
+    def failed_flight_rule(self, flight: Dict, user: str) -> Optional[Dict]:
+        """the first flight rule a flight fails for user, or None."""
+        for rule in self.flight_rules:
+            if not compare(rule["op"], field_value(flight, rule["field"]), self.rule_value(rule, user)):
+                return rule
+        return None
+
+    def flight_ok(self, flight: Dict, user: str) -> bool:
+        return self.failed_flight_rule(flight, user) is None
+
+    def failed_pair_rule(self, flight_1: Dict, flight_2: Dict, skip_missing: bool = False) -> Optional[Dict]:
+        """the first pair rule two flights fail, or None. with skip_missing, rules on fields
+        the flights do not have yet (a candidate without an id or schedule) are skipped."""
+        for rule in self.pair_rules:
+            try:
+                left = field_value(flight_1, rule["field"])
+                right = field_value(flight_2, rule["field"])
+            except KeyError:
+                if skip_missing:
+                    continue
+                raise
+            if rule["op"] == "within":
+                passed = abs(left - right) <= rule["value"]
+            else:
+                passed = compare(rule["op"], left, right)
+            if not passed:
+                return rule
+        return None
+
+    def is_valid(self, flight_1: Dict, flight_2: Dict) -> bool:
+        """whether user 1 on flight_1 and user 2 on flight_2 solve the puzzle."""
+        return (self.flight_ok(flight_1, "user_1") and self.flight_ok(flight_2, "user_2")
+                and self.failed_pair_rule(flight_1, flight_2) is None)
+
+    def violations(self, flight_1: Dict, flight_2: Dict) -> List[str]:
+        """a readable line for every rule a pick breaks."""
+        messages = []
+        for user, flight in (("user_1", flight_1), ("user_2", flight_2)):
+            for rule in self.flight_rules:
+                value = self.rule_value(rule, user)
+                if not compare(rule["op"], field_value(flight, rule["field"]), value):
+                    messages.append(f"{user}'s flight: {rule['field']} {OP_WORDS[rule['op']]} {value}")
+        for rule in self.pair_rules:
+            left = field_value(flight_1, rule["field"])
+            right = field_value(flight_2, rule["field"])
+            if rule["op"] == "eq" and left != right:
+                messages.append(f"both flights need the same {rule['field']}")
+            elif rule["op"] == "ne" and left == right:
+                messages.append(f"the flights need different {rule['field']} values")
+            elif rule["op"] == "within" and abs(left - right) > rule["value"]:
+                messages.append(f"{rule['field']} times must be at most {rule['value']} minutes apart")
+        return messages
+
+    def join_keys(self, table: FlightTable) -> np.ndarray:
+        """one integer per flight, equal for flights that agree on every pair eq field."""
+        keys = np.zeros(len(table), dtype=np.int64)
+        for field in self.join_fields:
+            codes = table.codes(field)
+            keys = keys * (int(codes.max(initial=0)) + 1) + codes
+        return keys
+
+    def join(self, table: FlightTable) -> Tuple[np.ndarray, np.ndarray]:
+        """positions (i, j) in table of every valid (user 1, user 2) flight pair.
+        eligible flights come from the masks, pairs are matched per join key bucket and, with a
+        window rule, each user 1 flight gets its window of user 2 flights by binary search
+        over the bucket sorted by time; remaining pair rules filter the joined arrays."""
+        side_1 = np.flatnonzero(self.flight_mask(table, "user_1"))
+        side_2 = np.flatnonzero(self.flight_mask(table, "user_2"))
+        keys = self.join_keys(table)
+        times = table.column(self.windows[0][0])[0] if self.windows else np.zeros(len(table))
+        width = self.windows[0][1] if self.windows else None
+
+        order_2 = side_2[np.lexsort((times[side_2], keys[side_2]))]
+        left, right = [], []
+        for key in np.intersect1d(keys[side_1], keys[order_2]):
+            bucket_1 = side_1[keys[side_1] == key]
+            bucket_2 = order_2[keys[order_2] == key]
+            if width is None:
+                low = np.zeros(len(bucket_1), dtype=np.int64)
+                high = np.full(len(bucket_1), len(bucket_2), dtype=np.int64)
+            else:
+                low = np.searchsorted(times[bucket_2], times[bucket_1] - width, side="left")
+                high = np.searchsorted(times[bucket_2], times[bucket_1] + width, side="right")
+            counts = high - low
+            total = int(counts.sum())
+            starts = np.repeat(np.cumsum(counts) - counts, counts)
+            left.append(np.repeat(bucket_1, counts))
+            right.append(bucket_2[np.arange(total) - starts + np.repeat(low, counts)])
+        if not left:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        left = np.concatenate(left)
+        right = np.concatenate(right)
+
+        keep = np.ones(len(left), dtype=bool)
+        for field in self.distinct_fields:
+            values = table.column(field)[0]
+            keep &= values[left] != values[right]
+        for field, value in self.windows[1:]:
+            values = table.column(field)[0]
+            keep &= np.abs(values[left] - values[right]) <= value
+        return left[keep], right[keep]
+
+
+def compile_puzzle(puzzle: Dict) -> CompiledSpec:
+    """compile the spec of a loaded puzzle_description.json."""
+    return CompiledSpec(puzzle_spec(puzzle), puzzle["friends"])
@@ -0,0 +1,98 @@
+import json
+import os
+from typing import Dict, List
+
+# rejection-sampling telemetry of the flight generators. every interest and filler slot
+# rerolls its flight until it passes the generator's checks and falls back to an expensive
+# flight on another airline after max_attempts. the block generators count attempts,
+# rejections (by reason) and fallbacks per route; generate_flights merges them per phase and
+# the generators write the result next to the flights.
+
+TELEMETRY_FILENAME = "generation_telemetry.json"
+TELEMETRY_VERSION = 1
+# solution_date: the drawn date is one of the solution dates of the route (interest routes);
+# unintended_solution: the flight would pair into a solution at a non-solution destination
+REJECTION_REASONS = ["solution_date", "unintended_solution"]
+# routes listed in the file, by wasted attempts; the phase totals cover every route
+MAX_LISTED_ROUTES = 200
+
+
+def route_telemetry() -> Dict:
+    """empty counters of one route."""
+    return {
+        "flights": 0,
+        "attempts": 0,
+        "fallbacks": 0,
+        "rejections": {reason: 0 for reason in REJECTION_REASONS},
+        # attempts needed by each accepted flight -> number of flights (fallbacks not included)
+        "attempts_histogram": {},
+    }
+
+
+def record_slot(telemetry: Dict, attempts: int, fallback: bool = False):
+    """count one generated flight that took `attempts` draws."""
+    telemetry["flights"] += 1
+    telemetry["attempts"] += attempts
+    if fallback:
+        telemetry["fallbacks"] += 1
+    else:
+        key = str(attempts)
+        telemetry["attempts_histogram"][key] = telemetry["attempts_histogram"].get(key, 0) + 1
+
+
+def merge(total: Dict, telemetry: Dict):
+    """add the counters of telemetry to total."""
+    for key in ["flights", "attempts", "fallbacks"]:
+        total[key] += telemetry[key]
+    for reason, count in telemetry["rejections"].items():
+        total["rejections"][reason] += count
+    for attempts, count in telemetry["attempts_histogram"].items():
+        total["attempts_histogram"][attempts] = total["attempts_histogram"].get(attempts, 0) + count
+
+
+def wasted_attempts(telemetry: Dict) -> int:
+    """draws that did not become a flight (every draw of a fallback flight is wasted)."""
+    return telemetry["attempts"] - (telemetry["flights"] - telemetry["fallbacks"])
+
+
+def sorted_histogram(histogram: Dict) -> Dict:
+    return dict(sorted(histogram.items(), key=lambda kv: int(kv[0])))
+
+
+def summarize(blocks: List[Dict], telemetry: List[Dict], seed: int) -> Dict:
+    """per-phase totals and the routes that rerolled, for the blocks of flight_blocks and
+    the telemetry each block produced (in the same order)."""
+    phases = {}
+    routes = []
+    for block, counters in zip(blocks, telemetry):
+        if block["kind"] == "solution":
+            continue
+        merge(phases.setdefault(block["kind"], route_telemetry()), counters)
+        if wasted_attempts(counters):
+            routes.append(dict(counters, kind=block["kind"], origin=block["origin"], destination=block["destination"],
+                               attempts_histogram=sorted_histogram(counters["attempts_histogram"]),
+                               wasted_attempts=wasted_attempts(counters)))
+    for counters in phases.values():
+        counters["wasted_attempts"] = wasted_attempts(counters)
+        counters["attempts_histogram"] = sorted_histogram(counters["attempts_histogram"])
+    routes.sort(key=lambda route: (-route["wasted_attempts"], route["kind"], route["origin"], route["destination"]))
+    return {
+        "version": TELEMETRY_VERSION,
+        "seed": seed,
+        "phases": phases,
+        "rerolled_routes": len(routes),
+        "routes": routes[:MAX_LISTED_ROUTES],
+    }
+
+
+def phase_line(kind: str, counters: Dict) -> str:
+    rejections = ", ".join(f"{reason} {count}" for reason, count in counters["rejections"].items() if count)
+    return (f"🎲 {kind}: {counters['attempts']} draws for {counters['flights']} flights, "
+            f"{counters['fallbacks']} fallbacks" + (f" (rejected: {rejections})" if rejections else ""))
+
+
+def write_telemetry(summary: Dict, output_dir: str) -> str:
+    path = os.path.join(output_dir, TELEMETRY_FILENAME)
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2)
+    return path
@@ -0,0 +1,280 @@
+import argparse
+import importlib
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from analyze_puzzle_solutions import find_solutions, solution_record
+from puzzle_constraints import build_spec, compile_puzzle
+
+# differential correctness harness for the solution finders. random flight sets and puzzles
+# of many sizes and selectivities are solved by every candidate backend and by a reference.
+# puzzles without a spec (as written before specs existed) are checked against the
+# hard-coded nested loop find_solutions used before the rules were compiled, which shares no
+# code with the backends; puzzles with a spec against the flight pairs checked one by one
+# with CompiledSpec.is_valid. any difference fails the run, and every backend's solve time
+# and peak traced memory are recorded so a faster backend can be compared fairly.
+#
+#   python solver_harness.py                                  # the built-in backends
+#   python solver_harness.py --backend my_solver:find_all     # plus a candidate backend
+
+SIZES = [0, 1, 10, 100, 500, 2000]
+# how easily a flight passes the flight rules: share of airlines preferred, budget quantile
+# and share of available dates
+SELECTIVITIES = [0.1, 0.4, 0.8]
+TRIALS = 3
+AIRLINES = ["AA", "AC", "LH", "AF", "BA", "EK", "SQ", "NZ"]
+AIRPORTS = ["YYZ", "JFK", "FCO", "LHR", "CDG", "NRT", "SIN", "DEL", "ZRH", "BUD", "ARN", "SYD"]
+FIRST_DATE = datetime(2025, 7, 1)
+DATES = 10
+
+
+def built_in_backends() -> Dict[str, Callable]:
+    return {"find_solutions": find_solutions}
+
+
+def load_backend(spec: str) -> Tuple[str, Callable]:
+    """a "module:function" backend taking (flights, puzzle) and returning solution records."""
+    module_name, _, function_name = spec.partition(":")
+    if not function_name:
+        raise ValueError(f"backend {spec!r} is not in module:function form")
+    return spec, getattr(importlib.import_module(module_name), function_name)
+
+
+def random_case(seed: int, size: int, selectivity: float) -> Tuple[List[Dict], Dict]:
+    """a random flight set and puzzle. half of the cases let both users fly from the same
+    airport, so one flight can pass both users' rules and the distinct id rule matters; some
+    add an arrival window, and a third are legacy puzzles without a spec, while some of
+    the others add an extra flight rule."""
+    rng = random.Random(seed)
+    dates = [(FIRST_DATE + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(DATES)]
+    origins = rng.sample(AIRPORTS, 2)
+    if rng.random() < 0.5:
+        origins[1] = origins[0]
+    destinations = [airport for airport in AIRPORTS if airport not in origins]
+
+    flights = []
+    for flight_id in range(1, size + 1):
+        origin = rng.choice(origins) if rng.random() < 0.7 else rng.choice(AIRPORTS)
+        destination = rng.choice([airport for airport in destinations if airport != origin])
+        date = rng.choice(dates)
+        duration = round(rng.uniform(1, 16), 1)
+        departure = datetime.strptime(date, "%Y-%m-%d") + timedelta(minutes=rng.randrange(6 * 12, 23 * 12) * 5)
+        flights.append({
+            "id": flight_id,
+            "origin": origin,
+            "destination": destination,
+            # whole prices collide often, which exercises the budget boundary
+            "price": float(rng.randrange(100, 1500)) if rng.random() < 0.5 else round(rng.uniform(100, 1500), 2),
+            "duration": duration,
+            "date": date,
+            "airline": {"code": rng.choice(AIRLINES)},
+            "departure": departure.strftime("%Y-%m-%dT%H:%M"),
+            "arrival": (departure + timedelta(minutes=round(duration * 60))).strftime("%Y-%m-%dT%H:%M"),
+        })
+    prices = sorted(flight["price"] for flight in flights) or [0.0]
+
+    def user(origin: str) -> Dict:
+        return {
+            "origin_airport": origin,
+            "available_dates": sorted(rng.sample(dates, max(1, round(selectivity * DATES)))),
+            "preferred_airlines": sorted(rng.sample(AIRLINES, max(1, round(selectivity * len(AIRLINES))))),
+            # exactly a flight's price now and then, so "at most" is tested at the boundary
+            "max_budget": prices[min(len(prices) - 1, int(selectivity * len(prices)))],
+        }
+
+    extra_rules = [{"field": "duration", "op": "le", "value": 12}] if rng.random() < 0.3 else []
+    window = rng.choice([None, None, 1, 3, 8])
+    friends = {"user_1": user(origins[0]), "user_2": user(origins[1])}
+    if rng.random() < 1 / 3:
+        constraints = {
+            "must_arrive_same_day": True,
+            "both_must_afford": True,
+            "both_must_be_available": True,
+            "overlap_dates": sorted(set(friends["user_1"]["available_dates"])
+                                    & set(friends["user_2"]["available_dates"])),
+        }
+        if window is not None:
+            constraints["max_arrival_gap_hours"] = window
+    else:
+        constraints = {"spec": build_spec(extra_rules, window)}
+    return flights, {"friends": friends, "constraints": constraints}
+
+
+def arrival_minute(flight: Dict) -> int:
+    return int((datetime.strptime(flight["arrival"], "%Y-%m-%dT%H:%M") - FIRST_DATE).total_seconds() // 60)
+
+
+def is_valid_legacy_solution(flight_1: Dict, flight_2: Dict, user_1: Dict, user_2: Dict,
+                             max_gap: Optional[int] = None) -> bool:
+    """the hard-coded rules of a puzzle without a spec."""
+    if flight_1["date"] != flight_2["date"]:
+        return False
+    if flight_1["date"] not in user_1["available_dates"] or flight_1["date"] not in user_2["available_dates"]:
+        return False
+    if flight_1["price"] > user_1["max_budget"] or flight_2["price"] > user_2["max_budget"]:
+        return False
+    if (flight_1["airline"]["code"] not in user_1["preferred_airlines"]
+            or flight_2["airline"]["code"] not in user_2["preferred_airlines"]):
+        return False
+    if max_gap is not None and abs(arrival_minute(flight_1) - arrival_minute(flight_2)) > max_gap:
+        return False
+    return True
+
+
+def legacy_reference_solutions(flights: List[Dict], puzzle: Dict) -> List[Dict]:
+    """every valid pair of a puzzle without a spec, by the destination by destination nested
+    loop find_solutions used before the rules were compiled."""
+    user_1 = puzzle["friends"]["user_1"]
+    user_2 = puzzle["friends"]["user_2"]
+    hours = puzzle["constraints"].get("max_arrival_gap_hours")
+    max_gap = None if hours is None else round(hours * 60)
+    solutions = []
+    for destination in sorted({flight["destination"] for flight in flights}):
+        user_1_flights = [f for f in flights
+                          if f["origin"] == user_1["origin_airport"] and f["destination"] == destination]
+        user_2_flights = [f for f in flights
+                          if f["origin"] == user_2["origin_airport"] and f["destination"] == destination]
+        for flight_1 in user_1_flights:
+            for flight_2 in user_2_flights:
+                if flight_1["id"] == flight_2["id"]:
+                    continue
+                if is_valid_legacy_solution(flight_1, flight_2, user_1, user_2, max_gap):
+                    solutions.append(solution_record(flight_1, flight_2))
+    solutions.sort(key=lambda sol: (sol["destination"], sol["user_1_flight"]["id"], sol["user_2_flight"]["id"]))
+    return solutions
+
+
+def reference_solutions(flights: List[Dict], puzzle: Dict) -> List[Dict]:
+    """every valid pair by checking the flight pairs one by one (the flight rules are checked
+    once per flight first, which is what is_valid would check on every pair anyway). puzzles
+    without a spec go through the hard-coded legacy loop instead."""
+    if "spec" not in puzzle["constraints"]:
+        return legacy_reference_solutions(flights, puzzle)
+    rules = compile_puzzle(puzzle)
+    side_1 = [flight for flight in flights if rules.flight_ok(flight, "user_1")]
+    side_2 = [flight for flight in flights if rules.flight_ok(flight, "user_2")]
+    solutions = [solution_record(flight_1, flight_2) for flight_1 in side_1 for flight_2 in side_2
+                 if rules.is_valid(flight_1, flight_2)]
+    solutions.sort(key=lambda sol: (sol["destination"], sol["user_1_flight"]["id"], sol["user_2_flight"]["id"]))
+    return solutions
+
+
+def pair_ids(solutions: List[Dict]) -> set:
+    return {(sol["user_1_flight"]["id"], sol["user_2_flight"]["id"]) for sol in solutions}
+
+
+def difference(expected: List[Dict], actual: List[Dict]) -> str:
+    """empty when the solution lists are identical, otherwise what differs."""
+    if actual == expected:
+        return ""
+    missing = pair_ids(expected) - pair_ids(actual)
+    extra = pair_ids(actual) - pair_ids(expected)
+    if missing or extra:
+        return f"{len(missing)} missing pairs {sorted(missing)[:5]}, {len(extra)} extra pairs {sorted(extra)[:5]}"
+    if len(actual) != len(expected):
+        return f"{len(actual)} solutions instead of {len(expected)} (duplicates)"
+    return "same pairs, but in a different order or with different records"
+
+
+def measure(solver: Callable, flights: List[Dict], puzzle: Dict) -> Tuple[List[Dict], float, int]:
+    """(solutions, seconds of an untraced run, peak traced memory of a second run)."""
+    start = time.perf_counter()
+    solutions = solver(flights, puzzle)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    solver(flights, puzzle)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return solutions, seconds, peak
+
+
+def run(backends: Dict[str, Callable], sizes: List[int], selectivities: List[float], trials: int,
+        seed: int) -> Tuple[Dict, List[Dict]]:
+    """solve every case with the reference and every backend; returns the per-backend totals
+    and the failures (each with the case seed, so it can be rerun with --case)."""
+    totals = {name: {"cases": 0, "seconds": 0.0, "peak_memory_bytes": 0, "by_size": {}}
+              for name in ["reference"] + list(backends)}
+    failures = []
+    for size in sizes:
+        for selectivity in selectivities:
+            for trial in range(trials):
+                case_seed = seed * 1_000_003 + size * 1009 + round(selectivity * 100) * 31 + trial
+                flights, puzzle = random_case(case_seed, size, selectivity)
+                expected, seconds, peak = measure(reference_solutions, flights, puzzle)
+                results = {"reference": (seconds, peak)}
+                for name, solver in backends.items():
+                    try:
+                        actual, seconds, peak = measure(solver, flights, puzzle)
+                        problem = difference(expected, actual)
+                    except Exception as e:
+                        seconds, peak, problem = 0.0, 0, f"raised {type(e).__name__}: {e}"
+                    results[name] = (seconds, peak)
+                    if problem:
+                        failures.append({"backend": name, "case": case_seed, "size": size,
+                                         "selectivity": selectivity, "solutions": len(expected), "problem": problem})
+                for name, (seconds, peak) in results.items():
+                    total = totals[name]
+                    total["cases"] += 1
+                    total["seconds"] += seconds
+                    total["peak_memory_bytes"] = max(total["peak_memory_bytes"], peak)
+                    total["by_size"][str(size)] = total["by_size"].get(str(size), 0.0) + seconds
+    for total in totals.values():
+        total["seconds"] = round(total["seconds"], 6)
+        total["by_size"] = {size: round(seconds, 6) for size, seconds in total["by_size"].items()}
+    return totals, failures
+
+
+def main():
+    """check the solution finders against the reference on random puzzles."""
+    parser = argparse.ArgumentParser(description="differential test and benchmark of the solution finders")
+    parser.add_argument("--backend", action="append", default=[],
+                        help="extra backend as module:function taking (flights, puzzle), repeatable")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="flights per case")
+    parser.add_argument("--selectivities", type=float, nargs="+", default=SELECTIVITIES)
+    parser.add_argument("--trials", type=int, default=TRIALS, help="cases per size and selectivity")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--case", type=int, default=None, metavar="CASE_SEED",
+                        help="only rerun one failing case (with --sizes and --selectivities of that case)")
+    parser.add_argument("--output", default=None, help="also write the timings and failures as json")
+    args = parser.parse_args()
+
+    backends = built_in_backends()
+    backends.update(load_backend(spec) for spec in args.backend)
+
+    if args.case is not None:
+        flights, puzzle = random_case(args.case, args.sizes[0], args.selectivities[0])
+        expected = reference_solutions(flights, puzzle)
+        print(f"🔍 case {args.case}: {len(flights)} flights, {len(expected)} reference solutions")
+        print(json.dumps(puzzle, indent=2))
+        for name, solver in backends.items():
+            print(f"  {name}: {difference(expected, solver(flights, puzzle)) or 'identical'}")
+        return
+
+    cases = len(args.sizes) * len(args.selectivities) * args.trials
+    print(f"🧪 {cases} random cases, {len(backends)} backends against the reference")
+    totals, failures = run(backends, args.sizes, args.selectivities, args.trials, args.seed)
+    for name, total in totals.items():
+        by_size = "  ".join(f"{size}: {seconds * 1000:.1f}ms" for size, seconds in total["by_size"].items())
+        print(f"  {name:<20} {total['seconds']:>8.3f}s  peak {total['peak_memory_bytes'] / 2 ** 20:>6.1f} MiB  ({by_size})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"seed": args.seed, "sizes": args.sizes, "selectivities": args.selectivities,
+                       "trials": args.trials, "backends": totals, "failures": failures}, f, indent=2)
+        print(f"💾 results saved to {args.output}")
+    if failures:
+        print(f"❌ {len(failures)} cases differ from the reference:")
+        for failure in failures[:20]:
+            print(f"   {failure['backend']}: case {failure['case']} (size {failure['size']}, "
+                  f"selectivity {failure['selectivity']}): {failure['problem']}")
+        sys.exit(1)
+    print("✅ every backend matches the reference")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from analyze_puzzle_solutions import (
+    build_answer_key,
+    can_participate,
+    decode_answer_key,
+    find_solutions,
+    grade_pair,
+    load_data,
+)
+from puzzle_constraints import compile_puzzle
+
+# long-running local service answering puzzle questions at interactive latency. every
+# scenario is loaded once and indexed in memory; requests are small json posts over http
+# (tcp or a unix socket) handled concurrently by asyncio:
+#
+#   POST /validate   {"scenario": "situation4", "flight_1": 12, "flight_2": 40}
+#   POST /remaining  {"scenario": "situation4", "filters": {"date": "2025-07-17", "max_price": 650}}
+#   GET  /scenarios
+#
+# remaining filters: destination, date, airline (either flight), max_price (both flights),
+# user_1_flight / user_2_flight (a flight a user already picked).
+
+DEFAULT_SCENARIOS = {
+    "situation3": "src/assets/situation3",
+    "situation4": "src/assets/situation4",
+}
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1 << 16
+
+
+class Scenario:
+    """one puzzle's flights, solutions and the indexes used to answer queries."""
+
+    def __init__(self, name: str, flights: List[Dict], puzzle: Dict):
+        self.name = name
+        self.flights = {flight["id"]: flight for flight in flights}
+        self.user_1 = puzzle["friends"]["user_1"]
+        self.user_2 = puzzle["friends"]["user_2"]
+        self.rules = compile_puzzle(puzzle)
+        self.solutions = find_solutions(flights, puzzle)
+        self.answer_key = decode_answer_key(build_answer_key(self.solutions))
+
+        # posting sets of solution indices per filter value
+        self.postings = {"destination": {}, "date": {}, "airline": {}, "user_1_flight": {}, "user_2_flight": {}}
+        for i, sol in enumerate(self.solutions):
+            self.postings["destination"].setdefault(sol["destination"], set()).add(i)
+            self.postings["date"].setdefault(sol["date"], set()).add(i)
+            self.postings["user_1_flight"].setdefault(sol["user_1_flight"]["id"], set()).add(i)
+            self.postings["user_2_flight"].setdefault(sol["user_2_flight"]["id"], set()).add(i)
+            for airline in {sol["user_1_flight"]["airline"], sol["user_2_flight"]["airline"]}:
+                self.postings["airline"].setdefault(airline, set()).add(i)
+        # solutions ordered by their more expensive flight, for max_price filters
+        self.by_max_price = sorted(
+            (max(sol["user_1_flight"]["price"], sol["user_2_flight"]["price"]), i)
+            for i, sol in enumerate(self.solutions)
+        )
+
+    def validate(self, flight_1_id: int, flight_2_id: int) -> Dict:
+        """grade a pick and, for invalid ones, say which rules it breaks."""
+        valid = grade_pair(self.answer_key, flight_1_id, flight_2_id)
+        result = {
+            "valid": valid,
+            "user_1_can_participate": can_participate(self.answer_key, "user_1", flight_1_id),
+            "user_2_can_participate": can_participate(self.answer_key, "user_2", flight_2_id),
+        }
+        if not valid:
+            result["reasons"] = self.reasons(flight_1_id, flight_2_id)
+        return result
+
+    def reasons(self, flight_1_id: int, flight_2_id: int) -> List[str]:
+        flight_1 = self.flights.get(flight_1_id)
+        flight_2 = self.flights.get(flight_2_id)
+        if flight_1 is None or flight_2 is None:
+            return ["unknown flight id"]
+        return self.rules.violations(flight_1, flight_2)
+
+    def remaining(self, filters: Dict) -> int:
+        """number of solutions consistent with the filters, by intersecting posting sets."""
+        sets = []
+        for name, value in filters.items():
+            if name == "max_price":
+                continue
+            if name not in self.postings:
+                raise ValueError(f"unknown filter: {name}")
+            sets.append(self.postings[name].get(value, set()))
+        if "max_price" in filters:
+            cut = bisect.bisect_right(self.by_max_price, (filters["max_price"], float("inf")))
+            sets.append({i for _, i in self.by_max_price[:cut]})
+        if not sets:
+            return len(self.solutions)
+        sets.sort(key=len)
+        return len(sets[0].intersection(*sets[1:]))
+
+
+def load_scenarios(paths: Dict[str, str]) -> Dict[str, Scenario]:
+    scenarios = {}
+    for name, path in paths.items():
+        flights, puzzle = load_data(path)
+        if flights is None:
+            raise FileNotFoundError(f"scenario {name} has no data in {path}")
+        scenarios[name] = Scenario(name, flights, puzzle)
+        print(f"loaded {name}: {len(flights)} flights, {len(scenarios[name].solutions)} solutions")
+    return scenarios
+
+
+class SolverService:
+    """minimal http/1.1 json server (keep-alive, content-length bodies) over the scenarios."""
+
+    def __init__(self, scenarios: Dict[str, Scenario]):
+        self.scenarios = scenarios
+        self.requests = 0
+
+    def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        if method == "GET" and path == "/scenarios":
+            return 200, {name: {"flights": len(s.flights), "solutions": len(s.solutions)}
+                         for name, s in self.scenarios.items()}
+        if method != "POST" or path not in ("/validate", "/remaining"):
+            return 404, {"error": f"no route for {method} {path}"}
+        try:
+            request = json.loads(body or b"{}")
+            scenario = self.scenarios[request["scenario"]]
+            if path == "/validate":
+                return 200, scenario.validate(int(request["flight_1"]), int(request["flight_2"]))
+            filters = request.get("filters", {})
+            if not isinstance(filters, dict):
+                return 400, {"error": "filters must be an object of filter name to value"}
+            return 200, {"remaining": scenario.remaining(filters)}
+        except KeyError as e:
+            return 400, {"error": f"missing or unknown field: {e}"}
+        except (ValueError, TypeError) as e:
+            return 400, {"error": str(e)}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, response = 413, {"error": "request body too large"}
+                    body = b""
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, response = self.dispatch(method, path, body)
+                self.requests += 1
+
+                payload = json.dumps(response).encode()
+                keep_alive = headers.get("connection", "keep-alive").lower() != "close" and status != 413
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                    unix_path: Optional[str] = None) -> asyncio.AbstractServer:
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            return await asyncio.start_unix_server(self.handle, path=unix_path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+class SolverClient:
+    """stand-in client keeping one http connection open to the service."""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_path: Optional[str] = None):
+        self.host, self.port, self.unix_path = host, port, unix_path
+        self.reader = self.writer = None
+
+    async def connect(self):
+        if self.unix_path:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.unix_path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method: str, path: str, payload: Optional[Dict] = None) -> Tuple[int, Dict]:
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: solver\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                          + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def self_test(scenarios: Dict[str, Scenario], clients: int = 8, requests_per_client: int = 500,
+                    unix_path: Optional[str] = None):
+    """start the service on a free port (or unix socket), fire concurrent random queries from
+    stand-in clients and check every answer against the analyzer's own logic."""
+    service = SolverService(scenarios)
+    server = await service.start(port=0, unix_path=unix_path)
+    port = None if unix_path else server.sockets[0].getsockname()[1]
+    latencies = []
+    failures = []
+
+    async def run_client(seed: int):
+        rng = random.Random(seed)
+        client = SolverClient(port=port, unix_path=unix_path)
+        await client.connect()
+        for _ in range(requests_per_client):
+            scenario = scenarios[rng.choice(list(scenarios))]
+            if rng.random() < 0.5 and scenario.solutions:
+                # mix real solutions with random picks so both answers get exercised
+                sol = rng.choice(scenario.solutions)
+                pick = (sol["user_1_flight"]["id"], sol["user_2_flight"]["id"])
+                if rng.random() < 0.5:
+                    pick = (pick[0], rng.choice(list(scenario.flights)))
+            else:
+                pick = (rng.choice(list(scenario.flights)), rng.choice(list(scenario.flights)))
+            started = time.perf_counter()
+            status, response = await client.request("POST", "/validate", {
+                "scenario": scenario.name, "flight_1": pick[0], "flight_2": pick[1]})
+            latencies.append(time.perf_counter() - started)
+            flight_1, flight_2 = scenario.flights[pick[0]], scenario.flights[pick[1]]
+            expected = scenario.rules.is_valid(flight_1, flight_2)
+            if status != 200 or response["valid"] != expected:
+                failures.append(("validate", scenario.name, pick, response))
+
+            filters = {}
+            if rng.random() < 0.6:
+                filters["date"] = rng.choice(scenario.user_1["available_dates"])
+            if rng.random() < 0.4:
+                filters["airline"] = rng.choice(scenario.user_1["preferred_airlines"] + scenario.user_2["preferred_airlines"])
+            if rng.random() < 0.4:
+                filters["max_price"] = rng.choice([550, 620, 700, 800])
+            started = time.perf_counter()
+            status, response = await client.request("POST", "/remaining", {"scenario": scenario.name, "filters": filters})
+            latencies.append(time.perf_counter() - started)
+            expected = sum(
+                1 for sol in scenario.solutions
+                if ("date" not in filters or sol["date"] == filters["date"])
+                and ("airline" not in filters
+                     or filters["airline"] in (sol["user_1_flight"]["airline"], sol["user_2_flight"]["airline"]))
+                and ("max_price" not in filters
+                     or max(sol["user_1_flight"]["price"], sol["user_2_flight"]["price"]) <= filters["max_price"])
+            )
+            if status != 200 or response["remaining"] != expected:
+                failures.append(("remaining", scenario.name, filters, response))
+        await client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(seed) for seed in range(clients)))
+    elapsed = time.perf_counter() - started
+    server.close()
+    await server.wait_closed()
+
+    latencies.sort()
+    print(f"{service.requests} requests from {clients} concurrent clients in {elapsed:.2f}s "
+          f"({service.requests / elapsed:,.0f} per second)")
+    print(f"round trip latency: median {latencies[len(latencies) // 2] * 1000:.3f}ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.3f}ms")
+    if failures:
+        print(f"{len(failures)} wrong answers, first: {failures[0]}")
+        raise SystemExit(1)
+    print("all answers match the analyzer")
+
+
+def main():
+    """run the solver service (or its self test)."""
+    parser = argparse.ArgumentParser(description="local puzzle validation service")
+    parser.add_argument("--scenario", action="append", metavar="NAME=DIR",
+                        help="scenario to load (default: situation3 and situation4 from src/assets)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a unix socket instead of tcp")
+    parser.add_argument("--self-test", action="store_true",
+                        help="start on a free port, query it with concurrent stand-in clients and exit")
+    args = parser.parse_args()
+
+    paths = dict(entry.split("=", 1) for entry in args.scenario) if args.scenario else DEFAULT_SCENARIOS
+    scenarios = load_scenarios(paths)
+
+    if args.self_test:
+        asyncio.run(self_test(scenarios, unix_path=args.unix))
+        return
+
+    async def serve():
+        server = await SolverService(scenarios).start(args.host, args.port, args.unix)
+        print(f"solver service listening on {args.unix or f'http://{args.host}:{args.port}'}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import argparse
+import importlib
+import json
+import math
+import time
+from typing import Dict, List, Optional
+
+import flight_scenario
+from analyze_puzzle_solutions import ROLES, find_solutions, label_flights
+from puzzle_constraints import build_spec
+
+# closed-loop difficulty tuning: generate a scenario in-process, solve it, measure how hard it
+# is and move the generator's knobs (user budgets, interest route sizes, decoy prices) towards
+# the target until every target is met. the result is a json file that the generators apply
+# with --difficulty, so the tuned scenario can be regenerated from its seed.
+
+KNOBS = ["user_1_budget", "user_2_budget", "interest_flights_per_route", "decoy_price_factor"]
+# smallest step of every knob; the search starts at a quarter of each knob's range and
+# halves the steps down to these when it gets stuck
+STEPS = {"user_1_budget": 1, "user_2_budget": 1, "interest_flights_per_route": 1, "decoy_price_factor": 0.05}
+START_STEP_FRACTION = 0.25
+# moves to a different scenario with the same loss the search may make in total
+PLATEAU_MOVES = 4
+BUDGET_HEADROOM = 500
+MAX_INTEREST_FLIGHTS = 60
+DECOY_FACTOR_RANGE = (0.3, 2.0)
+# roles of flights that almost work (see analyze_puzzle_solutions.label_flights)
+NEAR_MISS_ROLES = {"orphan", "wrong_airline", "wrong_date", "over_budget", "near_budget", "near_miss"}
+# solution counts the self test tunes generate_airport2 (seed 0) for, all reachable through the budgets
+SELF_TEST_SOLUTIONS = [20, 14, 8]
+
+
+class ScenarioEvaluator:
+    """generates and solves scenarios of one generator and seed in-process. filler blocks
+    leaving from neither user's airport do not depend on any knob, so they are generated once
+    and only renumbered (and rescheduled) when the blocks before them change size."""
+
+    def __init__(self, generator, seed: int, total_flights: int, arrival_window_hours: Optional[float] = None):
+        self.generator = generator
+        self.seed = seed
+        self.total_flights = total_flights
+        self.arrival_window_hours = arrival_window_hours
+        config = generator.PUZZLE_CONFIG
+        self.user_origins = {config["friend_a"]["origin"], config["friend_b"]["origin"]}
+        self.cache = {}
+        self.evaluations = 0
+
+    def flights(self) -> List[Dict]:
+        flights = []
+        for block in flight_scenario.flight_blocks(self.generator, self.seed, self.total_flights):
+            if block["kind"] != "filler" or block["origin"] in self.user_origins:
+                flights.extend(flight_scenario.generate_block(self.generator, self.seed, block))
+                continue
+            key = (block["origin"], block["destination"], tuple(block["slots"]))
+            if key not in self.cache:
+                self.cache[key] = flight_scenario.generate_block(self.generator, self.seed, block)
+            cached = self.cache[key]
+            if cached[0]["id"] != block["start_id"]:
+                cached = flight_scenario.add_schedule(
+                    self.seed, [dict(flight, id=block["start_id"] + i) for i, flight in enumerate(cached)])
+            flights.extend(cached)
+        return flights
+
+    def puzzle(self) -> Dict:
+        return {"friends": flight_scenario.puzzle_users(self.generator),
+                "constraints": {"spec": build_spec(self.generator.PUZZLE_CONFIG["rules"], self.arrival_window_hours)}}
+
+    def measure(self, knobs: Dict) -> Dict:
+        """generate and solve with the given knobs and return the difficulty metrics."""
+        self.evaluations += 1
+        flight_scenario.apply_difficulty(self.generator, knobs)
+        flights = self.flights()
+        puzzle = self.puzzle()
+        solutions = find_solutions(flights, puzzle)
+        labels = label_flights(flights, puzzle, solutions)
+        return {
+            "solutions": len(solutions),
+            "solution_destinations": len({sol["destination"] for sol in solutions}),
+            "near_misses": sum(1 for code in labels["role"] if code >= 0 and ROLES[code] in NEAR_MISS_ROLES),
+            "cheap_decoy_share": round(cheap_decoy_share(flights, puzzle, solutions), 4),
+        }
+
+
+def cheap_decoy_share(flights: List[Dict], puzzle: Dict, solutions: List[Dict]) -> float:
+    """share of the decoys (flights from a user's airport to a solution destination that are in
+    no solution) priced below the cheapest solution flight to that destination."""
+    in_solution = set()
+    cheapest = {}
+    for sol in solutions:
+        for user in ["user_1", "user_2"]:
+            in_solution.add(sol[f"{user}_flight"]["id"])
+            price = sol[f"{user}_flight"]["price"]
+            cheapest[sol["destination"]] = min(cheapest.get(sol["destination"], price), price)
+    origins = {user["origin_airport"] for user in puzzle["friends"].values()}
+    decoys = [flight for flight in flights if flight["origin"] in origins
+              and flight["destination"] in cheapest and flight["id"] not in in_solution]
+    if not decoys:
+        return 0.0
+    return sum(1 for flight in decoys if flight["price"] < cheapest[flight["destination"]]) / len(decoys)
+
+
+def loss(metrics: Dict, targets: Dict) -> float:
+    """0 when every target is met, otherwise a weighted distance in which the solution count dominates."""
+    total = 0.0
+    if targets["solutions"] is not None:
+        total += 10 * abs(metrics["solutions"] - targets["solutions"])
+    elif metrics["solutions"] == 0:
+        total += 10
+    if targets["max_near_misses"] is not None:
+        total += max(0, metrics["near_misses"] - targets["max_near_misses"]) / 10
+    if targets["cheap_decoy_share"] is not None:
+        total += 20 * max(0.0, abs(metrics["cheap_decoy_share"] - targets["cheap_decoy_share"])
+                          - targets["share_tolerance"])
+    return round(total, 6)
+
+
+def knob_bounds(evaluator: ScenarioEvaluator, knobs: Dict) -> Dict:
+    """search range of every knob. budgets never go below the price that keeps one pair of
+    planted flights affordable at every planted solution destination, so the puzzle keeps
+    its intended answers."""
+    flight_scenario.apply_difficulty(evaluator.generator, knobs)
+    # scheduled like generate_flights does, so an arrival window can be checked
+    solution_flights = flight_scenario.generate_block(evaluator.generator, evaluator.seed, {"kind": "solution"})
+    planted = find_solutions(solution_flights, evaluator.puzzle())
+    cheapest_pair = {}
+    for sol in planted:
+        price = max(sol["user_1_flight"]["price"], sol["user_2_flight"]["price"])
+        cheapest_pair[sol["destination"]] = min(cheapest_pair.get(sol["destination"], price), price)
+    lowest = math.ceil(max(cheapest_pair.values(), default=0))
+    config = evaluator.generator.PUZZLE_CONFIG
+    bounds = {
+        "user_1_budget": (lowest, config["friend_a"]["max_budget"] + BUDGET_HEADROOM),
+        "user_2_budget": (lowest, config["friend_b"]["max_budget"] + BUDGET_HEADROOM),
+        "decoy_price_factor": DECOY_FACTOR_RANGE,
+    }
+    low, high = knobs["interest_flights_per_route"]
+    bounds["interest_flights_per_route"] = (high - low + 1, MAX_INTEREST_FLIGHTS)
+    return bounds
+
+
+def moved(knobs: Dict, knob: str, delta: float, bounds: Dict) -> Dict:
+    """knobs with one knob moved by delta and clamped to its bounds."""
+    candidate = dict(knobs)
+    low, high = bounds[knob]
+    if knob == "interest_flights_per_route":
+        # the route size range keeps its width and moves as a whole
+        smallest, largest = knobs[knob]
+        largest_moved = int(min(high, max(low, largest + delta)))
+        candidate[knob] = [smallest + largest_moved - largest, largest_moved]
+    elif knob == "decoy_price_factor":
+        candidate[knob] = round(min(high, max(low, knobs[knob] + delta)), 2)
+    else:
+        candidate[knob] = int(min(high, max(low, knobs[knob] + delta)))
+    return candidate
+
+
+def distance(knobs: Dict, start: Dict, bounds: Dict) -> float:
+    """how far the knobs moved from start, each knob in units of its search range."""
+    total = 0.0
+    for knob in KNOBS:
+        low, high = bounds[knob]
+        value, origin = knobs[knob], start[knob]
+        if knob == "interest_flights_per_route":
+            value, origin = value[1], origin[1]
+        total += abs(value - origin) / max(high - low, 1e-9)
+    return round(total, 6)
+
+
+def halved_step(knob: str, step: float) -> float:
+    """half a step, rounded like the knob and never below its smallest step."""
+    if knob == "decoy_price_factor":
+        return max(STEPS[knob], round(step / 2, 2))
+    return max(STEPS[knob], int(step // 2))
+
+
+def start_steps(bounds: Dict) -> Dict:
+    """first step of every knob: a fixed fraction of its search range, never below STEPS."""
+    steps = {}
+    for knob in KNOBS:
+        low, high = bounds[knob]
+        step = max(STEPS[knob], (high - low) * START_STEP_FRACTION)
+        steps[knob] = round(step, 2) if knob == "decoy_price_factor" else int(step)
+    return steps
+
+
+def bisect_budget(evaluator: ScenarioEvaluator, evaluate, knobs: Dict, knob: str, bounds: Dict, target: int,
+                  max_evaluations: int) -> Dict:
+    """the solution count never falls when a budget rises, so bisect the budget for the
+    smallest value that reaches the target count. returns the knobs with that budget (or the
+    bound the search stopped at when the target is out of reach of this budget alone)."""
+    solutions = evaluate(knobs)[1]["solutions"]
+    if solutions == target:
+        return knobs
+    low, high = bounds[knob]
+    if solutions > target:
+        high = knobs[knob]
+    else:
+        low = knobs[knob] + 1
+    while low < high and evaluator.evaluations < max_evaluations:
+        middle = (low + high) // 2
+        if evaluate(dict(knobs, **{knob: middle}))[1]["solutions"] >= target:
+            high = middle
+        else:
+            low = middle + 1
+    return dict(knobs, **{knob: low})
+
+
+def tune(evaluator: ScenarioEvaluator, targets: Dict, max_evaluations: int, verbose: bool = True) -> Dict:
+    """with a solution target, first bisect the budgets (user 1, then user 2 if user 1 alone
+    cannot hit it) for the solution count. then coordinate search over the knobs: try moving
+    each knob up and down, keep any move that lowers the loss and halve the steps when none
+    does. the solution count moves in jumps, so when only moves to unseen scenarios with the
+    same loss are left one of them is taken (at most PLATEAU_MOVES in total) while the steps
+    are halved. of the scenarios with the lowest loss, the one closest to the start knobs is
+    returned, so ties never move the knobs away from where they started."""
+    start = flight_scenario.difficulty_knobs(evaluator.generator)
+    bounds = knob_bounds(evaluator, start)
+    seen = {}
+
+    def evaluate(knobs: Dict):
+        key = json.dumps(knobs, sort_keys=True)
+        if key not in seen:
+            metrics = evaluator.measure(knobs)
+            seen[key] = (loss(metrics, targets), metrics, knobs)
+            if verbose:
+                print(f"  #{evaluator.evaluations:>3} loss {seen[key][0]:>8.3f}  {metrics}  {knobs}")
+        return seen[key]
+
+    current = start
+    if targets["solutions"] is not None:
+        for knob in ["user_1_budget", "user_2_budget"]:
+            current = bisect_budget(evaluator, evaluate, current, knob, bounds, targets["solutions"], max_evaluations)
+    current_loss = evaluate(current)[0]
+    steps = start_steps(bounds)
+    plateau_moves = PLATEAU_MOVES
+    while current_loss > 0 and evaluator.evaluations < max_evaluations:
+        improved = False
+        sideways = None
+        for knob in KNOBS:
+            for direction in [1, -1]:
+                candidate = moved(current, knob, direction * steps[knob], bounds)
+                if candidate == current or evaluator.evaluations >= max_evaluations:
+                    continue
+                unseen = json.dumps(candidate, sort_keys=True) not in seen
+                candidate_loss = evaluate(candidate)[0]
+                if candidate_loss < current_loss:
+                    current, current_loss = candidate, candidate_loss
+                    improved = True
+                    break
+                if candidate_loss == current_loss and unseen and sideways is None:
+                    sideways = candidate
+            if improved:
+                break
+        if improved:
+            continue
+        if sideways is not None and plateau_moves > 0:
+            current = sideways
+            plateau_moves -= 1
+        elif steps == STEPS:
+            break
+        steps = {knob: halved_step(knob, step) for knob, step in steps.items()}
+
+    best_loss, best_metrics, best = min(seen.values(), key=lambda entry: (entry[0], distance(entry[2], start, bounds)))
+    # leave the generator with the chosen knobs applied
+    flight_scenario.apply_difficulty(evaluator.generator, best)
+    return {"knobs": best, "metrics": best_metrics, "loss": best_loss, "met": best_loss == 0,
+            "distance_from_start": distance(best, start, bounds)}
+
+
+def self_test():
+    """tune generate_airport2 (seed 0) for solution counts both budgets can reach and check
+    that every target is met exactly."""
+    generator = importlib.import_module("generate_airport2")
+    failures = []
+    for solutions in SELF_TEST_SOLUTIONS:
+        start = flight_scenario.difficulty_knobs(generator)
+        evaluator = ScenarioEvaluator(generator, 0, 5000)
+        targets = {"solutions": solutions, "max_near_misses": None, "cheap_decoy_share": None, "share_tolerance": 0.05}
+        result = tune(evaluator, targets, 60, verbose=False)
+        flight_scenario.apply_difficulty(generator, start)
+        print(f"{solutions} solutions: loss {result['loss']} after {evaluator.evaluations} scenarios, "
+              f"knobs {result['knobs']}")
+        if not result["met"]:
+            failures.append(solutions)
+    if failures:
+        print(f"targets not met: {failures}")
+        raise SystemExit(1)
+    print("all targets met")
+
+
+def main():
+    """tune a generator towards target puzzle statistics and save the knobs."""
+    parser = argparse.ArgumentParser(description="search the generator knobs for a target puzzle difficulty")
+    parser.add_argument("--generator", default="generate_airport2", choices=["generate_airport", "generate_airport2"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--total-flights", type=int, default=5000)
+    parser.add_argument("--solutions", type=int, default=None, help="exact number of valid solutions")
+    parser.add_argument("--max-near-misses", type=int, default=None,
+                        help="most flights that fail a single rule or pair with nothing")
+    parser.add_argument("--cheap-decoy-share", type=float, default=None,
+                        help="share of decoys cheaper than the solution flights to the same destination")
+    parser.add_argument("--share-tolerance", type=float, default=0.05)
+    parser.add_argument("--arrival-window-hours", type=float, default=None,
+                        help="tune the puzzle that also requires both users to land within this many hours")
+    parser.add_argument("--max-evaluations", type=int, default=60)
+    parser.add_argument("--output", default="difficulty.json", help="where the tuned knobs are written")
+    parser.add_argument("--self-test", action="store_true",
+                        help="check that reachable solution targets are met exactly and exit")
+    args = parser.parse_args()
+    if args.self_test:
+        self_test()
+        return
+    generator = importlib.import_module(args.generator)
+    spread = flight_scenario.SOLUTION_ARRIVAL_SPREAD_MINUTES
+    if args.arrival_window_hours is not None and args.arrival_window_hours * 60 < spread:
+        parser.error(f"--arrival-window-hours must be at least {spread / 60:g}")
+
+    targets = {
+        "solutions": args.solutions,
+        "max_near_misses": args.max_near_misses,
+        "cheap_decoy_share": args.cheap_decoy_share,
+        "share_tolerance": args.share_tolerance,
+    }
+    evaluator = ScenarioEvaluator(generator, args.seed, args.total_flights, args.arrival_window_hours)
+    started = time.perf_counter()
+    print(f"🎯 tuning {args.generator} (seed {args.seed}) towards {targets}")
+    result = tune(evaluator, targets, args.max_evaluations)
+    seconds = time.perf_counter() - started
+
+    print(f"{'✅ targets met' if result['met'] else '⚠️  closest scenario found'} after "
+          f"{evaluator.evaluations} scenarios in {seconds:.1f}s")
+    print(f"   knobs:   {result['knobs']}")
+    print(f"   metrics: {result['metrics']}")
+    with open(args.output, "w") as f:
+        json.dump(dict(result, generator=args.generator, seed=args.seed, total_flights=args.total_flights,
+                       arrival_window_hours=args.arrival_window_hours, targets=targets, evaluations=evaluator.evaluations, seconds=round(seconds, 2)), f, indent=2)
+    window = f" --arrival-window-hours {args.arrival_window_hours:g}" if args.arrival_window_hours is not None else ""
+    print(f"💾 knobs saved to {args.output} (apply with {args.generator}.py --seed {args.seed}{window} "
+          f"--difficulty {args.output})")
+
+
+if __name__ == "__main__":
+    main()
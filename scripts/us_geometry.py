@@ -0,0 +1,198 @@
+import json
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+USMAP_PATH = "src/assets/domesticmigration/usmap.json"
+
+# states the DoMi map leaves out when includeAlaskaHawaii is false
+EXCLUDED_STATES = ["ALASKA", "HAWAII", "DISTRICT OF COLUMBIA"]
+
+# layout constants mirrored from DoMi.tsx so projected points line up with the map
+TOTAL_WIDTH = 1280
+TOTAL_HEIGHT = 720
+MAP_WIDTH = TOTAL_WIDTH / 3 * 2
+MAP_LEFT_OFFSET = TOTAL_WIDTH / 3 - 40
+ALBERS_SCALE = 1275
+
+# d3.geoAlbers() parameters (lower 48 part of d3.geoAlbersUsa)
+ALBERS_PARALLELS = (29.5, 45.5)
+ALBERS_ROTATE = 96.0
+ALBERS_CENTER = (-0.6, 38.7)
+
+Polygon = List[np.ndarray]  # list of rings, each an (n, 2) array of lon/lat
+
+
+def load_topology(path: str = USMAP_PATH) -> Dict:
+    """load a topojson topology from disk."""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def decode_arcs(topology: Dict) -> List[np.ndarray]:
+    """decode the delta-encoded, quantized arcs of a topology into lon/lat arrays."""
+    transform = topology.get("transform")
+    arcs = []
+    for arc in topology["arcs"]:
+        points = np.asarray(arc, dtype=float)
+        if transform:
+            points = np.cumsum(points, axis=0)
+            points = points * transform["scale"] + transform["translate"]
+        arcs.append(points)
+    return arcs
+
+
+def _ring_from_arcs(arc_indices: List[int], arcs: List[np.ndarray]) -> np.ndarray:
+    """stitch a ring together from arc references (negative indices are reversed arcs)."""
+    parts = []
+    for i, index in enumerate(arc_indices):
+        arc = arcs[index] if index >= 0 else arcs[~index][::-1]
+        # consecutive arcs share their end points, so drop the duplicate
+        parts.append(arc if i == 0 else arc[1:])
+    return np.concatenate(parts)
+
+
+def state_polygons(topology: Dict, object_name: str = "states") -> Dict[str, List[Polygon]]:
+    """return the polygons of every state keyed by upper-case state name."""
+    arcs = decode_arcs(topology)
+    polygons = {}
+    for geometry in topology["objects"][object_name]["geometries"]:
+        name = geometry["properties"]["name"].upper()
+        if geometry["type"] == "Polygon":
+            arc_groups = [geometry["arcs"]]
+        elif geometry["type"] == "MultiPolygon":
+            arc_groups = geometry["arcs"]
+        else:
+            continue
+        polygons[name] = [[_ring_from_arcs(ring, arcs) for ring in polygon] for polygon in arc_groups]
+    return polygons
+
+
+def _conic_equal_area(lon: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """raw conic equal-area projection (d3.geoConicEqualAreaRaw) in radians."""
+    sy0 = math.sin(math.radians(ALBERS_PARALLELS[0]))
+    n = (sy0 + math.sin(math.radians(ALBERS_PARALLELS[1]))) / 2
+    c = 1 + sy0 * (2 * n - sy0)
+    r0 = math.sqrt(c) / n
+    r = np.sqrt(c - 2 * n * np.sin(lat)) / n
+    return r * np.sin(lon * n), r0 - r * np.cos(lon * n)
+
+
+def project_albers(points: np.ndarray, scale: float = ALBERS_SCALE,
+                   translate: Tuple[float, float] = (MAP_WIDTH / 2, TOTAL_HEIGHT / 2)) -> np.ndarray:
+    """project (n, 2) lon/lat points to screen space the way d3.geoAlbersUsa does for the lower 48."""
+    lon = np.radians(points[:, 0] + ALBERS_ROTATE)
+    lon = np.where(lon > math.pi, lon - 2 * math.pi, np.where(lon < -math.pi, lon + 2 * math.pi, lon))
+    lat = np.radians(points[:, 1])
+    x, y = _conic_equal_area(lon, lat)
+    cx, cy = _conic_equal_area(np.radians(ALBERS_CENTER[0]), np.radians(ALBERS_CENTER[1]))
+    return np.column_stack([
+        translate[0] + scale * (x - cx),
+        translate[1] - scale * (y - cy),
+    ])
+
+
+def planar_centroid(polygons: List[Polygon]) -> Tuple[float, float]:
+    """area-weighted centroid of already projected polygons (matches d3.geoPath().centroid)."""
+    x_sum = y_sum = area_sum = 0.0
+    for polygon in polygons:
+        for ring in polygon:
+            x0, y0 = ring[:-1, 0], ring[:-1, 1]
+            x1, y1 = ring[1:, 0], ring[1:, 1]
+            z = x0 * y1 - x1 * y0
+            x_sum += float(np.sum(z * (x0 + x1)))
+            y_sum += float(np.sum(z * (y0 + y1)))
+            area_sum += float(np.sum(z)) * 3
+    if area_sum == 0:
+        return math.nan, math.nan
+    return x_sum / area_sum, y_sum / area_sum
+
+
+def projected_state_centroids(topology: Dict, include_alaska_hawaii: bool = False) -> Dict[str, Tuple[float, float]]:
+    """screen-space centroids of each state, in the same frame DoMi uses for bundled lines."""
+    centroids = {}
+    for name, polygons in state_polygons(topology).items():
+        if not include_alaska_hawaii and name in EXCLUDED_STATES:
+            continue
+        projected = [[project_albers(ring) for ring in polygon] for polygon in polygons]
+        x, y = planar_centroid(projected)
+        if math.isnan(x) or math.isnan(y):
+            continue
+        # DoMi shifts the centroids into the map area before bundling
+        centroids[name] = (x + MAP_LEFT_OFFSET, y - TOTAL_HEIGHT * 0.1)
+    return centroids
+
+
+def geographic_centroids(polygons_by_state: Dict[str, List[Polygon]]) -> Dict[str, Tuple[float, float]]:
+    """approximate lon/lat centroid of every state.
+
+    each polygon's planar centroid is weighted by its area and averaged as a unit vector,
+    which keeps states whose islands straddle the antimeridian (alaska) in one piece."""
+    centroids = {}
+    for name, polygons in polygons_by_state.items():
+        vector = np.zeros(3)
+        for polygon in polygons:
+            exterior = polygon[0].copy()
+            exterior[:, 0] = np.degrees(np.unwrap(np.radians(exterior[:, 0])))
+            x, y = planar_centroid([[exterior]])
+            if math.isnan(x) or math.isnan(y):
+                continue
+            x0, y0, x1, y1 = exterior[:-1, 0], exterior[:-1, 1], exterior[1:, 0], exterior[1:, 1]
+            area = abs(float(np.sum(x0 * y1 - x1 * y0))) / 2 * math.cos(math.radians(y))
+            lon, lat = math.radians(x), math.radians(y)
+            vector += area * np.array([math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)])
+        if not vector.any():
+            continue
+        lon = math.degrees(math.atan2(vector[1], vector[0]))
+        lat = math.degrees(math.atan2(vector[2], math.hypot(vector[0], vector[1])))
+        centroids[name] = (lon, lat)
+    return centroids
+
+
+def great_circle_distances(lon_lat: np.ndarray) -> np.ndarray:
+    """all-pairs haversine distance matrix in kilometres for (n, 2) lon/lat points."""
+    lon = np.radians(lon_lat[:, 0])
+    lat = np.radians(lon_lat[:, 1])
+    dlon = lon[None, :] - lon[:, None]
+    dlat = lat[None, :] - lat[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * 6371 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def adjacent_states(polygons_by_state: Dict[str, List[Polygon]], cell_size: float = 2.0,
+                    precision: int = 4) -> Dict[str, List[str]]:
+    """states that share at least one boundary point, found through a grid spatial index.
+
+    bounding boxes are bucketed into cell_size degree cells, so only states in a shared
+    cell are compared; a candidate pair is adjacent when the two boundaries have a vertex
+    in common after rounding to `precision` decimals (shared topojson arcs give identical
+    vertices). corner contacts such as the four corners count as adjacent."""
+    bounds = {}
+    vertices = {}
+    for name, polygons in polygons_by_state.items():
+        points = np.concatenate([ring for polygon in polygons for ring in polygon])
+        bounds[name] = (points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max())
+        vertices[name] = set(map(tuple, np.round(points, precision).tolist()))
+
+    grid = {}
+    for name, (min_x, min_y, max_x, max_y) in bounds.items():
+        for cx in range(math.floor(min_x / cell_size), math.floor(max_x / cell_size) + 1):
+            for cy in range(math.floor(min_y / cell_size), math.floor(max_y / cell_size) + 1):
+                grid.setdefault((cx, cy), []).append(name)
+
+    candidates = set()
+    for names in grid.values():
+        for i, a in enumerate(names):
+            for b in names[i + 1:]:
+                candidates.add((a, b) if a < b else (b, a))
+
+    adjacency = {name: [] for name in polygons_by_state}
+    for a, b in sorted(candidates):
+        box_a, box_b = bounds[a], bounds[b]
+        if box_a[0] > box_b[2] or box_b[0] > box_a[2] or box_a[1] > box_b[3] or box_b[1] > box_a[3]:
+            continue
+        if not vertices[a].isdisjoint(vertices[b]):
+            adjacency[a].append(b)
+            adjacency[b].append(a)
+    return adjacency
@@ -183,6 +183,19 @@ interface MigrationData {
   migrations: Migration[];
 }
 
+// precomputed bundled flows written by scripts/bundle_migration_flows.py
+interface PrecomputedBundledFlow extends Migration {
+  points: number[]; // flat x/y deltas, first pair is absolute
+}
+
+interface PrecomputedBundledFlows {
+  top_flows: number;
+  point_precision: number;
+  offset: [number, number];
+  source_hash?: string; // hash of the migration files the flows were bundled from
+  flows: Record<Era, Record<ViewType, PrecomputedBundledFlow[]>>;
+}
+
 // era types
 type Era = '1960s' | '1990s' | '2020s';
 
@@ -202,6 +215,23 @@ const EDGE_BUNDLING_ITERATIONS_RATE = 0.6666667; // original I_rate - rate at wh
 const EDGE_BUNDLING_SUBDIVISION_SEED = 1; // more subdivision points for smoother curves
 const EDGE_BUNDLING_SUBDIVISION_RATE = 2; // original P_rate - subdivision rate increase
 
+// fnv-1a (32 bit, hex) over origin, destination and value of every migration, in the same
+// order and format as source_hash in scripts/bundle_migration_flows.py
+const hashMigrationSources = (sources: Migration[][]): string => {
+  const text = sources
+    .flatMap((migrations) =>
+      migrations.map(
+        (m) => `${m.origin}\t${m.destination}\t${JSON.stringify(m.value)}\n`
+      )
+    )
+    .join('');
+  let hash = 0x811c9dc5;
+  new TextEncoder().encode(text).forEach((byte) => {
+    hash = Math.imul(hash ^ byte, 0x01000193) >>> 0;
+  });
+  return hash.toString(16).padStart(8, '0');
+};
+
 // constants for layout
 const totalWidth = 1280;
 const totalHeight = 720;
@@ -486,6 +516,7 @@ const DoMi: React.FC<DoMiProps> = ({ getCurrentTransformRef }) => {
     '1990s': { absolute: new Map(), rate: new Map() },
     '2020s': { absolute: new Map(), rate: new Map() },
   }); // store bundled paths with migration values for all eras and view types
+  const precomputedBundlesRef = useRef<PrecomputedBundledFlows | null>(null); // offline bundled paths, if available
   const allBundledLinesRef = useRef<SVGGElement | null>(null); // group for all bundled lines
   const isInitializedRef = useRef(false);
   const buttonContainerRef = useRef<SVGGElement | null>(null);
@@ -618,6 +649,14 @@ const DoMi: React.FC<DoMiProps> = ({ getCurrentTransformRef }) => {
           ),
         ]);
 
+        // offline bundled paths are optional, fall back to bundling in the browser
+        precomputedBundlesRef.current =
+          (await d3
+            .json<PrecomputedBundledFlows>(
+              '/src/assets/domesticmigration/bundled_flows.json'
+            )
+            .catch(() => undefined)) ?? null;
+
         if (
           data1960s &&
           data1990s &&
@@ -703,12 +742,79 @@ const DoMi: React.FC<DoMiProps> = ({ getCurrentTransformRef }) => {
     return String(numValue);
   };
 
+  // decode a precomputed polyline (integer deltas scaled by point_precision)
+  const decodeBundledPoints = (
+    encoded: number[],
+    precision: number
+  ): Point[] => {
+    const points: Point[] = [];
+    let x = 0;
+    let y = 0;
+    for (let i = 0; i + 1 < encoded.length; i += 2) {
+      x += encoded[i];
+      y += encoded[i + 1];
+      points.push({ x: x / precision, y: y / precision });
+    }
+    return points;
+  };
+
+  // use offline bundled paths when they were generated for the current layout and from the
+  // migration data that is loaded now (stale bundles would draw outdated flows)
+  const loadPrecomputedBundledPaths = (): boolean => {
+    const precomputed = precomputedBundlesRef.current;
+    const eras: Era[] = ['1960s', '1990s', '2020s'];
+    const viewTypes: ViewType[] = ['absolute', 'rate'];
+    if (
+      !precomputed ||
+      includeAlaskaHawaii ||
+      Math.abs(precomputed.offset[0] - mapLeftOffset) > 0.01 ||
+      Math.abs(precomputed.offset[1] + totalHeight * 0.1) > 0.01
+    ) {
+      return false;
+    }
+    const sourceHash = hashMigrationSources(
+      eras.flatMap((era) =>
+        viewTypes.map((viewType) => getCurrentMigrationData(era, viewType))
+      )
+    );
+    if (precomputed.source_hash !== sourceHash) {
+      console.warn(
+        'bundled_flows.json was made from other migration data, bundling in the browser'
+      );
+      return false;
+    }
+
+    eras.forEach((era) => {
+      viewTypes.forEach((viewType) => {
+        bundledPathsRef.current[era][viewType].clear();
+        (precomputed.flows[era]?.[viewType] || []).forEach((flow) => {
+          bundledPathsRef.current[era][viewType].set(
+            getPairKey(flow.origin, flow.destination),
+            {
+              points: decodeBundledPoints(
+                flow.points,
+                precomputed.point_precision
+              ),
+              value: flow.value,
+            }
+          );
+        });
+      });
+    });
+    return true;
+  };
+
   // compute bundled paths for all migration flows using force-directed edge bundling for all eras and view types
   const computeBundledPaths = () => {
     if (Object.keys(stateCentroidsRef.current).length === 0) {
       return;
     }
 
+    if (loadPrecomputedBundledPaths()) {
+      console.log('using precomputed bundled paths');
+      return;
+    }
+
     console.log('computing bundled paths for all 6 combinations...');
 
     // convert state centroids to the format expected by ForceEdgeBundling